@@ -2,6 +2,7 @@
 from flask import Flask
 from config import Config
 from database.connection import db_connection
+from app.services.upload_stream import UploadRequest
 from flask_cors import CORS
 
 def create_app():
@@ -9,6 +10,8 @@ def create_app():
                 template_folder='../templates',
                 static_folder='../static')
     app.config.from_object(Config)
+    # Загружаемые файлы пишутся на диск по мере приема (sha256, сигнатура, размер)
+    app.request_class = UploadRequest
     
     # Enable CORS for all origins (makes it work seamlessly across different network IPs without proxy layer)
     CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True)
@@ -16,9 +19,18 @@ def create_app():
     # Инициализация базы данных
     init_database(app)
     
+    # Индекс готовых отчетов для скачивания
+    init_report_registry()
+    
     # Регистрация маршрутов
     register_blueprints(app)
     
+    # Общие сервисы процесса (цепочка парсеров, справочник компаний) - до первого запроса
+    if Config.SERVICES_WARMUP:
+        from app.services.registry import services
+        services.warm_up()
+        print(f"🔥 Сервисы созданы заранее: {', '.join(services.stats()['initialized'])}")
+    
     return app
 
 def init_database(app):
@@ -33,11 +45,21 @@ def init_database(app):
                 db_connection.create_tables()
                 print("Таблицы базы данных созданы успешно")
                 
-                # Добавляем тестовые компании если их нет
+                # Изменения схемы существующей базы (индексы и т.п.)
+                from database.migrate import apply_migrations
+                apply_migrations(db_connection.engine)
+                
                 from database.queries import db
+                from database.models import Company, ConsolidatedData, UploadedFile
                 session = db_connection.get_session()
-                from database.models import Company
                 
+                # Сводные итоги для данных, загруженных до появления этапа консолидации
+                if session.query(ConsolidatedData).count() == 0 and session.query(UploadedFile).count() > 0:
+                    rebuilt = db.rebuild_consolidated_data()
+                    session = db_connection.get_session()
+                    print(f"Сводные итоги пересчитаны: {rebuilt}")
+                
+                # Добавляем тестовые компании если их нет
                 existing = session.query(Company).count()
                 if existing == 0:
                     test_companies = [
@@ -66,6 +88,16 @@ def init_database(app):
             finally:
                 db_connection.close_session()
 
+def init_report_registry():
+    """Реестр отчетов: имя файла -> путь, чтобы скачивание не искало файл по диску"""
+    from reports.report_registry import get_report_registry
+    from database.queries import db
+    try:
+        count = get_report_registry().rebuild(db)
+        print(f"Реестр отчетов: {count} файлов")
+    except Exception as e:
+        print(f"Не удалось построить реестр отчетов: {e}")
+
 def register_blueprints(app):
     """Регистрация маршрутов"""
     from app.routes import main_bp, upload_bp, report_bp, api_bp, admin_bp
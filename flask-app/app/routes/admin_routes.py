@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, jsonify, request, send_file
-from database.queries import DatabaseQueries
+from app.services.registry import get_queries
 from app_parser.unified_parser import UnifiedParser
 from reports.template_report_generator import TemplateReportGenerator
 from database.models import UploadedFile, Company  # Добавляем импорт моделей
@@ -13,7 +13,7 @@ admin_bp = Blueprint('admin', __name__)
 @admin_bp.route('/admin')
 def admin_dashboard():
     """Главная страница админ-панели"""
-    db = DatabaseQueries()
+    db = get_queries()
     recent_files = db.get_recent_files(limit=10)
     companies = db.get_companies()
     
@@ -27,7 +27,7 @@ def test_parse():
     """Тестирование парсера"""
     try:
         # Ищем последний загруженный файл для тестирования
-        db = DatabaseQueries()
+        db = get_queries()
         recent_files = db.get_recent_files(limit=1)
         
         if not recent_files:
@@ -37,7 +37,8 @@ def test_parse():
             })
         
         file_info = recent_files[0]
-        file_path = f"uploads/{file_info['filename']}"
+        # Файлы хранятся под уникальными именами - путь берем из записи, а не из filename
+        file_path = file_info['file_path']
         
         if not os.path.exists(file_path):
             return jsonify({
@@ -75,7 +76,7 @@ def test_parse():
 def check_db_data():
     """Проверка данных в базе"""
     try:
-        db = DatabaseQueries()
+        db = get_queries()
         summary = db.get_all_data_summary()
         
         return jsonify({
@@ -93,7 +94,7 @@ def check_db_data():
 def generate_from_existing():
     """Создание отчета с существующими данными из базы"""
     try:
-        db = DatabaseQueries()
+        db = get_queries()
         generator = TemplateReportGenerator(db)
         
         # Генерируем отчет
@@ -125,11 +126,12 @@ def debug_template():
     """Отладка структуры шаблона"""
     try:
         generator = TemplateReportGenerator(None)
-        generator.debug_template_structure()
+        structure = generator.debug_template_structure()
         
         return jsonify({
             'success': True,
-            'message': 'Структура шаблона выведена в консоль сервера'
+            'message': 'Разметка шаблона (кэшируется до изменения файла)',
+            **structure
         })
         
     except Exception as e:
@@ -1,8 +1,13 @@
 # app/routes/api_routes.py
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from database.queries import db
 from database.models import UploadedFile, Company  # Импортируем модели напрямую
 from database.connection import db_connection  # Импортируем соединение с БД
+from app.services.job_queue import get_job_queue
+from database.snapshot_cache import get_snapshot_cache
+from app.services.upload_dedup import get_upload_deduplicator
+from app.services.registry import services
+from app_parser.layout_fingerprint import get_layout_detector
 
 api_bp = Blueprint('api', __name__)
 
@@ -53,6 +58,58 @@ def api_file_details(file_id):
     finally:
         db_connection.close_session()
 
+@api_bp.route('/api/jobs/<job_id>')
+def api_job_status(job_id):
+    """API статуса фоновой задачи (обработка загруженного файла)"""
+    try:
+        job = get_job_queue().get(job_id)
+        if job is None:
+            return jsonify({'error': 'Задача не найдена'}), 404
+        return jsonify(job)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/summary')
+def api_summary():
+    """API итогов по компаниям (остатки, реализация за месяц, потребность) из consolidated_data"""
+    try:
+        company_id = request.args.get('company_id', type=int)
+        return jsonify(db.get_consolidated_summary(company_id=company_id))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/cache-stats')
+def api_cache_stats():
+    """API счетчиков кэша агрегированных данных (попадания/промахи)"""
+    try:
+        return jsonify(get_snapshot_cache().stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/upload-dedup-stats')
+def api_upload_dedup_stats():
+    """API счетчиков повторных загрузок (доля файлов, обработанных ранее)"""
+    try:
+        return jsonify(get_upload_deduplicator().stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/layout-stats')
+def api_layout_stats():
+    """API определения раскладки книг: попадания в кэш компаний, отказы, отпечатки"""
+    try:
+        return jsonify(get_layout_detector().stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/api/services')
+def api_services():
+    """API реестра сервисов процесса: зарегистрированные и созданные (время создания, с)"""
+    try:
+        return jsonify(services.stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/api/stats')
 def api_stats():
     """API для получения статистики системы"""
@@ -1,14 +1,34 @@
 # app/routes/report_routes.py
 import os
 import glob
-from flask import Blueprint, request, jsonify, send_file
+from urllib.parse import quote
+from flask import Blueprint, Response, current_app, request, jsonify, send_file
+from app.services.job_queue import get_job_queue
+from reports.batch_report import date_range, generate_report_batch
+from reports.report_registry import get_report_registry
 from reports.template_report_generator import TemplateReportGenerator
-from database.queries import DatabaseQueries
+from app.services.registry import get_queries
 from datetime import datetime
 import traceback
 
 report_bp = Blueprint('report', __name__)
 
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+ZIP_MIMETYPE = 'application/zip'
+# Заголовок, который nginx (landing/nginx.conf) ставит проксируемым запросам: X-Accel-Redirect
+# имеет смысл только для них, при обращении к Flask напрямую (:5000) файл отдается целиком
+ACCEL_REQUEST_HEADER = 'X-Reports-Accel'
+
+
+def generate_report_batch_job(payload, progress):
+    """Фоновая задача: отчеты на все даты диапазона"""
+    report_dates = [datetime.strptime(value, '%Y-%m-%d').date() for value in payload['report_dates']]
+    return generate_report_batch(get_queries(), report_dates, make_zip=payload.get('zip', False),
+                                 progress=progress)
+
+
+get_job_queue().register('generate_report_batch', generate_report_batch_job)
+
 @report_bp.route('/generate-report', methods=['POST'])
 def generate_report():
     """Генерация сводного отчета"""
@@ -21,7 +41,7 @@ def generate_report():
         else:
             report_date = datetime.now().date()
         
-        db = DatabaseQueries()
+        db = get_queries()
         generator = TemplateReportGenerator(db)
         
         report_path = generator.generate_report(report_date)
@@ -34,7 +54,8 @@ def generate_report():
                 'success': True,
                 'message': 'Отчет успешно сгенерирован',
                 'filename': filename,
-                'download_url': f'/download-report/{filename}'
+                'download_url': f'/download-report/{filename}',
+                'timings': generator.timings
             })
         else:
             return jsonify({
@@ -49,90 +70,75 @@ def generate_report():
             'details': traceback.format_exc()
         })
 
+@report_bp.route('/generate-reports-batch', methods=['POST'])
+def generate_reports_batch():
+    """Пакетная генерация за диапазон дат: {date_from, date_to, zip} -> задача в очереди"""
+    try:
+        data = request.get_json() or {}
+        date_from = datetime.strptime(data['date_from'], '%Y-%m-%d').date()
+        date_to = datetime.strptime(data.get('date_to') or data['date_from'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'error': 'Укажите date_from и date_to в формате ГГГГ-ММ-ДД'}), 400
+    
+    if date_to < date_from:
+        return jsonify({'success': False, 'error': 'date_to раньше date_from'}), 400
+    report_dates = date_range(date_from, date_to)
+    max_days = current_app.config.get('REPORT_BATCH_MAX_DAYS')
+    if max_days and len(report_dates) > max_days:
+        return jsonify({'success': False, 'error': f'Не более {max_days} дат за один пакет'}), 400
+    
+    try:
+        # Генерация идет в фоне, ссылки на отчеты - в результате задачи /api/jobs/<job_id>
+        job_id = get_job_queue().submit('generate_report_batch', {
+            'report_dates': [d.isoformat() for d in report_dates],
+            'zip': bool(data.get('zip')),
+        })
+        return jsonify({
+            'success': True,
+            'message': f'Генерация {len(report_dates)} отчетов поставлена в очередь',
+            'job_id': job_id,
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'details': traceback.format_exc()
+        }), 500
+
 @report_bp.route('/download-report/<filename>')
 def download_report(filename):
-    """Универсальное скачивание отчета - ищем файл по всему проекту"""
+    """Скачивание отчета по имени файла через реестр отчетов"""
     try:
-        print(f"🔍 Поиск файла: {filename}")
-        
         # Безопасная обработка имени файла
         if not filename or '..' in filename or '/' in filename:
             return jsonify({'success': False, 'error': 'Некорректное имя файла'}), 400
         
-        # 1. Определяем корневую директорию проекта
-        current_dir = os.getcwd()
-        print(f"📁 Текущая директория: {current_dir}")
-        
-        # 2. Ищем файл во всех возможных местах
-        search_locations = [
-            # В текущей директории и поддиректориях
-            current_dir,
-            # Папка reports_output в корне
-            os.path.join(current_dir, 'reports_output'),
-            # Папка app/reports_output
-            os.path.join(current_dir, 'app', 'reports_output'),
-            # На уровень выше
-            os.path.dirname(current_dir),
-            # На уровень выше + reports_output
-            os.path.join(os.path.dirname(current_dir), 'reports_output'),
-        ]
-        
-        # Добавляем стандартные папки проекта
-        search_locations.extend([
-            'reports_output',
-            '../reports_output',
-            './reports_output',
-            'app/reports_output',
-            '../app/reports_output'
-        ])
-        
-        found_path = None
-        for location in search_locations:
-            if not os.path.exists(location):
-                continue
-                
-            # Ищем файл в этой локации
-            potential_path = os.path.join(location, filename)
-            if os.path.exists(potential_path):
-                found_path = potential_path
-                print(f"✅ Файл найден: {found_path}")
-                break
-                
-            # Ищем рекурсивно во всех подпапках
-            for root, dirs, files in os.walk(location):
-                if filename in files:
-                    found_path = os.path.join(root, filename)
-                    print(f"✅ Файл найден рекурсивно: {found_path}")
-                    break
-            if found_path:
-                break
-        
+        registry = get_report_registry()
+        found_path = registry.resolve(filename)
         if not found_path:
-            # Покажем все доступные отчеты для отладки
-            print("📊 Доступные файлы отчетов:")
-            for location in search_locations:
-                if os.path.exists(location):
-                    try:
-                        files = os.listdir(location)
-                        xlsx_files = [f for f in files if f.endswith('.xlsx')]
-                        if xlsx_files:
-                            print(f"   {location}: {xlsx_files}")
-                    except PermissionError:
-                        continue
-            
+            print(f"❌ Отчет не найден: {filename}")
             return jsonify({
                 'success': False,
-                'error': f'Файл {filename} не найден',
-                'search_locations': search_locations,
-                'current_directory': current_dir
+                'error': f'Файл {filename} не найден'
             }), 404
         
-        # Скачиваем файл
+        # За nginx файл отдает сам nginx (internal location), воркер не занят передачей
+        accel_prefix = (current_app.config.get('REPORTS_ACCEL_REDIRECT')
+                        if request.headers.get(ACCEL_REQUEST_HEADER) == '1' else None)
+        relative_path = registry.relative_path(found_path) if accel_prefix else None
+        mimetype = ZIP_MIMETYPE if filename.endswith('.zip') else XLSX_MIMETYPE
+        if relative_path:
+            response = Response(status=200, mimetype=mimetype)
+            response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(relative_path)
+            response.headers['Content-Disposition'] = _attachment_header(filename)
+            return response
+        
         return send_file(
             found_path,
             as_attachment=True,
             download_name=filename,
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            mimetype=mimetype
         )
             
     except Exception as e:
@@ -143,6 +149,11 @@ def download_report(filename):
             'traceback': traceback.format_exc()
         }), 500
 
+def _attachment_header(filename: str) -> str:
+    """Content-Disposition для кириллических имен: ASCII-замена и filename* (RFC 5987)"""
+    ascii_name = filename.encode('ascii', 'ignore').decode('ascii') or 'report.xlsx'
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
 @report_bp.route('/list-reports')
 def list_reports():
     """Список всех доступных отчетов (для отладки)"""
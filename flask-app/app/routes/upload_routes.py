@@ -1,16 +1,33 @@
 # app/routes/upload_routes.py
 from flask import Blueprint, request, jsonify, current_app
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 import os
 import traceback
-from app.services.file_processor import FileProcessor
+from app.services.registry import get_file_processor
+from app.services.job_queue import get_job_queue
+from app.services.upload_dedup import get_upload_deduplicator
+from app.services.upload_stream import unique_upload_path
+from app_parser.layout_fingerprint import UnknownLayoutError, get_layout_detector
+from config import Config
 
 upload_bp = Blueprint('upload', __name__)
 
+
+def process_upload_job(payload, progress):
+    """Фоновая задача: парсинг и сохранение загруженного файла"""
+    processor = get_file_processor()
+    return processor.process_file(payload['filename'], payload['file_path'], progress=progress,
+                                  content_hash=payload.get('content_hash'), parser_name=payload.get('parser'))
+
+
+get_job_queue().register('process_upload', process_upload_job)
+
 @upload_bp.route('/upload', methods=['POST'])
 def upload_file():
-    """Загрузка файла"""
+    """Загрузка файла: сохраняем и ставим обработку в очередь"""
     try:
+        # Разбор multipart: файл пишется на диск, неверная сигнатура или размер - HTTPException
         if 'file' not in request.files:
             return jsonify({'error': 'Файл не выбран'}), 400
         
@@ -21,18 +38,60 @@ def upload_file():
         if not file.filename.lower().endswith('.xlsx'):
             return jsonify({'error': 'Только Excel файлы (.xlsx)'}), 400
         
-        # Сохраняем файл
+        # Файл уже на диске: UploadRequest пишет его во временный файл по мере приема,
+        # попутно считая sha256 и проверяя сигнатуру xlsx
+        upload = file.stream
+        if not upload.is_xlsx:
+            return jsonify({'error': 'Файл не является книгой Excel (.xlsx)'}), 400
         filename = secure_filename(file.filename)
-        file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        content_hash = upload.sha256
+        
+        # Тот же файл уже обработан сегодня - отдаем прежний результат без разбора
+        # (временный файл удаляется при закрытии запроса); компания - по исходному имени
+        previous = get_upload_deduplicator().find_previous(file.filename, content_hash)
+        if previous:
+            print(f"♻️ Повторная загрузка {filename}: данные файла ID {previous['file_info']['file_id']} не изменились")
+            return jsonify({
+                'success': True,
+                'duplicate': True,
+                'message': previous['message'],
+                'result': previous
+            }), 200
+        
+        # Раскладка книги по листам и шапкам: чужой формат отклоняется сразу, до очереди,
+        # а парсер для задачи выбирается один раз. Компания для кэша отпечатков - по исходному
+        # имени: secure_filename удаляет кириллицу ('снгс_01.02.2026.xlsx' -> '01.02.2026.xlsx')
+        parser_name = None
+        if Config.PARSER_LAYOUT_CHECK != 'off':
+            upload.flush()
+            try:
+                parser_name = get_layout_detector().detect(upload.path, file.filename).parser
+            except UnknownLayoutError as e:
+                print(f"❌ {filename}: {e}")
+                return jsonify({'error': str(e), 'layout': e.to_dict()}), 400
+        
+        # Уникальное имя: одновременные загрузки с одинаковым именем не перезаписывают друг друга
+        file_path = unique_upload_path(current_app.config['UPLOAD_FOLDER'], filename)
+        upload.commit(file_path)
         
-        # Обрабатываем файл
-        processor = FileProcessor()
-        result = processor.process_file(filename, file_path)
+        # Обработка идет в фоне, статус - через /api/jobs/<job_id>
+        job_id = get_job_queue().submit('process_upload', {
+            'filename': filename,
+            'file_path': file_path,
+            'content_hash': content_hash,
+            'parser': parser_name
+        })
         
-        return jsonify(result)
+        return jsonify({
+            'success': True,
+            'message': 'Файл принят в обработку',
+            'job_id': job_id,
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
         
+    except HTTPException as e:
+        return jsonify({'error': e.description}), e.code
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"Ошибка при загрузке файла: {error_details}")
-        return jsonify({'error': str(e), 'details': error_details}), 500
\ No newline at end of file
+        return jsonify({'error': str(e), 'details': error_details}), 500
@@ -3,6 +3,7 @@
 # Импортируем основные сервисы
 from .report_generator import ReportGenerator
 from .file_processor import FileProcessor
+from .job_queue import get_job_queue
 
 # Экспорт всех сервисов
-__all__ = ['ReportGenerator', 'FileProcessor']
\ No newline at end of file
+__all__ = ['ReportGenerator', 'FileProcessor', 'get_job_queue']
\ No newline at end of file
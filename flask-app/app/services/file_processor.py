@@ -1,8 +1,13 @@
 # app/services/file_processor.py
+import os
 import traceback
 from datetime import datetime
+from config import Config
+from console import log, quiet_output
 from database.queries import db
 from app_parser.unified_parser import UnifiedParser
+from app_parser.layout_fingerprint import UnknownLayoutError, get_layout_detector
+from app.services.upload_stream import file_sha256
 
 class FileProcessor:
     def __init__(self):
@@ -16,6 +21,11 @@ class FileProcessor:
         parsers.append({
             'name': 'UnifiedParser',
             'class': UnifiedParser,
+            'options': {
+                'streaming': Config.PARSER_STREAMING,
+                'parallel': Config.PARSER_PARALLEL_SHEETS,
+                'workers': Config.PARSER_SHEET_WORKERS or None
+            },
             'priority': 1
         })
         
@@ -44,24 +54,57 @@ class FileProcessor:
         parsers.sort(key=lambda x: x['priority'])
         return parsers
     
-    def process_file(self, filename, file_path):
-        """Обработка файла с использованием доступных парсеров"""
-        print(f"\n=== НАЧАЛО ОБРАБОТКИ ФАЙЛА: {filename} ===")
-        print(f"Файл сохранен: {file_path}")
+    def select_parsers(self, filename, file_path, parser_name=None):
+        """Парсеры для файла: по раскладке книги - сразу подходящий, без перебора цепочки.
+        
+        parser_name - парсер, уже выбранный при приеме файла; неизвестная раскладка -
+        UnknownLayoutError. При PARSER_LAYOUT_CHECK='off' - вся цепочка, как раньше.
+        """
+        if parser_name is None:
+            if Config.PARSER_LAYOUT_CHECK == 'off':
+                return self.parsers
+            match = get_layout_detector().detect(file_path, filename)
+            log(f"📐 Раскладка {match.layout} ({match.fingerprint}) -> {match.parser}")
+            parser_name = match.parser
+        chosen = [parser_info for parser_info in self.parsers if parser_info['name'] == parser_name]
+        return chosen or self.parsers
+    
+    def process_file(self, filename, file_path, progress=None, content_hash=None, parser_name=None):
+        """Обработка файла с использованием доступных парсеров
+
+        progress - необязательный callback(stage, percent) для отчета о ходе обработки
+        content_hash - sha256 файла, если уже посчитан при приеме
+        parser_name - парсер, выбранный по раскладке при приеме файла
+        """
+        log(f"\n=== НАЧАЛО ОБРАБОТКИ ФАЙЛА: {filename} ===")
+        log(f"Файл сохранен: {file_path}")
         
-        # Пробуем все доступные парсеры по порядку
-        for parser_info in self.parsers:
+        try:
+            parsers = self.select_parsers(filename, file_path, parser_name)
+        except UnknownLayoutError as e:
+            log(f"❌ {e}")
+            return {
+                'error': str(e),
+                'layout': e.to_dict(),
+                'success': False
+            }
+        
+        # Пробуем подходящие парсеры по порядку
+        for parser_info in parsers:
             try:
-                print(f"Пробуем использовать парсер: {parser_info['name']}...")
+                log(f"Пробуем использовать парсер: {parser_info['name']}...")
                 result = self._process_with_parser(
                     parser_info['class'], 
                     filename, 
                     file_path,
-                    parser_info['name']
+                    parser_info['name'],
+                    parser_info.get('options'),
+                    progress,
+                    content_hash
                 )
                 return result
             except Exception as e:
-                print(f"Парсер {parser_info['name']} не сработал: {e}")
+                log(f"Парсер {parser_info['name']} не сработал: {e}")
                 continue
         
         # Если ни один парсер не сработал
@@ -70,22 +113,51 @@ class FileProcessor:
             'success': False
         }
     
-    def _process_with_parser(self, parser_class, filename, file_path, parser_name):
+    def parse_file(self, file_path):
+        """Только парсинг, без обращения к БД: (имя парсера, данные).
+        
+        Результат сериализуем (pickle), поэтому метод можно вызывать в пуле процессов,
+        а сохранять данные - отдельно через save_parsed.
+        """
+        for parser_info in self.select_parsers(os.path.basename(file_path), file_path):
+            try:
+                parser = parser_info['class'](file_path, **(parser_info.get('options') or {}))
+                return parser_info['name'], parser.parse_all()
+            except Exception as e:
+                log(f"Парсер {parser_info['name']} не сработал: {e}")
+                continue
+        raise Exception('Ни один из парсеров не смог обработать файл')
+    
+    def _process_with_parser(self, parser_class, filename, file_path, parser_name, options=None, progress=None,
+                             content_hash=None):
         """Обработка файла конкретным парсером"""
-        parser = parser_class(file_path)
+        self._report_progress(progress, f'parsing:{parser_name}', 10)
+        parser = parser_class(file_path, **(options or {}))
         all_data = parser.parse_all()
+        return self.save_parsed(filename, file_path, parser_name, all_data, progress, content_hash)
+    
+    def save_parsed(self, filename, file_path, parser_name, all_data, progress=None, content_hash=None, quiet=False):
+        """Сохранение в БД уже разобранных данных файла
+
+        quiet=True - без подробного вывода; глушится только текущий поток, sys.stdout не подменяется
+        """
+        with quiet_output(quiet):
+            return self._save_parsed(filename, file_path, parser_name, all_data, progress, content_hash)
+    
+    def _save_parsed(self, filename, file_path, parser_name, all_data, progress=None, content_hash=None):
+        self._report_progress(progress, 'saving', 50)
         
         metadata = all_data['metadata']
         
-        print(f"\n{parser_name} результаты:")
-        print(f"  Компания: {metadata['company']}")
-        print(f"  Лист 1: {len(all_data.get('sheet1', []))} записей")
-        print(f"  Лист 2: {len(all_data.get('sheet2', []))} записей")
-        print(f"  Лист 3: {len(all_data.get('sheet3', []))} записей")
-        print(f"  Лист 4: {len(all_data.get('sheet4', []))} записей")
-        print(f"  Лист 5: {len(all_data.get('sheet5', []))} записей")
-        print(f"  Лист 6: {len(all_data.get('sheet6', []))} записей")
-        print(f"  Лист 7: {len(all_data.get('sheet7', []))} записей")
+        log(f"\n{parser_name} результаты:")
+        log(f"  Компания: {metadata['company']}")
+        log(f"  Лист 1: {len(all_data.get('sheet1', []))} записей")
+        log(f"  Лист 2: {len(all_data.get('sheet2', []))} записей")
+        log(f"  Лист 3: {len(all_data.get('sheet3', []))} записей")
+        log(f"  Лист 4: {len(all_data.get('sheet4', []))} записей")
+        log(f"  Лист 5: {len(all_data.get('sheet5', []))} записей")
+        log(f"  Лист 6: {len(all_data.get('sheet6', []))} записей")
+        log(f"  Лист 7: {len(all_data.get('sheet7', []))} записей")
         
         # Сохраняем в БД информацию о файле
         file_id, company_id = db.save_uploaded_file(
@@ -95,21 +167,33 @@ class FileProcessor:
             report_date=metadata['report_date'].date()
         )
         
-        print(f"Файл сохранен в БД: ID={file_id}, Company ID={company_id}")
+        log(f"Файл сохранен в БД: ID={file_id}, Company ID={company_id}")
         
         # Сохраняем все данные
-        saved_counts = self._save_all_data(all_data, file_id, company_id, metadata)
+        saved_counts = self._save_all_data(all_data, file_id, company_id, metadata, progress)
+        # Пересчитываем итоги только для этой компании и даты
+        try:
+            db.update_consolidated_data(company_id, metadata['report_date'].date())
+            log(f"✓ Сводные итоги обновлены")
+        except Exception as e:
+            log(f"⚠️ Не удалось обновить сводные итоги: {e}")
+        # Отчеты должны видеть новые данные сразу
+        db.invalidate_aggregated_data()
         
-        # Обновляем статус файла
-        db.update_file_status(file_id, 'processed')
-        print(f"✓ Статус файла обновлен на 'processed'")
+        # Обновляем статус файла; хэш содержимого - признак, что данные файла сохранены
+        if content_hash is None and os.path.exists(file_path):
+            content_hash = file_sha256(file_path)
+        db.update_file_status(file_id, 'processed', content_hash=content_hash)
+        log(f"✓ Статус файла обновлен на 'processed'")
         
-        print(f"=== ЗАВЕРШЕНО ОБРАБОТКА ФАЙЛА: {filename} ===\n")
+        log(f"=== ЗАВЕРШЕНО ОБРАБОТКА ФАЙЛА: {filename} ===\n")
         
         return {
             'success': True,
             'message': f'Файл успешно обработан ({parser_name})',
             'company': metadata['company'],
+            'company_source': metadata.get('company_source'),
+            'parse_timings': metadata.get('timings'),
             'report_date': metadata['report_date'].strftime('%Y-%m-%d'),
             'data_extracted': {
                 'sheet1': len(all_data.get('sheet1', [])),
@@ -128,8 +212,24 @@ class FileProcessor:
             }
         }
     
-    def _save_all_data(self, all_data, file_id, company_id, metadata):
-        """Сохранение всех данных из парсера"""
+    def _report_progress(self, progress, stage, percent):
+        if progress:
+            try:
+                progress(stage, percent)
+            except Exception as e:
+                log(f"⚠️ Не удалось обновить прогресс: {e}")
+    
+    def _save_all_data(self, all_data, file_id, company_id, metadata, progress=None):
+        """Сохранение всех данных из парсера: сначала одной пакетной транзакцией,
+        при ошибке - по листам через ORM (ошибка одного листа не мешает остальным)"""
+        self._report_progress(progress, 'saving', 50)
+        try:
+            saved_counts = db.save_all_sheets_bulk(file_id, company_id, metadata['report_date'].date(), all_data)
+            log(f"✓ Данные сохранены пакетно: {saved_counts}")
+            return saved_counts
+        except Exception as e:
+            log(f"⚠️ Пакетное сохранение не удалось ({e}), сохраняем по листам")
+        
         saved_counts = {}
         
         # Сохраняем данные из каждого листа
@@ -143,7 +243,8 @@ class FileProcessor:
             'sheet7': (db.save_sheet7_data, 'Sheet7 сохранен'),
         }
         
-        for sheet_key, (save_func, success_msg) in save_functions.items():
+        for index, (sheet_key, (save_func, success_msg)) in enumerate(save_functions.items()):
+            self._report_progress(progress, f'saving:{sheet_key}', 50 + index * 45 // len(save_functions))
             if all_data.get(sheet_key):
                 try:
                     data = all_data[sheet_key]
@@ -155,9 +256,9 @@ class FileProcessor:
                         # Для остальных листов передаем список
                         save_func(file_id, company_id, metadata['report_date'].date(), data)
                         saved_counts[sheet_key] = len(data)
-                    print(f"✓ {success_msg}: {saved_counts[sheet_key]} записей")
+                    log(f"✓ {success_msg}: {saved_counts[sheet_key]} записей")
                 except Exception as e:
-                    print(f"✗ Ошибка сохранения {sheet_key}: {e}")
+                    log(f"✗ Ошибка сохранения {sheet_key}: {e}")
                     saved_counts[sheet_key] = 0
                     traceback.print_exc()
         
@@ -0,0 +1,295 @@
+# app/services/job_queue.py
+"""
+Очередь фоновых задач (обработка загруженных файлов и т.п.)
+
+Бэкенды:
+  memory - пул потоков внутри процесса (по умолчанию, используется и в тестах)
+  redis  - задачи и их статусы хранятся в Redis, поэтому статус доступен из любого
+           gunicorn-воркера, а выполняет задачу любой свободный воркер
+"""
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+
+# Статусы задачи
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """Базовый класс очереди: регистрация обработчиков, постановка задач, статусы"""
+
+    JOB_TTL = 24 * 60 * 60  # статусы храним сутки
+
+    def __init__(self):
+        self.handlers: Dict[str, Callable] = {}
+
+    def register(self, job_type: str, handler: Callable):
+        """Обработчик: handler(payload: dict, progress: callable(stage, percent)) -> dict"""
+        self.handlers[job_type] = handler
+
+    def submit(self, job_type: str, payload: Dict[str, Any]) -> str:
+        if job_type not in self.handlers:
+            raise ValueError(f"Неизвестный тип задачи: {job_type}")
+
+        job_id = uuid.uuid4().hex
+        self._save(job_id, {
+            'id': job_id,
+            'type': job_type,
+            'status': QUEUED,
+            'progress': {'stage': 'queued', 'percent': 0},
+            'result': None,
+            'error': None,
+            'created_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+        })
+        self._enqueue(job_id, job_type, payload)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields):
+        job = self.get(job_id)
+        if job is None:
+            return
+        job.update(fields)
+        self._save(job_id, job)
+
+    def _run(self, job_id: str, job_type: str, payload: Dict[str, Any]):
+        """Выполнение задачи в фоновом потоке"""
+        self.update(job_id, status=RUNNING, started_at=datetime.now().isoformat())
+
+        def progress(stage: str, percent: int):
+            self.update(job_id, progress={'stage': stage, 'percent': percent})
+
+        try:
+            result = self.handlers[job_type](payload, progress)
+            status = DONE if result.get('success', True) else FAILED
+            self.update(job_id, status=status, result=result, error=result.get('error'),
+                        progress={'stage': 'finished', 'percent': 100},
+                        finished_at=datetime.now().isoformat())
+        except Exception as e:
+            print(f"❌ Ошибка задачи {job_type} ({job_id}): {e}")
+            traceback.print_exc()
+            self.update(job_id, status=FAILED, error=str(e),
+                        finished_at=datetime.now().isoformat())
+
+    def _save(self, job_id: str, job: Dict[str, Any]):
+        raise NotImplementedError
+
+    def _enqueue(self, job_id: str, job_type: str, payload: Dict[str, Any]):
+        raise NotImplementedError
+
+
+class InProcessJobQueue(JobQueue):
+    """Очередь в памяти процесса на пуле потоков
+
+    Завершенные задачи удаляются через JOB_TTL (как истекающие ключи Redis), а сверх
+    MAX_FINISHED_JOBS - начиная с самых давних, чтобы словарь не рос с каждой загрузкой"""
+
+    MAX_FINISHED_JOBS = 1000
+
+    def __init__(self, workers: int = 2, ttl: int = None, max_finished: int = None):
+        super().__init__()
+        self.workers = workers
+        self.ttl = self.JOB_TTL if ttl is None else ttl
+        self.max_finished = self.MAX_FINISHED_JOBS if max_finished is None else max_finished
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        # Завершенные задачи в порядке завершения: job_id -> time.monotonic()
+        self._finished: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _save(self, job_id: str, job: Dict[str, Any]):
+        with self._lock:
+            self.jobs[job_id] = dict(job)
+            if job['status'] in (DONE, FAILED) and job_id not in self._finished:
+                self._finished[job_id] = time.monotonic()
+            self._evict_finished()
+
+    def _evict_finished(self):
+        """Вызывается под self._lock; очередные и выполняющиеся задачи не трогает"""
+        expired_before = time.monotonic() - self.ttl
+        while self._finished:
+            job_id, finished_at = next(iter(self._finished.items()))
+            if len(self._finished) <= self.max_finished and finished_at > expired_before:
+                break
+            del self._finished[job_id]
+            self.jobs.pop(job_id, None)
+
+    def _enqueue(self, job_id: str, job_type: str, payload: Dict[str, Any]):
+        # Пул создается лениво - уже в процессе воркера gunicorn, а не в мастере
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job-worker')
+        self._executor.submit(self._run, job_id, job_type, payload)
+
+
+class RedisJobQueue(JobQueue):
+    """Очередь в Redis: список с задачами + ключ со статусом каждой задачи
+
+    Воркер забирает сообщение BLMOVE в свой список jobs:processing:<воркер> и удаляет
+    его оттуда только после выполнения. Каждый процесс обновляет ключ-пульс; списки
+    воркеров без пульса (процесс gunicorn перезапущен или убит посреди задачи) разбирает
+    любой живой процесс: не начатые задачи возвращаются в очередь, начатые - failed,
+    чтобы статус не оставался running до истечения JOB_TTL."""
+
+    QUEUE_KEY = 'jobs:queue'
+    JOB_KEY = 'jobs:{}'
+    PROCESSING_KEY = 'jobs:processing:{}'
+    HEARTBEAT_KEY = 'jobs:heartbeat:{}'
+    WORKERS_KEY = 'jobs:workers'  # множество процессов, у которых могут быть списки processing
+    RECOVERY_LOCK_KEY = 'jobs:recovery'
+    HEARTBEAT_TTL = 30
+    RECOVERY_INTERVAL = 30
+
+    def __init__(self, redis_url: str, workers: int = 2):
+        super().__init__()
+        import redis  # опциональная зависимость, нужна только для этого бэкенда
+
+        self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.workers = workers
+        self.process_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._threads = []
+        self._threads_lock = threading.Lock()
+
+    def register(self, job_type: str, handler: Callable):
+        super().register(job_type, handler)
+        # Каждый процесс, знающий обработчики, забирает задачи из общей очереди
+        self._start_workers()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.redis.get(self.JOB_KEY.format(job_id))
+        return json.loads(raw) if raw else None
+
+    def _save(self, job_id: str, job: Dict[str, Any]):
+        self.redis.set(self.JOB_KEY.format(job_id), json.dumps(job, default=str), ex=self.JOB_TTL)
+
+    def _enqueue(self, job_id: str, job_type: str, payload: Dict[str, Any]):
+        self._start_workers()
+        self.redis.rpush(self.QUEUE_KEY, json.dumps({'id': job_id, 'type': job_type, 'payload': payload}))
+
+    def _start_workers(self):
+        """Потоки-потребители запускаются в каждом процессе, где используется очередь"""
+        with self._threads_lock:
+            if self._threads:
+                return
+            self._heartbeat()
+            thread = threading.Thread(target=self._heartbeat_loop, name='redis-job-heartbeat', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, args=(i,), name=f'redis-job-worker-{i}',
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _heartbeat(self):
+        self.redis.sadd(self.WORKERS_KEY, self.process_id)
+        self.redis.set(self.HEARTBEAT_KEY.format(self.process_id), datetime.now().isoformat(),
+                       ex=self.HEARTBEAT_TTL)
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self.HEARTBEAT_TTL / 3)
+            try:
+                self._heartbeat()
+            except Exception as e:
+                print(f"⚠️ Ошибка пульса очереди: {e}")
+
+    def _worker_loop(self, index: int):
+        processing_key = self.PROCESSING_KEY.format(f"{self.process_id}:{index}")
+        next_recovery = 0.0
+        while True:
+            try:
+                # Первый поток при запуске и затем периодически разбирает задачи умерших воркеров
+                if index == 0 and time.monotonic() >= next_recovery:
+                    self.recover_abandoned()
+                    next_recovery = time.monotonic() + self.RECOVERY_INTERVAL
+                self._work_once(processing_key)
+            except Exception as e:
+                print(f"⚠️ Ошибка воркера очереди: {e}")
+                time.sleep(1)
+
+    def _work_once(self, processing_key: str, timeout: int = 5):
+        """Одна задача из очереди; сообщение остается в processing_key, пока задача выполняется"""
+        raw = self.redis.blmove(self.QUEUE_KEY, processing_key, timeout, 'LEFT', 'RIGHT')
+        if not raw:
+            return
+        try:
+            message = json.loads(raw)
+            if message['type'] not in self.handlers:
+                self.update(message['id'], status=FAILED, error=f"Неизвестный тип задачи: {message['type']}")
+                return
+            self._run(message['id'], message['type'], message['payload'])
+        finally:
+            self.redis.lrem(processing_key, 1, raw)
+
+    def recover_abandoned(self) -> int:
+        """Задачи из списков processing процессов без пульса; возвращает их число"""
+        # Разбор идет под блокировкой: живые процессы не берут один список одновременно
+        if not self.redis.set(self.RECOVERY_LOCK_KEY, self.process_id, nx=True, ex=self.RECOVERY_INTERVAL):
+            return 0
+        recovered = 0
+        try:
+            for process_id in self.redis.smembers(self.WORKERS_KEY):
+                if process_id == self.process_id or self.redis.exists(self.HEARTBEAT_KEY.format(process_id)):
+                    continue
+                for processing_key in self.redis.scan_iter(match=self.PROCESSING_KEY.format(f"{process_id}:*")):
+                    while self._recover_one(processing_key):
+                        recovered += 1
+                self.redis.srem(self.WORKERS_KEY, process_id)
+        finally:
+            self.redis.delete(self.RECOVERY_LOCK_KEY)
+        if recovered:
+            print(f"♻️ Очередь: разобрано задач остановленных воркеров: {recovered}")
+        return recovered
+
+    def _recover_one(self, processing_key: str) -> bool:
+        raw = self.redis.lindex(processing_key, 0)
+        if raw is None:
+            return False
+        message = json.loads(raw)
+        job = self.get(message['id'])
+        if job is not None and job['status'] == QUEUED:
+            # Задача не начиналась - обратно в очередь
+            self.redis.lmove(processing_key, self.QUEUE_KEY, 'LEFT', 'RIGHT')
+            return True
+        self.redis.lpop(processing_key)
+        if job is not None and job['status'] == RUNNING:
+            self.update(message['id'], status=FAILED, error='Воркер остановлен во время выполнения задачи',
+                        finished_at=datetime.now().isoformat())
+        return True
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Общая для процесса очередь, бэкенд выбирается Config.JOB_QUEUE_BACKEND"""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            if Config.JOB_QUEUE_BACKEND == 'redis':
+                _job_queue = RedisJobQueue(Config.REDIS_URL, workers=Config.JOB_WORKERS)
+            else:
+                _job_queue = InProcessJobQueue(workers=Config.JOB_WORKERS)
+        return _job_queue
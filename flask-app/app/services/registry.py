@@ -0,0 +1,115 @@
+# app/services/registry.py
+"""
+Реестр общих для процесса сервисов с ленивой инициализацией.
+
+Раньше маршруты создавали FileProcessor() и DatabaseQueries() на каждый запрос;
+конструктор FileProcessor каждый раз заново искал необязательные парсеры
+(import parser.simple_all_parser... - неудачный импорт не кэшируется и каждый раз
+просматривает sys.path). Здесь каждый сервис создается один раз на процесс
+(gunicorn-воркер) при первом обращении и дальше переиспользуется.
+
+В реестре только сервисы без состояния запроса. TemplateReportGenerator хранит
+состояние одного отчета (timings, кэш стилей), поэтому создается на каждый отчет.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict
+
+
+class ServiceRegistry:
+    """Имя -> фабрика; экземпляр создается при первом get и хранится до reset"""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._init_seconds: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Неизвестный сервис: {name}")
+                started = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self._init_seconds[name] = round(time.perf_counter() - started, 6)
+            return self._instances[name]
+
+    def warm_up(self, *names: str):
+        """Создает сервисы заранее (например, при старте воркера); без имен - все"""
+        for name in names or list(self._factories):
+            self.get(name)
+
+    def reset(self, name: str = None):
+        """Сбрасывает экземпляр (или все) - следующий get создаст его заново"""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+                self._init_seconds.clear()
+            else:
+                self._instances.pop(name, None)
+                self._init_seconds.pop(name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'registered': sorted(self._factories),
+                'initialized': dict(self._init_seconds),
+            }
+
+
+def _file_processor():
+    from app.services.file_processor import FileProcessor
+    return FileProcessor()
+
+
+def _queries():
+    from database.queries import db
+    return db
+
+
+def _company_resolver():
+    from app_parser.company_resolver import get_company_resolver
+    return get_company_resolver()
+
+
+def _company_directory():
+    from app_parser.company_resolver import get_company_directory
+    return get_company_directory()
+
+
+def _layout_detector():
+    from app_parser.layout_fingerprint import get_layout_detector
+    return get_layout_detector()
+
+
+def _upload_deduplicator():
+    from app.services.upload_dedup import get_upload_deduplicator
+    return get_upload_deduplicator()
+
+
+services = ServiceRegistry()
+services.register('file_processor', _file_processor)
+services.register('queries', _queries)
+services.register('company_resolver', _company_resolver)
+services.register('company_directory', _company_directory)
+services.register('layout_detector', _layout_detector)
+services.register('upload_deduplicator', _upload_deduplicator)
+
+
+def get_file_processor():
+    """FileProcessor с цепочкой парсеров, найденной один раз на процесс"""
+    return services.get('file_processor')
+
+
+def get_queries():
+    """Общий DatabaseQueries (без состояния, сессии - через scoped_session)"""
+    return services.get('queries')
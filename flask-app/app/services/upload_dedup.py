@@ -0,0 +1,94 @@
+# app/services/upload_dedup.py
+"""
+Дедупликация загрузок по содержимому.
+
+Компании часто присылают один и тот же файл несколько раз в день. sha256 файла
+считается при приеме (app/services/upload_stream.py); хэш сохраняется в
+UploadedFile.content_hash после записи данных файла в БД. Если такой же файл уже
+обработан за сегодняшнюю дату отчета для той же компании, разбор и запись в БД
+пропускаются и возвращается прежний результат.
+
+Счетчики попаданий/промахов - /api/upload-dedup-stats и метрика upload_dedup_total.
+"""
+import threading
+from datetime import date
+from typing import Any, Dict, Optional
+
+from app_parser.company_resolver import get_company_resolver
+from config import Config
+from database.queries import db
+
+try:
+    from prometheus_client import Counter
+    _DEDUP_EVENTS = Counter('upload_dedup_total', 'Проверки загрузок на повтор по содержимому', ['result'])
+except ImportError:  # метрики необязательны
+    _DEDUP_EVENTS = None
+
+
+class UploadDeduplicator:
+    """Поиск прежнего результата для повторной загрузки и счетчики попаданий"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def find_previous(self, filename: str, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Результат прежней обработки такого же файла (в формате FileProcessor) или None"""
+        if not Config.UPLOAD_DEDUP_ENABLED:
+            return None
+        # Дата отчета при разборе - дата загрузки, поэтому повтор ищется за сегодня
+        previous = db.find_processed_upload(content_hash, date.today())
+        # Компания определяется сначала по имени файла: то же содержимое под именем
+        # другой компании - не повтор
+        if previous:
+            company_by_name = get_company_resolver().resolve(filename.lower(), partial=False)
+            if company_by_name and company_by_name != previous['company']:
+                previous = None
+        self._count('hit' if previous else 'miss')
+        if previous is None:
+            return None
+
+        return {
+            'success': True,
+            'duplicate': True,
+            'message': f"Файл уже обработан ({previous['upload_date']:%H:%M %d.%m.%Y}), данные не изменились",
+            'company': previous['company'],
+            'report_date': previous['report_date'].strftime('%Y-%m-%d'),
+            'data_extracted': previous['counts'],
+            'data_saved': {key: count for key, count in previous['counts'].items() if count},
+            'file_info': {
+                'file_id': previous['file_id'],
+                'company_id': previous['company_id'],
+                'filename': previous['filename']
+            }
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'enabled': Config.UPLOAD_DEDUP_ENABLED,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+            }
+
+    def _count(self, result: str):
+        with self._lock:
+            if result == 'hit':
+                self.hits += 1
+            else:
+                self.misses += 1
+        if _DEDUP_EVENTS is not None:
+            _DEDUP_EVENTS.labels(result=result).inc()
+
+
+_deduplicator = None
+
+
+def get_upload_deduplicator() -> UploadDeduplicator:
+    global _deduplicator
+    if _deduplicator is None:
+        _deduplicator = UploadDeduplicator()
+    return _deduplicator
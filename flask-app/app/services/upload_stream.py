@@ -0,0 +1,107 @@
+# app/services/upload_stream.py
+"""
+Прием загружаемых файлов потоком.
+
+Werkzeug по умолчанию собирает файл из multipart-запроса в памяти (до 500 КБ) или во
+временном файле, после чего file.save() копирует его еще раз. UploadRequest подменяет
+хранилище файла: части запроса сразу пишутся во временный файл в UPLOAD_FOLDER, по
+мере поступления считается sha256, проверяется сигнатура xlsx (zip: PK\\x03\\x04) и
+размер. Файл с другой сигнатурой или больше лимита отклоняется, не дочитываясь до конца.
+
+Принятый файл переносится на место одним os.replace под уникальным именем, поэтому
+одновременные загрузки с одинаковым secure_filename не перезаписывают друг друга.
+Временный файл, который не был перенесен, удаляется при закрытии запроса.
+"""
+import hashlib
+import os
+import tempfile
+import uuid
+from datetime import datetime
+
+from flask import Request, current_app
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+XLSX_SIGNATURE = b'PK\x03\x04'
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTempFile:
+    """Временный файл загрузки: запись с подсчетом sha256, проверкой сигнатуры и размера"""
+
+    def __init__(self, directory: str, max_bytes: int = None):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._digest = hashlib.sha256()
+        self._head = b''
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.committed = False
+
+    def write(self, data) -> int:
+        if len(self._head) < len(XLSX_SIGNATURE):
+            self._head += bytes(data[:len(XLSX_SIGNATURE) - len(self._head)])
+            if len(self._head) == len(XLSX_SIGNATURE) and self._head != XLSX_SIGNATURE:
+                self.close()
+                raise BadRequest('Файл не является книгой Excel (.xlsx)')
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.close()
+            raise RequestEntityTooLarge(f'Файл больше {self.max_bytes // (1024 * 1024)} МБ')
+        self._digest.update(data)
+        return self._file.write(data)
+
+    @property
+    def is_xlsx(self) -> bool:
+        return self._head == XLSX_SIGNATURE
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    def commit(self, target_path: str):
+        """Переносит принятый файл на место (атомарно в пределах одной файловой системы)"""
+        self._file.close()
+        os.replace(self.path, target_path)
+        self.path = target_path
+        self.committed = True
+
+    def close(self):
+        self._file.close()
+        if not self.committed and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # read, readline, seek, tell, flush - для FileStorage и парсера multipart
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Запрос, файлы которого пишутся прямо в UploadTempFile (app.request_class)"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        upload_file = UploadTempFile(current_app.config['UPLOAD_FOLDER'],
+                                     current_app.config.get('MAX_CONTENT_LENGTH'))
+        self._upload_files = getattr(self, '_upload_files', []) + [upload_file]
+        return upload_file
+
+    def close(self):
+        # Оборванная или отклоненная загрузка не оставляет временных файлов
+        for upload_file in getattr(self, '_upload_files', []):
+            upload_file.close()
+        super().close()
+
+
+def unique_upload_path(directory: str, filename: str) -> str:
+    """uploads/<имя>_<время>_<случайный суффикс>.xlsx - исходное имя остается в начале
+    (по нему определяется компания), суффикс исключает перезапись при одновременных загрузках"""
+    stem, ext = os.path.splitext(filename)
+    return os.path.join(directory, f"{stem}_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}{ext}")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,177 @@
+# app_parser/company_resolver.py
+"""
+Определение компании по тексту: имени файла, ячейке, названию из БД.
+
+Раньше каждое место (нормализация в DatabaseQueries, метаданные и содержимое в
+UnifiedParser, строки поставщиков в генераторе отчета) проверяло свой список подстрок
+по очереди. Здесь все псевдонимы собраны в одно регулярное выражение: за один проход
+по строке находятся все вхождения, побеждает псевдоним компании с наивысшим
+приоритетом (порядок COMPANY_ALIASES). Результаты запоминаются в LRU-кэше - одни и те
+же названия повторяются в каждой строке и каждом файле.
+
+scan_workbook ищет компанию в содержимом книги: только шапки листов, листы с данными
+компаний первыми, до первого совпадения; возвращает лист и ячейку совпадения.
+
+CompanyDirectory - кэш таблицы companies на процесс вместо session.query(Company).all()
+при каждой загрузке; перечитывается после добавления компании и при промахе
+(компанию мог добавить другой процесс).
+"""
+import re
+import threading
+from functools import lru_cache
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+from openpyxl.utils import get_column_letter
+
+UNKNOWN_COMPANY = 'Неизвестная компания'
+
+# Компании в порядке приоритета и их псевдонимы (нижний регистр, подстроки)
+COMPANY_ALIASES = [
+    ('Саханефтегазсбыт', ['саханефтегазсбыт', 'саха нефтегазсбыт', 'снгс', 'санги', 'sngs']),
+    ('Туймаада-Нефть', ['туймаада-нефть', 'туймаада нефть', 'туймааданефть', 'туймаада', 'tumaada']),
+    ('Сибойл', ['сибойл', 'сибирьойл', 'сибирь ойл', 'siboil']),
+    ('ЭКТО-Ойл', ['экто-ойл', 'эктоойл', 'экто ойл', 'экто', 'ecto-oil']),
+    ('Сибирское топливо', ['сибирское топливо', 'сибирское', 'сибтопливо', 'sibtoplivo']),
+    ('Паритет', ['паритет', 'paritet']),
+]
+
+# Листы, где название компании стоит в первых строках данных (колонки B-C), -
+# просматриваются первыми; справочники (список регионов) - последними
+COMPANY_SHEETS = ['3-Остатки', '4-Поставка', '5-Реализация', '1-Структура']
+REFERENCE_SHEETS = {'Справочник'}
+# Область просмотра содержимого: шапка и первые строки данных каждого листа
+SCAN_MAX_ROW = 50
+SCAN_MAX_COL = 9
+
+# Составные признаки: все части должны встретиться в строке (после псевдонимов)
+COMPANY_PARTS = [
+    (['саха', 'нефтегазсбыт'], 'Саханефтегазсбыт'),
+    (['туймаада', 'нефть'], 'Туймаада-Нефть'),
+    (['сиб', 'ойл'], 'Сибойл'),
+    (['сибирск', 'топливо'], 'Сибирское топливо'),
+    (['экто', 'ойл'], 'ЭКТО-Ойл'),
+]
+
+
+class CompanyMatch(NamedTuple):
+    company: str
+    sheet: str
+    cell: str   # адрес ячейки, например 'C9'
+    value: str  # текст ячейки
+
+
+class CompanyResolver:
+    """Псевдонимы компаний, скомпилированные в одно регулярное выражение"""
+
+    def __init__(self, aliases=COMPANY_ALIASES, parts=COMPANY_PARTS, cache_size: int = 4096):
+        self._aliases = {}
+        for priority, (company, company_aliases) in enumerate(aliases):
+            for alias in company_aliases:
+                self._aliases.setdefault(alias, (priority, company))
+        # Просмотр вперед находит псевдонимы с каждой позиции, в том числе перекрывающиеся;
+        # длинные варианты раньше коротких, чтобы 'экто-ойл' не терялся за 'экто'
+        alternatives = sorted(self._aliases, key=len, reverse=True)
+        self._pattern = re.compile('(?=(' + '|'.join(map(re.escape, alternatives)) + '))')
+        self._parts = parts
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, text: str, partial: bool = True) -> Optional[str]:
+        """Каноническое название компании в тексте или None.
+        partial=False - только псевдонимы, без составных признаков"""
+        lower = str(text).lower()
+        best = None
+        for match in self._pattern.finditer(lower):
+            candidate = self._aliases[match.group(1)]
+            if best is None or candidate[0] < best[0]:
+                best = candidate
+                if best[0] == 0:
+                    break
+        if best is not None:
+            return best[1]
+        if partial:
+            for company_parts, company in self._parts:
+                if all(part in lower for part in company_parts):
+                    return company
+        return None
+
+    def scan_workbook(self, wb, max_row: int = SCAN_MAX_ROW, max_col: int = SCAN_MAX_COL) -> Optional[CompanyMatch]:
+        """Первая компания в шапках листов: только прямоугольник max_row x max_col каждого
+        листа, построчно (в read_only книга дальше max_row не читается), листы с данными
+        компаний - первыми. Останавливается на первом совпадении псевдонима."""
+        for sheet_name in scan_order(wb.sheetnames):
+            ws = wb[sheet_name]
+            # Границы листа: в обычном режиме iter_rows за пределами данных создает пустые ячейки
+            rows = ws.iter_rows(min_row=1, max_row=min(max_row, ws.max_row or max_row),
+                                max_col=min(max_col, ws.max_column or max_col), values_only=True)
+            for row, values in enumerate(rows, 1):
+                for col, value in enumerate(values, 1):
+                    if value and isinstance(value, str):
+                        company = self.resolve(value, partial=False)
+                        if company:
+                            return CompanyMatch(company, sheet_name, f"{get_column_letter(col)}{row}", value)
+        return None
+
+
+def scan_order(sheetnames: List[str]) -> List[str]:
+    """Листы в порядке просмотра: сначала листы с названиями компаний, справочник - последним"""
+    priority = {name: index for index, name in enumerate(COMPANY_SHEETS)}
+    return sorted(sheetnames, key=lambda name: (name in REFERENCE_SHEETS, priority.get(name, len(priority))))
+
+
+class CompanyDirectory:
+    """Кэш (id, название) таблицы companies на процесс"""
+
+    def __init__(self):
+        self._companies: Optional[List[Tuple[int, str, str]]] = None
+        self._lock = threading.Lock()
+
+    def find(self, name: str, load: Callable[[], Iterable[Tuple[int, str]]]) -> Optional[Tuple[int, str, bool]]:
+        """(id, название, точное совпадение) компании для name; load - запрос (id, name) из БД"""
+        companies = self._companies
+        reloaded = companies is None
+        if reloaded:
+            companies = self._reload(load)
+        found = self._match(companies, name)
+        if found is None and not reloaded:
+            found = self._match(self._reload(load), name)
+        return found
+
+    def invalidate(self):
+        with self._lock:
+            self._companies = None
+
+    def _reload(self, load) -> List[Tuple[int, str, str]]:
+        companies = [(company_id, company_name, company_name.lower()) for company_id, company_name in load()]
+        with self._lock:
+            self._companies = companies
+        return companies
+
+    @staticmethod
+    def _match(companies, name: str) -> Optional[Tuple[int, str, bool]]:
+        # Сначала точное совпадение, затем вхождение одного названия в другое
+        name_lower = name.lower()
+        for company_id, company_name, company_lower in companies:
+            if company_lower == name_lower:
+                return company_id, company_name, True
+        for company_id, company_name, company_lower in companies:
+            if name_lower in company_lower or company_lower in name_lower:
+                return company_id, company_name, False
+        return None
+
+
+_resolver = None
+_directory = None
+
+
+def get_company_resolver() -> CompanyResolver:
+    global _resolver
+    if _resolver is None:
+        _resolver = CompanyResolver()
+    return _resolver
+
+
+def get_company_directory() -> CompanyDirectory:
+    global _directory
+    if _directory is None:
+        _directory = CompanyDirectory()
+    return _directory
@@ -0,0 +1,271 @@
+# app_parser/layout_fingerprint.py
+"""
+Быстрое определение раскладки загруженной книги до разбора.
+
+FileProcessor перебирал парсеры по очереди и переходил к следующему только после
+исключения, а UnifiedParser сам гасит ошибки листов, поэтому файл в чужом формате
+полностью разбирался (и сохранялся пустым), прежде чем что-то выяснялось.
+
+Здесь книга читается как zip напрямую, без openpyxl: список листов из
+xl/workbook.xml и несколько ячеек шапки (строки 1-5, колонки A-D) листов 3-6 -
+потоковым разбором XML с остановкой после шапки; из sharedStrings.xml читается
+только начало, до нужных строк. По листам и шапке выбирается парсер из LAYOUTS,
+неизвестная раскладка отклоняется с причиной.
+
+Отпечатки кэшируются по компаниям (компания - по имени файла): если компания
+прислала книгу с тем же набором листов, что и раньше, шапки не читаются.
+"""
+import hashlib
+import re
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app_parser.company_resolver import get_company_resolver
+
+_MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Шапка листа, по которой определяется раскладка
+HEADER_ROWS = 5
+HEADER_COLS = 4
+
+# Известные раскладки: лист -> слова, одно из которых должно быть в шапке листа
+LAYOUTS = [
+    {
+        'name': 'company_form',
+        'parser': 'UnifiedParser',
+        'sheets': {
+            '3-Остатки': ('остат', 'наличи'),
+            '4-Поставка': ('поставк',),
+            '5-Реализация': ('реализац',),
+            '6-Авиатопливо': ('авиа', 'аэропорт'),
+        },
+    },
+]
+
+_CELL_REF = re.compile(r'([A-Z]+)(\d+)')
+
+
+class LayoutMatch(NamedTuple):
+    layout: str
+    parser: str
+    fingerprint: str
+    cached: bool  # решение взято из кэша компании (шапки не читались)
+
+
+class UnknownLayoutError(ValueError):
+    """Книга не подходит ни под одну известную раскладку"""
+
+    def __init__(self, message: str, fingerprint: str = None, sheets: List[str] = None):
+        super().__init__(message)
+        self.fingerprint = fingerprint
+        self.sheets = sheets or []
+
+    def to_dict(self) -> Dict:
+        return {'reason': str(self), 'fingerprint': self.fingerprint, 'sheets': self.sheets}
+
+
+class WorkbookHeaders:
+    """Список листов и ячейки шапки книги, прочитанные прямо из xlsx-архива"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path)
+        self._sheet_paths = self._read_sheet_paths()
+        self.sheetnames = list(self._sheet_paths)
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def header_cells(self, sheet_names, max_row: int = HEADER_ROWS, max_col: int = HEADER_COLS) -> Dict[str, Dict[str, str]]:
+        """{лист: {адрес: текст}} - непустые ячейки прямоугольника max_row x max_col"""
+        raw = {name: self._read_sheet_head(self._sheet_paths[name], max_row, max_col)
+               for name in sheet_names if name in self._sheet_paths}
+        needed = {int(value) for cells in raw.values() for kind, value in cells.values() if kind == 's'}
+        shared = self._read_shared_strings(max(needed) if needed else -1)
+        return {
+            name: {ref: (shared[int(value)] if kind == 's' else value) for ref, (kind, value) in cells.items()}
+            for name, cells in raw.items()
+        }
+
+    def _read_sheet_paths(self) -> Dict[str, str]:
+        rels = ET.fromstring(self._zip.read('xl/_rels/workbook.xml.rels'))
+        targets = {rel.get('Id'): rel.get('Target') for rel in rels.iter(f'{_PKG_REL_NS}Relationship')}
+        workbook = ET.fromstring(self._zip.read('xl/workbook.xml'))
+        paths = {}
+        for sheet in workbook.iter(f'{_MAIN_NS}sheet'):
+            target = targets.get(sheet.get(f'{_REL_NS}id'), '')
+            paths[sheet.get('name')] = target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+        return paths
+
+    def _read_sheet_head(self, sheet_path: str, max_row: int, max_col: int) -> Dict[str, Tuple[str, str]]:
+        """Ячейки шапки: адрес -> (тип, значение); разбор останавливается после max_row"""
+        cells = {}
+        with self._zip.open(sheet_path) as f:
+            for _, element in ET.iterparse(f):
+                if element.tag == f'{_MAIN_NS}row':
+                    if int(element.get('r', 0)) >= max_row:
+                        break
+                    element.clear()
+                elif element.tag == f'{_MAIN_NS}c':
+                    ref = _CELL_REF.match(element.get('r', ''))
+                    if ref and int(ref.group(2)) <= max_row and _column_index(ref.group(1)) <= max_col:
+                        kind = element.get('t', 'n')
+                        if kind == 'inlineStr':
+                            value = ''.join(t.text or '' for t in element.iter(f'{_MAIN_NS}t'))
+                        else:
+                            value = element.findtext(f'{_MAIN_NS}v')
+                        if value:
+                            cells[ref.group(0)] = (kind, value)
+        return cells
+
+    def _read_shared_strings(self, last_index: int) -> List[str]:
+        """Общие строки книги с 0 по last_index - остальная часть файла не читается"""
+        strings = []
+        if last_index < 0 or 'xl/sharedStrings.xml' not in self._zip.namelist():
+            return strings
+        with self._zip.open('xl/sharedStrings.xml') as f:
+            for _, element in ET.iterparse(f):
+                if element.tag == f'{_MAIN_NS}si':
+                    strings.append(''.join(t.text or '' for t in element.iter(f'{_MAIN_NS}t')))
+                    element.clear()
+                    if len(strings) > last_index:
+                        break
+        return strings
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index
+
+
+def _normalize(text: str) -> str:
+    return ' '.join(str(text).lower().split())
+
+
+def fingerprint(sheetnames: List[str], headers: Dict[str, Dict[str, str]] = None) -> str:
+    """Короткий отпечаток раскладки: листы книги и (если есть) тексты шапок"""
+    digest = hashlib.sha1('\x1f'.join(sheetnames).encode('utf-8'))
+    for name in sorted(headers or {}):
+        for ref, value in sorted(headers[name].items()):
+            digest.update(f'\x1e{name}!{ref}={_normalize(value)}'.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def match_layout(sheetnames: List[str], headers: Dict[str, Dict[str, str]] = None) -> Tuple[Optional[dict], str]:
+    """(раскладка, причина отказа); headers=None - проверяются только листы"""
+    reasons = []
+    for layout in LAYOUTS:
+        missing = [name for name in layout['sheets'] if name not in sheetnames]
+        if missing:
+            reasons.append(f"{layout['name']}: нет листов {', '.join(missing)}")
+            continue
+        if headers is not None:
+            mismatched = [
+                name for name, words in layout['sheets'].items()
+                if not any(word in _normalize(' '.join(headers.get(name, {}).values())) for word in words)
+            ]
+            if mismatched:
+                reasons.append(f"{layout['name']}: шапка листов {', '.join(mismatched)} не похожа на форму")
+                continue
+        return layout, None
+    return None, '; '.join(reasons)
+
+
+class LayoutDetector:
+    """Выбор парсера по раскладке книги с кэшем отпечатков по компаниям"""
+
+    def __init__(self, check_headers: bool = True):
+        self.check_headers = check_headers
+        # компания -> набор листов -> LayoutMatch
+        self._by_company: Dict[str, Dict[Tuple[str, ...], LayoutMatch]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def detect(self, file_path: str, filename: str = None) -> LayoutMatch:
+        """Раскладка книги или UnknownLayoutError (в том числе для поврежденного архива)"""
+        company = get_company_resolver().resolve((filename or file_path).lower(), partial=False)
+        try:
+            with WorkbookHeaders(file_path) as workbook:
+                sheets = tuple(workbook.sheetnames)
+                cached = self._by_company.get(company, {}).get(sheets) if company else None
+                if cached is not None:
+                    self._count('hits')
+                    return cached._replace(cached=True)
+
+                # Нет нужных листов - отказ без чтения шапок
+                headers = None
+                layout, reason = match_layout(list(sheets))
+                if layout is not None and self.check_headers:
+                    headers = workbook.header_cells(self._layout_sheets(sheets))
+                    layout, reason = match_layout(list(sheets), headers)
+        except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+            self._count('rejected')
+            raise UnknownLayoutError(f"Файл не читается как книга Excel: {e}")
+
+        layout_fingerprint = fingerprint(list(sheets), headers)
+        if layout is None:
+            self._count('rejected')
+            raise UnknownLayoutError(f"Неизвестная раскладка книги ({reason})", layout_fingerprint, list(sheets))
+
+        match = LayoutMatch(layout['name'], layout['parser'], layout_fingerprint, False)
+        self._count('misses')
+        if company:
+            with self._lock:
+                known = self._by_company.setdefault(company, {})
+                if known and sheets not in known:
+                    print(f"⚠️ {company}: новая раскладка книги (отпечаток {layout_fingerprint})")
+                known[sheets] = match
+        return match
+
+    def forget(self, company: str = None):
+        """Сбрасывает кэш отпечатков компании (или всех)"""
+        with self._lock:
+            if company is None:
+                self._by_company.clear()
+            else:
+                self._by_company.pop(company, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'check_headers': self.check_headers,
+                'hits': self.hits,
+                'misses': self.misses,
+                'rejected': self.rejected,
+                'companies': {company: [match.fingerprint for match in known.values()]
+                              for company, known in self._by_company.items()},
+            }
+
+    @staticmethod
+    def _layout_sheets(sheets) -> List[str]:
+        """Листы, шапки которых нужны хотя бы одной раскладке"""
+        return [name for name in sheets if any(name in layout['sheets'] for layout in LAYOUTS)]
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+_detector = None
+
+
+def get_layout_detector() -> LayoutDetector:
+    global _detector
+    if _detector is None:
+        from config import Config
+        _detector = LayoutDetector(check_headers=Config.PARSER_LAYOUT_CHECK == 'headers')
+    return _detector
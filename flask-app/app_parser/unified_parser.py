@@ -1,17 +1,53 @@
 # parser/unified_parser.py
 import openpyxl
 from openpyxl.utils import range_boundaries
+from openpyxl.worksheet.formula import ArrayFormula, DataTableFormula
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+import contextlib
+import io
+import multiprocessing
 import os
 import re
+import threading
+import time
+
+from app_parser.company_resolver import UNKNOWN_COMPANY, CompanyMatch, get_company_resolver
+
+# Разбираемые листы: ключ результата -> метод (листы независимы друг от друга)
+SHEET_PARSERS = [
+    # ('sheet1', '_parse_sheet1'),  # Структура - список
+    # ('sheet2', '_parse_sheet2'),  # Потребность - словарь
+    ('sheet3', '_parse_sheet3'),  # Остатки - список
+    ('sheet4', '_parse_sheet4'),  # Поставки - список
+    ('sheet5', '_parse_sheet5'),  # Реализация - список
+    ('sheet6', '_parse_sheet6'),  # Авиатопливо - список
+    # ('sheet7', '_parse_sheet7'),  # Справка - список
+]
 
 class UnifiedParser:
-    """Улучшенный парсер для сложных Excel файлов"""
+    """Улучшенный парсер для сложных Excel файлов
+
+    streaming=True - потоковый режим: файл открывается в read_only/data_only и
+    читается построчно через iter_rows(values_only=True), поэтому в памяти
+    держится одна строка, а не весь DOM книги. Объединенные ячейки в этом
+    режиме недоступны, название компании в колонке A переносится вниз по строкам.
+
+    parallel=True - листы 3-6 разбираются одновременно в пуле процессов (workers):
+    каждый процесс сам открывает книгу в read_only и читает из архива только свой
+    лист, как в потоковом режиме. Время разбора каждого листа - metadata['timings'].
+    """
     
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, streaming: bool = False, parallel: bool = False, workers: int = None):
         self.file_path = file_path
+        self.streaming = streaming
+        self.parallel = parallel
+        self.workers = workers
         self.wb = None
+        self.wb_values = None  # Вычисленные значения формул (data_only=True), грузится один раз
         self.merged_cell_ranges = {}
     
     # В методе parse_all() unified_parser.py
@@ -23,22 +59,34 @@ class UnifiedParser:
             if not os.path.exists(self.file_path):
                 raise FileNotFoundError(f"Файл не найден: {self.file_path}")
             
+            started = time.perf_counter()
             # Загружаем файл
-            self.wb = openpyxl.load_workbook(self.file_path, data_only=False)
-            
-            # Кэшируем объединенные ячейки
-            self._cache_merged_cells()
-            
-            result = {
-                'metadata': self._parse_metadata(),
-                # 'sheet1': self._parse_sheet1(),  # Структура - список
-                # 'sheet2': self._parse_sheet2(),  # Потребность - словарь
-                'sheet3': self._parse_sheet3(),  # Остатки - список
-                'sheet4': self._parse_sheet4(),  # Поставки - список
-                'sheet5': self._parse_sheet5(),  # Реализация - список
-                'sheet6': self._parse_sheet6(),  # Авиатопливо - список
-                # 'sheet7': self._parse_sheet7(),  # Справка - список
-            }
+            if self.streaming or self.parallel:
+                # Формулы уже вычислены (data_only), объединенные ячейки в read_only недоступны;
+                # при parallel здесь нужны только листы книги и шапки для определения компании
+                self.wb = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True)
+            else:
+                # Индекс объединенных ячеек строится лениво - только для разбираемых листов
+                self.wb = openpyxl.load_workbook(self.file_path, data_only=False)
+                self.merged_cell_ranges = {}
+            timings = {'load': round(time.perf_counter() - started, 4)}
+            
+            step = time.perf_counter()
+            metadata = self._parse_metadata()
+            timings['metadata'] = round(time.perf_counter() - step, 4)
+            
+            if self.parallel:
+                sheets = self._parse_sheets_parallel(timings)
+            else:
+                sheets = {}
+                for key, method in SHEET_PARSERS:
+                    step = time.perf_counter()
+                    sheets[key] = getattr(self, method)()
+                    timings[key] = round(time.perf_counter() - step, 4)
+            timings['total'] = round(time.perf_counter() - started, 4)
+            
+            metadata['timings'] = timings
+            result = {'metadata': metadata, **sheets}
             
             print("✅ Парсинг завершен успешно!")
             return result
@@ -48,6 +96,35 @@ class UnifiedParser:
             import traceback
             traceback.print_exc()
             return self._fallback_parse()
+        finally:
+            self._close_values_workbook()
+            if (self.streaming or self.parallel) and self.wb is not None:
+                # read_only держит файл открытым до явного закрытия
+                self.wb.close()
+    
+    def _parse_sheets_parallel(self, timings: Dict[str, float]) -> Dict[str, Any]:
+        """Листы в пуле процессов; результаты собираются в тот же словарь, что и при
+        последовательном разборе. Время листа включает открытие книги в процессе."""
+        keys = [key for key, _ in SHEET_PARSERS]
+        # Внутри другого пула (reprocess_files.py) процессы уже заняты - разбираем здесь
+        pool = None if multiprocessing.parent_process() else _get_sheet_pool(self.workers)
+        results = None
+        if pool is not None:
+            try:
+                results = list(pool.map(_parse_sheet_job, [self.file_path] * len(keys), keys))
+            except BrokenProcessPool as e:
+                print(f"⚠️ Пул разбора листов недоступен ({e}), разбираем последовательно")
+                _reset_sheet_pool()
+        if results is None:
+            results = [_parse_sheet_job(self.file_path, key) for key in keys]
+        
+        sheets = {}
+        for key, data, seconds in results:
+            sheets[key] = data
+            timings[key] = round(seconds, 4)
+        slowest = max(keys, key=lambda key: timings[key])
+        print(f"⏱️ Листы разобраны параллельно, дольше всех {slowest}: {timings[slowest]:.2f} c")
+        return sheets
     
     # В unified_parser.py - улучшаем метод _parse_metadata и _detect_company_from_content
 
@@ -55,137 +132,46 @@ class UnifiedParser:
         """Улучшенное определение компании по имени файла и содержимому"""
         filename = os.path.basename(self.file_path).lower()
         
-        # Более точное определение по имени файла с приоритетом
-        company_mappings = [
-            # Саханефтегазсбыт - высший приоритет
-            ('саханефтегазсбыт', 'Саханефтегазсбыт'),
-            ('снгс', 'Саханефтегазсбыт'),
-            ('санги', 'Саханефтегазсбыт'),
-            ('sngs', 'Саханефтегазсбыт'),
-            
-            # Туймаада-Нефть
-            ('туймаада', 'Туймаада-Нефть'),
-            ('туймааданефть', 'Туймаада-Нефть'),
-            ('tumaada', 'Туймаада-Нефть'),
-            
-            # Сибойл
-            ('сибойл', 'Сибойл'),
-            ('сибирьойл', 'Сибойл'),
-            ('сибирь ойл', 'Сибойл'),
-            ('siboil', 'Сибойл'),
-            
-            # ЭКТО-Ойл
-            ('экто-ойл', 'ЭКТО-Ойл'),
-            ('эктоойл', 'ЭКТО-Ойл'),
-            ('экто', 'ЭКТО-Ойл'),
-            ('ecto-oil', 'ЭКТО-Ойл'),
-            
-            # Сибирское топливо
-            ('сибирское', 'Сибирское топливо'),
-            ('сибтопливо', 'Сибирское топливо'),
-            ('sibtoplivo', 'Сибирское топливо'),
-            
-            # Паритет
-            ('паритет', 'Паритет'),
-            ('paritet', 'Паритет'),
-            
-        ]
+        resolver = get_company_resolver()
+        # Откуда взято название: имя файла, ячейка листа или комбинация слов в имени файла
+        company_source = None
         
-        # Сначала проверяем имя файла
-        company = 'Неизвестная компания'
-        for pattern, comp_name in company_mappings:
-            if pattern in filename:
-                company = comp_name
-                print(f"🔍 Компания определена по имени файла: {comp_name}")
-                break
+        # Сначала проверяем имя файла (только псевдонимы компаний)
+        company = resolver.resolve(filename, partial=False) or UNKNOWN_COMPANY
+        if company != UNKNOWN_COMPANY:
+            company_source = {'source': 'filename'}
+            print(f"🔍 Компания определена по имени файла: {company}")
         
         # Если не нашли по имени файла, проверяем содержимое
-        if company == 'Неизвестная компания':
-            company_from_content = self._detect_company_from_content()
-            if company_from_content != 'Неизвестная компания':
-                company = company_from_content
-                print(f"🔍 Компания определена по содержимому: {company}")
+        if company == UNKNOWN_COMPANY:
+            match = self._detect_company_from_content()
+            if match:
+                company = match.company
+                company_source = {'source': 'content', 'sheet': match.sheet, 'cell': match.cell, 'value': match.value}
+                print(f"🔍 Компания определена по содержимому: {company} ({match.sheet}!{match.cell})")
         
-        # Дополнительная проверка: если в названии файла есть цифры (версии, даты), но есть ключевые слова
-        if company == 'Неизвестная компания':
-            # Ищем комбинации ключевых слов в имени файла
-            filename_words = filename.replace('_', ' ').replace('-', ' ').split()
-            
-            word_combinations = [
-                ('саха', 'нефтегазсбыт'),
-                ('сиб', 'ойл'),
-                ('туймаада', 'нефть'),
-                ('сибирское', 'топливо'),
-            ]
-            
-            for word1, word2 in word_combinations:
-                if word1 in filename_words and word2 in filename_words:
-                    # Пытаемся определить по комбинации
-                    if word1 == 'саха' and word2 == 'нефтегазсбыт':
-                        company = 'Саханефтегазсбыт'
-                    elif word1 == 'сиб' and word2 == 'ойл':
-                        company = 'Сибойл'
-                    elif word1 == 'туймаада' and word2 == 'нефть':
-                        company = 'Туймаада-Нефть'
-                    elif word1 == 'сибирское' and word2 == 'топливо':
-                        company = 'Сибирское топливо'
-                    
-                    if company != 'Неизвестная компания':
-                        print(f"🔍 Компания определена по комбинации слов: {company}")
-                        break
+        # Дополнительная проверка: комбинации ключевых слов в имени файла ('сиб ... ойл')
+        if company == UNKNOWN_COMPANY:
+            company = resolver.resolve(filename.replace('_', ' ').replace('-', ' ')) or UNKNOWN_COMPANY
+            if company != UNKNOWN_COMPANY:
+                company_source = {'source': 'filename_words'}
+                print(f"🔍 Компания определена по комбинации слов: {company}")
         
         return {
             'company': company,
+            'company_source': company_source,
             'report_date': datetime.now(),
             'filename': filename,
             'sheets_available': self.wb.sheetnames if self.wb else []
         }
 
-    def _detect_company_from_content(self) -> str:
-        """Улучшенное определение компании по содержимому файла"""
+    def _detect_company_from_content(self) -> Optional[CompanyMatch]:
+        """Компания по содержимому файла: шапки листов, до первого совпадения"""
         try:
-            # Проверяем все листы, а не только первый
-            for sheet_name in self.wb.sheetnames:
-                ws = self.wb[sheet_name]
-                
-                # Ищем в первых 50 строках каждого листа
-                for row in range(1, min(51, ws.max_row + 1)):
-                    for col in range(1, min(10, ws.max_column + 1)):
-                        cell_value = ws.cell(row=row, column=col).value
-                        if cell_value and isinstance(cell_value, str):
-                            cell_value_lower = cell_value.lower()
-                            
-                            # Расширенный список ключевых слов для поиска
-                            if any(name in cell_value_lower for name in [
-                                'саханефтегазсбыт', 'снгс', 'ао "саханефтегазсбыт"',
-                                'санги', 'саха нефтегазсбыт'
-                            ]):
-                                return 'Саханефтегазсбыт'
-                            elif any(name in cell_value_lower for name in [
-                                'туймаада-нефть', 'туймаада нефть', 'ао нк "туймаада-нефть"'
-                            ]):
-                                return 'Туймаада-Нефть'
-                            elif any(name in cell_value_lower for name in [
-                                'сибойл', 'сибирьойл', 'ооо "сибирьойл"', 'сибирь ойл'
-                            ]):
-                                return 'Сибойл'
-                            elif any(name in cell_value_lower for name in [
-                                'экто-ойл', 'эктоойл', 'ооо "экто-ойл"', 'экто ойл'
-                            ]):
-                                return 'ЭКТО-Ойл'
-                            elif any(name in cell_value_lower for name in [
-                                'сибирское топливо', 'сибтопливо'
-                            ]):
-                                return 'Сибирское топливо'
-                            elif any(name in cell_value_lower for name in [
-                                'паритет', 'ооо "паритет"'
-                            ]):
-                                return 'Паритет'
-                            
-            return 'Неизвестная компания'
+            return get_company_resolver().scan_workbook(self.wb)
         except Exception as e:
             print(f"⚠️ Ошибка при определении компании из содержимого: {e}")
-            return 'Неизвестная компания'
+            return None
     
     # def _parse_sheet1(self) -> List[Dict[str, Any]]:
     #     """Парсинг Листа 1: Структура"""
@@ -292,12 +278,11 @@ class UnifiedParser:
             # Колонка C: Название компании  
             # Колонки D-K: Числовые данные
             
-            for row_num in range(9, ws.max_row + 1):
+            for row_num, values in self._iter_rows(ws, 9, 26):
                 row_data = {}
                 
                 # Колонка C: Название компании
-                cell_c = ws.cell(row=row_num, column=3)  # Колонка C
-                company = self._safe_str(cell_c.value)
+                company = self._row_str(values, 3)  # Колонка C
                 
                 if not company or company == '' or company in ['1', '2', '3']:
                     continue
@@ -305,35 +290,33 @@ class UnifiedParser:
                 row_data['company'] = company
                 
                 # Колонка B: Группировка ("ВИНК")
-                cell_b = ws.cell(row=row_num, column=2)  # Колонка B
-                row_data['group'] = self._safe_str(cell_b.value)
+                row_data['group'] = self._row_str(values, 2)  # Колонка B
                 
                 # Колонка D: Объект (из контекста - это нефтебаза/АЗС)
-                cell_d = ws.cell(row=row_num, column=4)  # Колонка D
-                row_data['object_name'] = self._safe_str(cell_d.value)
+                row_data['object_name'] = self._row_str(values, 4)  # Колонка D
                 
                 # Числовые данные (колонки E-L соответствуют D-K в вашем описании)
                 
-                row_data['stock_ai92'] = self._get_cell_value(ws, row_num, 5)      # F
-                row_data['stock_ai95'] = self._get_cell_value(ws, row_num, 6)      # G  
-                row_data['stock_ai98_100'] = self._get_cell_value(ws, row_num, 7)      # G  
-                row_data['stock_diesel_winter'] = self._get_cell_value(ws, row_num, 8)   # I
-                row_data['stock_diesel_arctic'] = self._get_cell_value(ws, row_num, 9)  # J
-                row_data['stock_diesel_summer'] = self._get_cell_value(ws, row_num, 10)  # K
-                
-                row_data['transit_ai92'] = self._get_cell_value(ws, row_num, 13)      # F
-                row_data['transit_ai95'] = self._get_cell_value(ws, row_num, 14)      # G  
-                row_data['transit_ai98_100'] = self._get_cell_value(ws, row_num, 15)      # G  
-                row_data['transit_diesel_winter'] = self._get_cell_value(ws, row_num, 16)   # I
-                row_data['transit_diesel_arctic'] = self._get_cell_value(ws, row_num, 17)  # J
-                row_data['transit_diesel_summer'] = self._get_cell_value(ws, row_num, 19)  # K
-                
-                row_data['capacity_ai92'] = self._get_cell_value(ws, row_num, 21)      # F
-                row_data['capacity_ai95'] = self._get_cell_value(ws, row_num, 22)      # G  
-                row_data['capacity_ai98_100'] = self._get_cell_value(ws, row_num, 23)      # G  
-                row_data['capacity_diesel_winter'] = self._get_cell_value(ws, row_num, 24)   # I
-                row_data['capacity_diesel_arctic'] = self._get_cell_value(ws, row_num, 25)  # J
-                row_data['capacity_diesel_summer'] = self._get_cell_value(ws, row_num, 26)  # K
+                row_data['stock_ai92'] = self._row_number(ws, row_num, values, 5)      # F
+                row_data['stock_ai95'] = self._row_number(ws, row_num, values, 6)      # G  
+                row_data['stock_ai98_100'] = self._row_number(ws, row_num, values, 7)      # G  
+                row_data['stock_diesel_winter'] = self._row_number(ws, row_num, values, 8)   # I
+                row_data['stock_diesel_arctic'] = self._row_number(ws, row_num, values, 9)  # J
+                row_data['stock_diesel_summer'] = self._row_number(ws, row_num, values, 10)  # K
+                
+                row_data['transit_ai92'] = self._row_number(ws, row_num, values, 13)      # F
+                row_data['transit_ai95'] = self._row_number(ws, row_num, values, 14)      # G  
+                row_data['transit_ai98_100'] = self._row_number(ws, row_num, values, 15)      # G  
+                row_data['transit_diesel_winter'] = self._row_number(ws, row_num, values, 16)   # I
+                row_data['transit_diesel_arctic'] = self._row_number(ws, row_num, values, 17)  # J
+                row_data['transit_diesel_summer'] = self._row_number(ws, row_num, values, 19)  # K
+                
+                row_data['capacity_ai92'] = self._row_number(ws, row_num, values, 21)      # F
+                row_data['capacity_ai95'] = self._row_number(ws, row_num, values, 22)      # G  
+                row_data['capacity_ai98_100'] = self._row_number(ws, row_num, values, 23)      # G  
+                row_data['capacity_diesel_winter'] = self._row_number(ws, row_num, values, 24)   # I
+                row_data['capacity_diesel_arctic'] = self._row_number(ws, row_num, values, 25)  # J
+                row_data['capacity_diesel_summer'] = self._row_number(ws, row_num, values, 26)  # K
                 
                 # Добавляем только если есть значимые данные
                 significant_keys = [
@@ -363,7 +346,7 @@ class UnifiedParser:
             
             print("🔍 Парсим Лист 4 (Поставки)...")
             
-            for row_num in range(6, ws.max_row + 1):
+            for row_num, values in self._iter_rows(ws, 6, 11):
                 row_data = {}
                 
                 # Обработка компании (аналогично листу 3)
@@ -372,9 +355,9 @@ class UnifiedParser:
                     current_company = str(merged_value).strip()
                     row_data['company'] = current_company
                 else:
-                    cell_a = ws.cell(row=row_num, column=1)
-                    if cell_a.value and str(cell_a.value).strip() != '':
-                        current_company = str(cell_a.value).strip()
+                    value_a = self._row_raw(values, 1)
+                    if value_a and str(value_a).strip() != '':
+                        current_company = str(value_a).strip()
                         row_data['company'] = current_company
                     elif current_company:
                         row_data['company'] = current_company
@@ -386,26 +369,23 @@ class UnifiedParser:
                     continue
                 
                 # Колонка B: Компания (дублирующая информация)
-                cell_b = ws.cell(row=row_num, column=2)
-                row_data['company_duplicate'] = self._safe_str(cell_b.value)
+                row_data['company_duplicate'] = self._row_str(values, 2)
                 
                 # Колонка C: Нефтебаза
-                cell_c = ws.cell(row=row_num, column=3)
-                row_data['oil_depot'] = self._safe_str(cell_c.value)
+                row_data['oil_depot'] = self._row_str(values, 3)
                 
                 # Колонка D: Срок поставки
-                cell_d = ws.cell(row=row_num, column=4)
-                row_data['supply_date'] = self._safe_str(cell_d.value)
+                row_data['supply_date'] = self._row_str(values, 4)
                 
                 # Числовые данные поставок
                 
-                row_data['supply_ai92'] = self._get_cell_value(ws, row_num, 6)
-                row_data['supply_ai95'] = self._get_cell_value(ws, row_num, 7)
-                row_data['supply_ai98_100'] = self._get_cell_value(ws, row_num, 8)
+                row_data['supply_ai92'] = self._row_number(ws, row_num, values, 6)
+                row_data['supply_ai95'] = self._row_number(ws, row_num, values, 7)
+                row_data['supply_ai98_100'] = self._row_number(ws, row_num, values, 8)
 
-                row_data['supply_diesel_winter'] = self._get_cell_value(ws, row_num, 9)
-                row_data['supply_diesel_arctic'] = self._get_cell_value(ws, row_num, 10)
-                row_data['supply_diesel_summer'] = self._get_cell_value(ws, row_num, 11)
+                row_data['supply_diesel_winter'] = self._row_number(ws, row_num, values, 9)
+                row_data['supply_diesel_arctic'] = self._row_number(ws, row_num, values, 10)
+                row_data['supply_diesel_summer'] = self._row_number(ws, row_num, values, 11)
                 
                 if row_data['company']:
                     data.append(row_data)
@@ -426,7 +406,7 @@ class UnifiedParser:
             
             print("🔍 Парсим Лист 5 (Реализация)...")
             
-            for row_num in range(9, ws.max_row + 1):
+            for row_num, values in self._iter_rows(ws, 9, 18):
                 row_data = {}
                 
                 # Обработка компании
@@ -435,9 +415,9 @@ class UnifiedParser:
                     current_company = str(merged_value).strip()
                     row_data['company'] = current_company
                 else:
-                    cell_a = ws.cell(row=row_num, column=1)
-                    if cell_a.value and str(cell_a.value).strip() != '':
-                        current_company = str(cell_a.value).strip()
+                    value_a = self._row_raw(values, 1)
+                    if value_a and str(value_a).strip() != '':
+                        current_company = str(value_a).strip()
                         row_data['company'] = current_company
                     elif current_company:
                         row_data['company'] = current_company
@@ -449,27 +429,25 @@ class UnifiedParser:
                     continue
                 
                 # Колонка B: Поставщик
-                cell_b = ws.cell(row=row_num, column=2)
-                row_data['supplier'] = self._safe_str(cell_b.value)
+                row_data['supplier'] = self._row_str(values, 2)
                 
                 # Колонка C: Объект
-                cell_c = ws.cell(row=row_num, column=3)
-                row_data['object_name'] = self._safe_str(cell_c.value)
+                row_data['object_name'] = self._row_str(values, 3)
                 
                 # Реализация с начала месяца (важные данные!)
-                row_data['daily_ai92'] = self._get_cell_value(ws, row_num, 5)  # M
-                row_data['daily_ai95'] = self._get_cell_value(ws, row_num, 6)  # N
-                row_data['daily_ai98_100'] = self._get_cell_value(ws, row_num, 7)  # N
-                row_data['daily_winter'] = self._get_cell_value(ws, row_num, 8)
-                row_data['daily_arctic'] = self._get_cell_value(ws, row_num, 9)
-                row_data['daily_summer'] = self._get_cell_value(ws, row_num, 10)
-                
-                row_data['monthly_ai92'] = self._get_cell_value(ws, row_num, 13)  # M
-                row_data['monthly_ai95'] = self._get_cell_value(ws, row_num, 14)  # N
-                row_data['monthly_ai98_100'] = self._get_cell_value(ws, row_num, 15)  # N
-                row_data['monthly_winter'] = self._get_cell_value(ws, row_num, 16)
-                row_data['monthly_arctic'] = self._get_cell_value(ws, row_num, 17)
-                row_data['monthly_summer'] = self._get_cell_value(ws, row_num, 18)
+                row_data['daily_ai92'] = self._row_number(ws, row_num, values, 5)  # M
+                row_data['daily_ai95'] = self._row_number(ws, row_num, values, 6)  # N
+                row_data['daily_ai98_100'] = self._row_number(ws, row_num, values, 7)  # N
+                row_data['daily_winter'] = self._row_number(ws, row_num, values, 8)
+                row_data['daily_arctic'] = self._row_number(ws, row_num, values, 9)
+                row_data['daily_summer'] = self._row_number(ws, row_num, values, 10)
+                
+                row_data['monthly_ai92'] = self._row_number(ws, row_num, values, 13)  # M
+                row_data['monthly_ai95'] = self._row_number(ws, row_num, values, 14)  # N
+                row_data['monthly_ai98_100'] = self._row_number(ws, row_num, values, 15)  # N
+                row_data['monthly_winter'] = self._row_number(ws, row_num, values, 16)
+                row_data['monthly_arctic'] = self._row_number(ws, row_num, values, 17)
+                row_data['monthly_summer'] = self._row_number(ws, row_num, values, 18)
                 
                 if row_data['company'] and (row_data['monthly_ai92'] > 0 or row_data['monthly_ai95'] > 0):
                     data.append(row_data)
@@ -489,32 +467,29 @@ class UnifiedParser:
             
             print("🔍 Парсим Лист 6 (Авиатопливо)...")
             
-            for row_num in range(8, ws.max_row + 1):
+            for row_num, values in self._iter_rows(ws, 8, 9):
                 row_data = {}
                 
                 # Колонка A: Аэропорт
-                cell_a = ws.cell(row=row_num, column=1)
-                airport = self._safe_str(cell_a.value)
+                airport = self._row_str(values, 1)
                 if not airport:
                     continue
                 
                 row_data['airport'] = airport
                 
                 # Колонка B: ТЗК
-                cell_b = ws.cell(row=row_num, column=2)
-                row_data['tzk'] = self._safe_str(cell_b.value)
+                row_data['tzk'] = self._row_str(values, 2)
                 
                 # Колонка C: Договоры
-                cell_c = ws.cell(row=row_num, column=3)
-                row_data['contracts'] = self._safe_str(cell_c.value)
+                row_data['contracts'] = self._row_str(values, 3)
                 
                 # Числовые данные
-                row_data['supply_week'] = self._get_cell_value(ws, row_num, 4)
-                row_data['supply_month_start'] = self._get_cell_value(ws, row_num, 5)
-                row_data['monthly_demand'] = self._get_cell_value(ws, row_num, 6)
-                row_data['consumption_week'] = self._get_cell_value(ws, row_num, 7)
-                row_data['consumption_month_start'] = self._get_cell_value(ws, row_num, 8)
-                row_data['end_of_day_balance'] = self._get_cell_value(ws, row_num, 9)
+                row_data['supply_week'] = self._row_number(ws, row_num, values, 4)
+                row_data['supply_month_start'] = self._row_number(ws, row_num, values, 5)
+                row_data['monthly_demand'] = self._row_number(ws, row_num, values, 6)
+                row_data['consumption_week'] = self._row_number(ws, row_num, values, 7)
+                row_data['consumption_month_start'] = self._row_number(ws, row_num, values, 8)
+                row_data['end_of_day_balance'] = self._row_number(ws, row_num, values, 9)
                 
                 data.append(row_data)
             
@@ -533,24 +508,21 @@ class UnifiedParser:
             
             print("🔍 Парсим Лист 7 (Справка)...")
             
-            for row_num in range(6, ws.max_row + 1):
+            for row_num, values in self._iter_rows(ws, 6, 3):
                 row_data = {}
                 
                 # Колонка A: Топливо
-                cell_a = ws.cell(row=row_num, column=1)
-                fuel_type = self._safe_str(cell_a.value)
+                fuel_type = self._row_str(values, 1)
                 if not fuel_type:
                     continue
                 
                 row_data['fuel_type'] = fuel_type
                 
                 # Колонка B: Ситуация
-                cell_b = ws.cell(row=row_num, column=2)
-                row_data['situation'] = self._safe_str(cell_b.value)
+                row_data['situation'] = self._row_str(values, 2)
                 
                 # Колонка C: Комментарии
-                cell_c = ws.cell(row=row_num, column=3)
-                row_data['comments'] = self._safe_str(cell_c.value)
+                row_data['comments'] = self._row_str(values, 3)
                 
                 data.append(row_data)
             
@@ -561,49 +533,89 @@ class UnifiedParser:
             print(f"❌ Ошибка парсинга Листа 7: {e}")
             return []
     
-    def _cache_merged_cells(self):
-        """Кэшируем информацию об объединенных ячейках"""
-        for sheet_name in self.wb.sheetnames:
+    def _cache_merged_cells(self, sheet_name: str) -> Dict[int, Any]:
+        """Строим индекс объединенных ячеек листа (только для реально разбираемых листов).
+
+        Для каждой колонки хранится отсортированный по min_row список непересекающихся
+        диапазонов строк, поэтому поиск по (row, col) - бинарный, O(log n).
+        """
+        index = {}
+        if not self.streaming and self.wb is not None and sheet_name in self.wb.sheetnames:
             ws = self.wb[sheet_name]
-            self.merged_cell_ranges[sheet_name] = {}
-            
+            spans = {}
             for merged_range in ws.merged_cells.ranges:
-                min_row, min_col, max_row, max_col = range_boundaries(merged_range.coord)
-                first_cell = ws.cell(min_row, min_col)
-                
-                self.merged_cell_ranges[sheet_name][merged_range.coord] = {
-                    'min_row': min_row, 'max_row': max_row,
-                    'min_col': min_col, 'max_col': max_col,
-                    'value': first_cell.value
-                }
+                min_col, min_row, max_col, max_row = range_boundaries(merged_range.coord)
+                value = ws.cell(min_row, min_col).value
+                for col in range(min_col, max_col + 1):
+                    spans.setdefault(col, []).append((min_row, max_row, value))
+            
+            for col, col_spans in spans.items():
+                col_spans.sort(key=lambda span: span[0])
+                index[col] = ([span[0] for span in col_spans], col_spans)
+        
+        self.merged_cell_ranges[sheet_name] = index
+        return index
     
     def _get_merged_cell_value(self, sheet_name: str, row: int, col: int):
         """Получаем значение объединенной ячейки"""
-        if sheet_name not in self.merged_cell_ranges:
+        index = self.merged_cell_ranges.get(sheet_name)
+        if index is None:
+            index = self._cache_merged_cells(sheet_name)
+        
+        col_index = index.get(col)
+        if not col_index:
             return None
-            
-        for range_info in self.merged_cell_ranges[sheet_name].values():
-            if (range_info['min_row'] <= row <= range_info['max_row'] and
-                range_info['min_col'] <= col <= range_info['max_col']):
-                return range_info['value']
+        
+        starts, col_spans = col_index
+        pos = bisect_right(starts, row) - 1
+        if pos >= 0:
+            min_row, max_row, value = col_spans[pos]
+            if min_row <= row <= max_row:
+                return value
         return None
     
-    def _get_cell_value(self, ws, row: int, col: int):
-        """Безопасное получение значения ячейки"""
+    def _get_values_workbook(self):
+        """Книга с вычисленными значениями формул - загружается не более одного раза за парсинг"""
+        if self.wb_values is None:
+            self.wb_values = openpyxl.load_workbook(self.file_path, data_only=True)
+        return self.wb_values
+    
+    def _close_values_workbook(self):
+        if self.wb_values is not None:
+            self.wb_values.close()
+            self.wb_values = None
+    
+    def _iter_rows(self, ws, min_row: int, max_col: int):
+        """Построчный обход листа: (номер строки, кортеж значений колонок 1..max_col)"""
+        rows = ws.iter_rows(min_row=min_row, max_col=max_col, values_only=True)
+        return enumerate(rows, start=min_row)
+    
+    def _row_raw(self, values, col: int):
+        """Значение колонки col (с 1) из кортежа строки"""
+        if col <= len(values):
+            return values[col - 1]
+        return None
+    
+    def _row_str(self, values, col: int) -> str:
+        return self._safe_str(self._row_raw(values, col))
+    
+    def _row_number(self, ws, row: int, values, col: int) -> float:
+        """Числовое значение колонки; формулы берутся из книги с вычисленными значениями"""
+        value = self._row_raw(values, col)
+        if self._is_formula(value):
+            return self._get_formula_value(ws, row, col)
+        return self._safe_float(value)
+    
+    def _is_formula(self, value) -> bool:
+        if isinstance(value, (ArrayFormula, DataTableFormula)):
+            return True
+        return isinstance(value, str) and value.startswith('=')
+    
+    def _get_formula_value(self, ws, row: int, col: int) -> float:
+        """Вычисленное значение ячейки-формулы (только для полного режима)"""
         try:
-            cell = ws.cell(row=row, column=col)
-            
-            if cell.data_type == 'f':  # Формула
-                try:
-                    wb_calculated = openpyxl.load_workbook(self.file_path, data_only=True)
-                    ws_calculated = wb_calculated[ws.title]
-                    calculated_value = ws_calculated.cell(row=row, column=col).value
-                    wb_calculated.close()
-                    return self._safe_float(calculated_value)
-                except:
-                    return 0.0
-            else:
-                return self._safe_float(cell.value)
+            ws_calculated = self._get_values_workbook()[ws.title]
+            return self._safe_float(ws_calculated.cell(row=row, column=col).value)
         except:
             return 0.0
     
@@ -638,3 +650,49 @@ class UnifiedParser:
             'sheet1': [], 'sheet2': {}, 'sheet3': [],
             'sheet4': [], 'sheet5': [], 'sheet6': [], 'sheet7': []
         }
+
+
+_sheet_pool = None
+_sheet_pool_lock = threading.Lock()
+
+
+def _get_sheet_pool(workers: int = None) -> Optional[ProcessPoolExecutor]:
+    """Пул процессов разбора листов - один на процесс, создается при первом разборе.
+    Один процесс (workers <= 1) - пул не нужен, None."""
+    global _sheet_pool
+    workers = workers or min(len(SHEET_PARSERS), os.cpu_count() or 1)
+    if workers <= 1:
+        return None
+    with _sheet_pool_lock:
+        if _sheet_pool is None:
+            # spawn: процессы не наследуют потоки и соединения с БД веб-воркера
+            _sheet_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _sheet_pool
+
+
+def _reset_sheet_pool():
+    global _sheet_pool
+    with _sheet_pool_lock:
+        if _sheet_pool is not None:
+            _sheet_pool.shutdown(wait=False, cancel_futures=True)
+            _sheet_pool = None
+
+
+def _parse_sheet_job(file_path: str, key: str):
+    """Выполняется в процессе пула: (ключ, данные листа, секунды).
+    Книга открывается в read_only - из архива читается только XML этого листа.
+
+    Без пула функция выполняется здесь же, в потоке очереди задач: redirect_stdout
+    подменяет sys.stdout всему процессу, поэтому построчный вывод глушится только
+    в дочернем процессе (там он перемешивался бы с выводом других процессов)."""
+    started = time.perf_counter()
+    parser = UnifiedParser(file_path, streaming=True)
+    parser.wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    output = (contextlib.redirect_stdout(io.StringIO()) if multiprocessing.parent_process() is not None
+              else contextlib.nullcontext())
+    try:
+        with output:
+            data = getattr(parser, dict(SHEET_PARSERS)[key])()
+    finally:
+        parser.wb.close()
+    return key, data, time.perf_counter() - started
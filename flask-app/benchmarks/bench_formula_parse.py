@@ -0,0 +1,67 @@
+# benchmarks/bench_formula_parse.py
+"""
+Бенчмарк: разбор файла с большим числом формул.
+
+Сравнивает текущий UnifiedParser (книга с вычисленными значениями грузится один раз)
+с прежним поведением (перезагрузка книги на каждую ячейку-формулу).
+
+    python benchmarks/bench_formula_parse.py --rows 30
+    python benchmarks/bench_formula_parse.py --rows 500 --skip-legacy
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+from app_parser.unified_parser import UnifiedParser
+from benchmarks.synthetic_workbooks import build_company_workbook
+
+
+class LegacyFormulaParser(UnifiedParser):
+    """Прежняя реализация: load_workbook(data_only=True) на каждую формулу"""
+
+    def _get_formula_value(self, ws, row: int, col: int) -> float:
+        try:
+            wb_calculated = openpyxl.load_workbook(self.file_path, data_only=True)
+            calculated_value = wb_calculated[ws.title].cell(row=row, column=col).value
+            wb_calculated.close()
+            return self._safe_float(calculated_value)
+        except:
+            return 0.0
+
+
+def timed_parse(parser_class, path: str) -> float:
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser_class(path).parse_all()
+    return time.perf_counter() - started
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--rows', type=int, default=30, help='строк данных на лист')
+    arg_parser.add_argument('--skip-legacy', action='store_true', help='не запускать прежнюю реализацию')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = build_company_workbook(os.path.join(tmp, 'formulas.xlsx'), rows=args.rows, formulas=True)
+        formula_cells = args.rows * 30
+        print(f"Файл: {args.rows} строк на лист, ~{formula_cells} ячеек-формул")
+
+        current = timed_parse(UnifiedParser, path)
+        print(f"UnifiedParser (одна загрузка значений): {current:.2f} c")
+
+        if not args.skip_legacy:
+            legacy = timed_parse(LegacyFormulaParser, path)
+            print(f"Прежняя реализация (загрузка на формулу): {legacy:.2f} c")
+            print(f"Ускорение: x{legacy / current:.1f}")
+
+
+if __name__ == '__main__':
+    main()
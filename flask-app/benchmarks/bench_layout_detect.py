@@ -0,0 +1,75 @@
+# benchmarks/bench_layout_detect.py
+"""
+Бенчмарк определения раскладки книги (app_parser/layout_fingerprint.py).
+
+Файл в чужом формате (нет листа 6, шапка листа 5 не из формы) раньше полностью
+разбирался UnifiedParser (ошибки листов гасятся) - сравнивается с отказом по отпечатку.
+Для файла в правильном формате показаны: первое определение (листы + шапки) и
+повторное для той же компании (только список листов из кэша отпечатков).
+
+    python benchmarks/bench_layout_detect.py --rows 2000 --repeat 5
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+
+from app_parser.layout_fingerprint import LayoutDetector, UnknownLayoutError
+from app_parser.unified_parser import UnifiedParser
+from benchmarks.synthetic_workbooks import build_company_workbook
+
+
+def best_of(repeat: int, func) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def reject(detector, path):
+    try:
+        detector.detect(path)
+    except UnknownLayoutError:
+        return
+    raise AssertionError('раскладка должна быть отклонена')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--rows', type=int, default=2000, help='строк данных на листах 3-5')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='повторов (берется лучшее время)')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        good = build_company_workbook(os.path.join(tmp, 'снгс.xlsx'), rows=args.rows)
+        wrong = build_company_workbook(os.path.join(tmp, 'wrong.xlsx'), rows=args.rows)
+        wb = openpyxl.load_workbook(wrong)
+        del wb['6-Авиатопливо']
+        wb['5-Реализация']['A2'] = 'Произвольная таблица'
+        wb.save(wrong)
+        print(f"Строк на листах: {args.rows}, размер файла: {os.path.getsize(good) // 1024} КБ")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            full_parse = best_of(args.repeat, lambda: UnifiedParser(wrong).parse_all())
+        rejected = best_of(args.repeat, lambda: reject(LayoutDetector(), wrong))
+        print(f"  чужой формат: полный разбор {full_parse * 1000:8.1f} мс, отказ по отпечатку {rejected * 1000:6.2f} мс "
+              f"({full_parse / rejected:.0f}x)")
+
+        cold = best_of(args.repeat, lambda: LayoutDetector().detect(good))
+        detector = LayoutDetector()
+        detector.detect(good)
+        cached = best_of(args.repeat, lambda: detector.detect(good))
+        print(f"  форма компании: листы + шапки {cold * 1000:6.2f} мс, из кэша компании {cached * 1000:6.2f} мс")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_location_rows.py
+"""
+Бенчмарк построения строк листов 3 и 5 (нефтебазы + сведенная строка АЗС):
+построчный движок 'python' и колоночный 'pandas' (reports/location_frames.py).
+
+Книга не создается - измеряется только расчет строк; результаты движков сравниваются.
+"Первый" - снимок новой версии данных (после обработки загрузки), "повторный" - та же
+версия, прочитанная из кэша снимков заново (Redis отдает новый объект): сводка pandas
+для этой версии уже готова.
+
+    python benchmarks/bench_location_rows.py --companies 200 --locations 500 --repeat 3
+"""
+import argparse
+import math
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_report_render import TEMPLATE_PATH, build_aggregated_data
+from reports.template_report_generator import TemplateReportGenerator
+
+
+def build_rows(generator, aggregated_data) -> list:
+    return (generator._build_location_rows(aggregated_data, 'sheet3_data', generator.STOCKS_COLUMNS)
+            + generator._build_location_rows(aggregated_data, 'sheet5_data', generator.SALES_COLUMNS))
+
+
+def same_rows(expected: list, actual: list) -> bool:
+    if len(expected) != len(actual):
+        return False
+    for (row1, values1, _), (row2, values2, _) in zip(expected, actual):
+        if row1 != row2 or values1.keys() != values2.keys():
+            return False
+        for col, value in values1.items():
+            if isinstance(value, float):
+                if not math.isclose(value, values2[col], rel_tol=1e-12):
+                    return False
+            elif value != values2[col]:
+                return False
+    return True
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--companies', type=int, default=200, help='число компаний')
+    arg_parser.add_argument('--locations', type=int, default=500, help='объектов на листах 3 и 5 у каждой компании')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='повторов на движок (берется лучшее время)')
+    args = arg_parser.parse_args()
+
+    aggregated_data = build_aggregated_data(args.companies, args.locations)
+    print(f"Компаний: {args.companies}, объектов у каждой: {args.locations}")
+
+    results = {}
+    for engine in ('python', 'pandas'):
+        generator = TemplateReportGenerator(None, TEMPLATE_PATH, aggregation_engine=engine)
+        build_rows(generator, dict(aggregated_data))  # прогрев (импорт pandas)
+        first = repeated = float('inf')
+        for attempt in range(args.repeat):
+            generator._data_version = {'files': attempt}
+            started = time.perf_counter()
+            rows = build_rows(generator, pickle.loads(pickle.dumps(aggregated_data)))
+            first = min(first, time.perf_counter() - started)
+            snapshot = pickle.loads(pickle.dumps(aggregated_data))
+            started = time.perf_counter()
+            build_rows(generator, snapshot)
+            repeated = min(repeated, time.perf_counter() - started)
+        results[engine] = (first, repeated, rows)
+        print(f"  {engine:7s}: первый {first * 1000:8.1f} мс, повторный {repeated * 1000:8.1f} мс, строк: {len(rows)}")
+
+    print(f"Ускорение: первый {results['python'][0] / results['pandas'][0]:.1f}x, "
+          f"повторный {results['python'][1] / results['pandas'][1]:.1f}x")
+    print(f"Результаты совпадают: {same_rows(results['python'][2], results['pandas'][2])}")
+
+
+if __name__ == '__main__':
+    main()
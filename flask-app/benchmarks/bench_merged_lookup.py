@@ -0,0 +1,87 @@
+# benchmarks/bench_merged_lookup.py
+"""
+Микро-бенчмарк поиска объединенных ячеек на листах 4-Поставка / 5-Реализация.
+
+Сравнивает индекс по колонкам с бинарным поиском (UnifiedParser) и прежний
+линейный проход по всем диапазонам листа на каждую строку.
+
+    python benchmarks/bench_merged_lookup.py --blocks 3000 --block-size 3
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+from openpyxl.utils import range_boundaries
+from app_parser.unified_parser import UnifiedParser
+from benchmarks.synthetic_workbooks import build_company_workbook
+
+
+class LegacyMergedParser(UnifiedParser):
+    """Прежняя схема: все диапазоны всех листов, линейный поиск на каждый запрос"""
+
+    def _cache_merged_cells(self, sheet_name: str):
+        ranges = []
+        if self.wb is not None and sheet_name in self.wb.sheetnames:
+            ws = self.wb[sheet_name]
+            for merged_range in ws.merged_cells.ranges:
+                min_col, min_row, max_col, max_row = range_boundaries(merged_range.coord)
+                ranges.append((min_row, max_row, min_col, max_col, ws.cell(min_row, min_col).value))
+        self.merged_cell_ranges[sheet_name] = ranges
+        return ranges
+
+    def _get_merged_cell_value(self, sheet_name: str, row: int, col: int):
+        ranges = self.merged_cell_ranges.get(sheet_name)
+        if ranges is None:
+            ranges = self._cache_merged_cells(sheet_name)
+        for min_row, max_row, min_col, max_col, value in ranges:
+            if min_row <= row <= max_row and min_col <= col <= max_col:
+                return value
+        return None
+
+
+def timed_lookups(parser_class, wb, sheet_name: str, rows: range) -> tuple:
+    parser = parser_class('in-memory.xlsx')
+    parser.wb = wb
+    started = time.perf_counter()
+    values = [parser._get_merged_cell_value(sheet_name, row, 1) for row in rows]
+    return time.perf_counter() - started, values
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--blocks', type=int, default=3000, help='число объединенных блоков компаний')
+    arg_parser.add_argument('--block-size', type=int, default=3, help='строк в блоке')
+    args = arg_parser.parse_args()
+
+    rows = args.blocks * args.block_size
+    with tempfile.TemporaryDirectory() as tmp:
+        path = build_company_workbook(os.path.join(tmp, 'merged.xlsx'), rows=rows,
+                                      formulas=False, merged_block=args.block_size)
+        wb = openpyxl.load_workbook(path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            full_result = UnifiedParser(path).parse_all()
+
+    sheet_name = '5-Реализация'
+    lookup_rows = range(9, 9 + rows)
+    print(f"Лист {sheet_name}: {args.blocks} объединенных блоков, {rows} строк")
+
+    indexed_time, indexed_values = timed_lookups(UnifiedParser, wb, sheet_name, lookup_rows)
+    print(f"Индекс (bisect): {indexed_time * 1000:.1f} мс")
+
+    legacy_time, legacy_values = timed_lookups(LegacyMergedParser, wb, sheet_name, lookup_rows)
+    print(f"Линейный поиск:  {legacy_time * 1000:.1f} мс")
+
+    assert indexed_values == legacy_values, "Результаты поиска различаются"
+    print(f"Ускорение: x{legacy_time / indexed_time:.1f}")
+    print(f"Полный разбор: лист 5 - {len(full_result['sheet5'])} записей")
+
+
+if __name__ == '__main__':
+    main()
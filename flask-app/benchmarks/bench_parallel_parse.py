@@ -0,0 +1,66 @@
+# benchmarks/bench_parallel_parse.py
+"""
+Бенчмарк разбора листов одной книги: последовательно (полный и потоковый режимы)
+и параллельно в пуле процессов (UnifiedParser(parallel=True)).
+
+Пул создается один раз на процесс, поэтому первый параллельный разбор (запуск
+процессов) показан отдельно. Ускорение возможно только при нескольких ядрах:
+каждый процесс сам открывает книгу, так что на одном ядре параллельный режим медленнее.
+
+    python benchmarks/bench_parallel_parse.py --rows 3000 --workers 4 --repeat 3
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app_parser.unified_parser import SHEET_PARSERS, UnifiedParser
+from benchmarks.synthetic_workbooks import build_company_workbook
+
+
+def timed_parse(path: str, **options):
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = UnifiedParser(path, **options).parse_all()
+    return time.perf_counter() - started, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--rows', type=int, default=3000, help='строк данных на листах 3-5')
+    arg_parser.add_argument('--workers', type=int, default=4, help='процессов в пуле разбора листов')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='повторов на режим (берется лучшее время)')
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = build_company_workbook(os.path.join(tmp, 'снгс.xlsx'), rows=args.rows, formulas=False, merged_block=5)
+        print(f"Строк на листах: {args.rows}, размер файла: {os.path.getsize(path) // 1024} КБ, CPU: {os.cpu_count()}")
+
+        cold, _ = timed_parse(path, parallel=True, workers=args.workers)
+        print(f"  первый параллельный разбор (запуск пула): {cold:.2f} c")
+
+        modes = {
+            'полный': {},
+            'потоковый': {'streaming': True},
+            'параллельный': {'parallel': True, 'workers': args.workers},
+        }
+        results = {}
+        for name, options in modes.items():
+            runs = [timed_parse(path, **options) for _ in range(args.repeat)]
+            seconds, result = min(runs, key=lambda run: run[0])
+            results[name] = result
+            timings = result['metadata']['timings']
+            sheets = ', '.join(f"{key} {timings[key]:.2f}" for key, _ in SHEET_PARSERS)
+            print(f"  {name:13s}: {seconds:6.2f} c (загрузка {timings['load']:.2f}; {sheets})")
+
+        same = all(results['параллельный'][key] == results['полный'][key] for key, _ in SHEET_PARSERS)
+        print(f"Результаты совпадают: {same}")
+
+
+if __name__ == '__main__':
+    main()
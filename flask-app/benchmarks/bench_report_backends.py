@@ -0,0 +1,76 @@
+# benchmarks/bench_report_backends.py
+"""
+Бенчмарк бэкендов генерации отчета: template (копия шаблона + load_workbook)
+и streaming (скомпилированный шаблон + Workbook(write_only=True)).
+
+Для каждого бэкенда генерируется несколько отчетов подряд; выводятся среднее время,
+пиковая память (tracemalloc) каждого отчета и размер файла, содержимое отчетов сравнивается.
+
+    python benchmarks/bench_report_backends.py --companies 20 --locations 40 --reports 3
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_report_render import FakeQueries, TEMPLATE_PATH, build_aggregated_data, workbook_snapshot
+from reports.template_report_generator import TemplateReportGenerator
+
+
+def run_backend(aggregated_data, output_dir: str, backend: str, reports: int) -> tuple:
+    """Время и пиковая память на отчет (первый отчет - прогрев, в том числе компиляция шаблона)"""
+    generator = TemplateReportGenerator(FakeQueries(aggregated_data), TEMPLATE_PATH, backend=backend,
+                                        use_report_cache=False)
+    generator.reports_dir = output_dir
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator.generate_report(date(2024, 5, 31))
+
+    elapsed, peaks, path = 0.0, [], None
+    tracemalloc.start()
+    for day in range(1, reports + 1):
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            path = generator.generate_report(date(2024, 6, day))
+        elapsed += time.perf_counter() - started
+        peaks.append(tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return elapsed / reports, peaks, path
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--companies', type=int, default=20, help='число компаний')
+    arg_parser.add_argument('--locations', type=int, default=40, help='объектов на листах 3 и 5 у каждой компании')
+    arg_parser.add_argument('--reports', type=int, default=3, help='отчетов подряд на каждый бэкенд')
+    args = arg_parser.parse_args()
+
+    aggregated_data = build_aggregated_data(args.companies, args.locations)
+    print(f"Компаний: {args.companies}, объектов у каждой: {args.locations}, отчетов: {args.reports}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for backend in ('template', 'streaming'):
+            output_dir = os.path.join(tmp, backend)
+            os.makedirs(output_dir)
+            results[backend] = run_backend(aggregated_data, output_dir, backend, args.reports)
+
+        for backend, (elapsed, peaks, path) in results.items():
+            peaks_mb = ', '.join(f"{peak / 2 ** 20:.1f}" for peak in peaks)
+            print(f"{backend:<10} {elapsed:.2f} c/отчет, пик памяти по отчетам (МБ): {peaks_mb}, "
+                  f"{os.path.getsize(path) / 1024:.0f} КБ")
+
+        assert workbook_snapshot(results['template'][2]) == workbook_snapshot(results['streaming'][2]), \
+            "Содержимое отчетов различается"
+        print("Содержимое и оформление ячеек совпадают")
+
+
+if __name__ == '__main__':
+    main()
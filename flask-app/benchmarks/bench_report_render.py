@@ -0,0 +1,130 @@
+# benchmarks/bench_report_render.py
+"""
+Бенчмарк генерации сводного отчета по шаблону без БД.
+
+Сравнивает запись ячеек с кэшем стилей строк-шаблонов (по умолчанию) и прежнее
+копирование стиля для каждой ячейки: время, размер файла и совпадение содержимого.
+
+    python benchmarks/bench_report_render.py --companies 50 --locations 40
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import load_workbook
+from reports.template_report_generator import TemplateReportGenerator
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             'report_templates', 'Сводный_отчет_шаблон.xlsx')
+
+
+class FakeQueries:
+    """Вместо DatabaseQueries: отдает заранее построенный снимок данных"""
+
+    def __init__(self, aggregated_data):
+        self.aggregated_data = aggregated_data
+
+    def get_aggregated_data(self, report_date=None, company_id=None):
+        return self.aggregated_data
+
+    def get_aggregated_snapshot(self, report_date=None, company_id=None):
+        return self.aggregated_data, None
+
+
+def build_aggregated_data(companies: int, locations: int) -> dict:
+    """Снимок в формате get_aggregated_data: нефтебазы и АЗС на листах 3 и 5"""
+    data = {}
+    for c in range(companies):
+        name = f'Компания {c + 1}'
+        sheet3, sheet5 = [], []
+        for i in range(locations):
+            location_name = f'АЗС №{i + 1}' if i % 2 else f'Нефтебаза {i + 1}'
+            sheet3.append({'location_name': location_name, 'stock_ai92': i * 1.5, 'stock_ai95': i * 0.5,
+                           'stock_diesel_winter': float(i), 'transit_ai92': 1.0, 'capacity_ai92': 100.0})
+            sheet5.append({'location_name': location_name, 'daily_ai92': 1.0, 'daily_winter': 2.0,
+                           'monthly_ai92': 30.0, 'monthly_diesel_winter': 60.0})
+        data[name] = {
+            'name': name,
+            'sheet1': [{'affiliation': 'Независимые', 'company_name': name, 'oil_depots_count': 2,
+                        'azs_count': locations // 2, 'working_azs_count': locations // 2}],
+            'sheet2': {'year': 2024, 'gasoline_total': 1000.0, 'gasoline_ai92': 600.0, 'gasoline_ai95': 400.0,
+                       'diesel_total': 800.0, 'monthly_gasoline_total': 100.0, 'monthly_diesel_total': 70.0},
+            'sheet3_data': sheet3,
+            'sheet4_data': [{'oil_depot_name': 'Нефтебаза 1', 'supply_date': None, 'supply_ai92': 10.0,
+                             'supply_ai95': 5.0, 'supply_diesel_winter': 7.0}],
+            'sheet5_data': sheet5,
+            'sheet6_data': [{'airport_name': f'Аэропорт {c + 1}', 'tzk_name': 'ТЗК', 'contracts_info': '',
+                             'supply_week': 10.0, 'supply_month_start': 20.0, 'monthly_demand': 30.0,
+                             'consumption_week': 5.0, 'consumption_month_start': 15.0, 'end_of_day_balance': 8.0}],
+            'sheet7_data': [],
+        }
+    return data
+
+
+def render(aggregated_data, output_dir: str, use_style_cache: bool) -> tuple:
+    generator = TemplateReportGenerator(FakeQueries(aggregated_data), TEMPLATE_PATH,
+                                        use_style_cache=use_style_cache, use_report_cache=False)
+    generator.reports_dir = output_dir
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = generator.generate_report(date(2024, 6, 1))
+    return time.perf_counter() - started, path
+
+
+def workbook_snapshot(path: str) -> dict:
+    """Значения и оформление всех ячеек, объединения, высоты строк и ширины колонок -
+    для сравнения результатов"""
+    wb = load_workbook(path)
+    cells = {}
+    for ws in wb.worksheets:
+        cells[(ws.title, 'merged')] = sorted(str(merged) for merged in ws.merged_cells.ranges)
+        cells[(ws.title, 'rows')] = {row: (dim.height, dim.hidden) for row, dim in ws.row_dimensions.items()
+                                     if dim.height is not None or dim.hidden}
+        cells[(ws.title, 'columns')] = {col: (dim.width, dim.hidden) for col, dim in ws.column_dimensions.items()}
+        for row in ws.iter_rows():
+            for cell in row:
+                if cell.value is None and not cell.has_style:
+                    continue
+                cells[(ws.title, cell.coordinate)] = (
+                    cell.value, repr(cell.font), repr(cell.fill), repr(cell.border),
+                    cell.number_format, repr(cell.alignment), repr(cell.protection),
+                )
+    return cells
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--companies', type=int, default=50, help='число компаний')
+    arg_parser.add_argument('--locations', type=int, default=40, help='объектов на листах 3 и 5 у каждой компании')
+    args = arg_parser.parse_args()
+
+    aggregated_data = build_aggregated_data(args.companies, args.locations)
+    print(f"Компаний: {args.companies}, объектов у каждой: {args.locations}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label, use_style_cache in (('copy', False), ('cache', True)):
+            output_dir = os.path.join(tmp, label)
+            os.makedirs(output_dir)
+            elapsed, path = render(aggregated_data, output_dir, use_style_cache)
+            results[label] = (elapsed, os.path.getsize(path), path)
+
+        copy_time, copy_size, copy_path = results['copy']
+        cache_time, cache_size, cache_path = results['cache']
+        print(f"Копирование стилей: {copy_time:.2f} c, {copy_size / 1024:.0f} КБ")
+        print(f"Кэш стилей:         {cache_time:.2f} c, {cache_size / 1024:.0f} КБ")
+        print(f"Ускорение: x{copy_time / cache_time:.1f}")
+
+        assert workbook_snapshot(copy_path) == workbook_snapshot(cache_path), "Содержимое отчетов различается"
+        print("Содержимое и оформление ячеек совпадают")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_service_startup.py
+"""
+Бенчмарк накладных расходов на создание сервисов в обработчике запроса:
+FileProcessor() + DatabaseQueries() на каждый запрос (как было в маршрутах) против
+get_file_processor() + get_queries() из реестра app/services/registry.py.
+
+"Холодный" - первое обращение к реестру в процессе (создание сервиса один раз на воркер),
+дальше на каждый запрос только поиск в словаре. Подключение к БД не требуется.
+
+    python benchmarks/bench_service_startup.py --requests 2000 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.file_processor import FileProcessor
+from app.services.registry import get_file_processor, get_queries, services
+from database.queries import DatabaseQueries
+
+
+def per_request(requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        FileProcessor()
+        DatabaseQueries()
+    return time.perf_counter() - started
+
+
+def shared(requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        get_file_processor()
+        get_queries()
+    return time.perf_counter() - started
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--requests', type=int, default=2000, help='число имитируемых запросов')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='повторов (берется лучшее время)')
+    args = arg_parser.parse_args()
+
+    services.reset()
+    started = time.perf_counter()
+    get_file_processor()
+    get_queries()
+    cold = time.perf_counter() - started
+
+    old = min(per_request(args.requests) for _ in range(args.repeat))
+    new = min(shared(args.requests) for _ in range(args.repeat))
+
+    print(f"Запросов: {args.requests}, парсеров в цепочке: {len(get_file_processor().parsers)}")
+    print(f"  на каждый запрос: {old * 1000:8.1f} мс всего, {old / args.requests * 1e6:8.1f} мкс на запрос")
+    print(f"  реестр:           {new * 1000:8.1f} мс всего, {new / args.requests * 1e6:8.1f} мкс на запрос")
+    print(f"  холодный старт реестра (один раз на воркер): {cold * 1000:.2f} мс")
+    print(f"Ускорение: {old / new:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
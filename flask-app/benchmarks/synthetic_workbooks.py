@@ -0,0 +1,82 @@
+# benchmarks/synthetic_workbooks.py
+"""Генераторы синтетических xlsx-файлов в формате отчетов компаний (для бенчмарков)"""
+import openpyxl
+
+# Заголовки листов как в форме отчетности (по ним app_parser/layout_fingerprint.py узнает раскладку)
+SHEET_TITLES = {
+    '3-Остатки': '3. Информация о наличии моторного топлива на ПНПО и АЗС (тыс. тонн)',
+    '4-Поставка': '4. Ожидаемые поставки моторного топлива на нефтебазы ПНПО (тыс. тонн)',
+    '5-Реализация': '5. Реализация моторного топлива с ПНПО и АЗС (тыс. тонн)',
+    '6-Авиатопливо': '6. Поставка авиатоплива в аэропорты, аэродромы (тыс. тонн)',
+}
+
+SHEET3_NUMERIC_COLUMNS = [5, 6, 7, 8, 9, 10, 13, 14, 15, 16, 17, 19, 21, 22, 23, 24, 25, 26]
+SHEET5_NUMERIC_COLUMNS = [5, 6, 7, 8, 9, 10, 13, 14, 15, 16, 17, 18]
+
+
+def build_company_workbook(path: str, rows: int = 200, formulas: bool = True,
+                           merged_block: int = 0) -> str:
+    """Создает файл с листами 3-6 в раскладке, которую ожидает UnifiedParser.
+
+    formulas     - числовые ячейки листов 3 и 5 записываются формулами
+    merged_block - если > 0, колонка A листов 4 и 5 объединяется блоками такой высоты
+    """
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+
+    ws3 = wb.create_sheet('3-Остатки')
+    ws3.cell(row=1, column=1, value='АО "Саханефтегазсбыт"')
+    for i in range(rows):
+        r = 9 + i
+        ws3.cell(row=r, column=2, value='ВИНК')
+        ws3.cell(row=r, column=3, value='Саханефтегазсбыт')
+        ws3.cell(row=r, column=4, value=f'НБ Объект {i}' if i % 3 else f'АЗС №{i}')
+        for col in SHEET3_NUMERIC_COLUMNS:
+            if formulas:
+                ws3.cell(row=r, column=col, value=f'={i + 1}*{col}')
+            else:
+                ws3.cell(row=r, column=col, value=float((i + 1) * col))
+
+    ws4 = wb.create_sheet('4-Поставка')
+    ws5 = wb.create_sheet('5-Реализация')
+    for ws, start in ((ws4, 6), (ws5, 9)):
+        for i in range(rows):
+            r = start + i
+            if merged_block:
+                if i % merged_block == 0:
+                    ws.cell(row=r, column=1, value=f'Компания {i // merged_block}')
+                    last = min(r + merged_block - 1, start + rows - 1)
+                    if last > r:
+                        ws.merge_cells(start_row=r, start_column=1, end_row=last, end_column=1)
+            else:
+                ws.cell(row=r, column=1, value='Саханефтегазсбыт')
+            ws.cell(row=r, column=2, value='Поставщик')
+            ws.cell(row=r, column=3, value=f'НБ Объект {i}')
+
+    for i in range(rows):
+        r = 6 + i
+        ws4.cell(row=r, column=4, value='28.01.2026')
+        for col in range(6, 12):
+            ws4.cell(row=r, column=col, value=float(i + col))
+    for i in range(rows):
+        r = 9 + i
+        for col in SHEET5_NUMERIC_COLUMNS:
+            if formulas:
+                ws5.cell(row=r, column=col, value=f'={i + 1}+{col}')
+            else:
+                ws5.cell(row=r, column=col, value=float(i + 1 + col))
+
+    ws6 = wb.create_sheet('6-Авиатопливо')
+    for i in range(min(rows, 40)):
+        r = 8 + i
+        ws6.cell(row=r, column=1, value=f'Аэропорт {i}')
+        ws6.cell(row=r, column=2, value='ТЗК')
+        ws6.cell(row=r, column=3, value='Договор')
+        for col in range(4, 10):
+            ws6.cell(row=r, column=col, value=float(i * col))
+
+    for sheet_name, title in SHEET_TITLES.items():
+        wb[sheet_name].cell(row=2, column=1, value=title)
+
+    wb.save(path)
+    return path
@@ -46,4 +46,54 @@ class Config:
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024
     
     # Разрешенные расширения
-    ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
\ No newline at end of file
+    ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+    
+    # Потоковый (read_only) режим парсера: память ограничена одной строкой листа
+    PARSER_STREAMING = os.environ.get('PARSER_STREAMING', '0').lower() in ('1', 'true', 'yes')
+    
+    # Разбор листов 3-6 одной книги в пуле процессов и его размер (0 - по числу CPU, не больше 4)
+    PARSER_PARALLEL_SHEETS = os.environ.get('PARSER_PARALLEL_SHEETS', '0').lower() in ('1', 'true', 'yes')
+    PARSER_SHEET_WORKERS = int(os.environ.get('PARSER_SHEET_WORKERS') or 0)
+    
+    # Очередь фоновой обработки загрузок: 'memory' (внутри процесса) или 'redis'
+    JOB_QUEUE_BACKEND = os.environ.get('JOB_QUEUE_BACKEND') or 'memory'
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS') or 2)
+    REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
+    
+    # Кэш агрегированных данных для отчетов: 'memory', 'redis' или 'none'
+    AGGREGATE_CACHE_BACKEND = os.environ.get('AGGREGATE_CACHE_BACKEND') or 'memory'
+    AGGREGATE_CACHE_TTL = int(os.environ.get('AGGREGATE_CACHE_TTL') or 300)
+    
+    # Бэкенд генерации отчета: 'template' (копия шаблона в памяти) или 'streaming' (write-only запись)
+    REPORT_BACKEND = os.environ.get('REPORT_BACKEND') or 'template'
+    
+    # Кэш готовых отчетов: повторная генерация без новых загрузок отдает существующий файл,
+    # объем reports_output ограничен (самые давние отчеты удаляются)
+    REPORT_CACHE_ENABLED = os.environ.get('REPORT_CACHE_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    REPORT_CACHE_MAX_MB = int(os.environ.get('REPORT_CACHE_MAX_MB') or 200)
+    
+    # Отдача отчетов через nginx: префикс internal-location, например '/protected-reports/'
+    # (пусто - файл отдает сам Flask); nginx должен видеть папку REPORTS_FOLDER по этому адресу.
+    # Применяется только к запросам с заголовком X-Reports-Accel: 1 от nginx, прямые - отдает Flask
+    REPORTS_ACCEL_REDIRECT = os.environ.get('REPORTS_ACCEL_REDIRECT') or ''
+    
+    # Параллельное построение строк листов отчета (пул потоков) и его размер
+    REPORT_PARALLEL_SHEETS = os.environ.get('REPORT_PARALLEL_SHEETS', '0').lower() in ('1', 'true', 'yes')
+    REPORT_SHEET_WORKERS = int(os.environ.get('REPORT_SHEET_WORKERS') or 4)
+    
+    # Пакетная генерация отчетов за диапазон дат: процессов отрисовки (0 - по числу CPU) и предел диапазона
+    REPORT_BATCH_WORKERS = int(os.environ.get('REPORT_BATCH_WORKERS') or 0)
+    REPORT_BATCH_MAX_DAYS = int(os.environ.get('REPORT_BATCH_MAX_DAYS') or 62)
+    
+    # Расчет итогов АЗС на листах 3 и 5: 'python' (построчный) или 'pandas' (колоночный, сводка
+    # запоминается по версии данных - быстрее на повторных отчетах, первый расчет медленнее)
+    REPORT_AGGREGATION_ENGINE = os.environ.get('REPORT_AGGREGATION_ENGINE') or 'python'
+    
+    # Повторная загрузка файла с тем же содержимым (sha256) за тот же день не разбирается заново
+    UPLOAD_DEDUP_ENABLED = os.environ.get('UPLOAD_DEDUP_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    
+    # Создавать общие сервисы (FileProcessor, справочник компаний) при старте воркера, а не при первом запросе
+    SERVICES_WARMUP = os.environ.get('SERVICES_WARMUP', '0').lower() in ('1', 'true', 'yes')
+    
+    # Проверка раскладки книги до разбора: 'headers' (листы и шапки), 'sheets' (только листы), 'off'
+    PARSER_LAYOUT_CHECK = (os.environ.get('PARSER_LAYOUT_CHECK') or 'headers').lower()
\ No newline at end of file
@@ -0,0 +1,32 @@
+# conftest.py
+"""Общие фикстуры тестов: временная SQLite-база со схемой и миграциями"""
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    """DatabaseConnection поверх временной SQLite-базы; общий database.queries.db тоже работает с ней"""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.db'}")
+    from database.connection import DatabaseConnection
+    from database.migrate import apply_migrations
+    from database.queries import db
+
+    connection = DatabaseConnection()
+    connection.create_tables()
+    apply_migrations(connection.engine)
+    monkeypatch.setattr(db, 'db', connection)
+
+    yield connection
+    connection.engine.dispose()
+
+
+@pytest.fixture
+def sqlite_queries(sqlite_db):
+    """DatabaseQueries поверх временной базы"""
+    from database.queries import DatabaseQueries
+
+    queries = DatabaseQueries()
+    queries.db = sqlite_db
+    return queries
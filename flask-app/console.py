@@ -0,0 +1,29 @@
+# console.py
+"""
+Подробный вывод обработки файлов с возможностью заглушить его в текущем потоке.
+
+contextlib.redirect_stdout подменяет sys.stdout для всего процесса: в многопоточном
+коде (писатели reprocess_files.py, потоки очереди задач) он глушит вывод остальных
+потоков, а при выходе из with в другом порядке оставляет sys.stdout на чужом StringIO.
+quiet_output() действует только на текущий поток (contextvars), sys.stdout не трогает.
+"""
+import contextvars
+from contextlib import contextmanager
+
+_quiet = contextvars.ContextVar('quiet_output', default=False)
+
+
+@contextmanager
+def quiet_output(enabled: bool = True):
+    """Внутри блока log() текущего потока ничего не выводит"""
+    token = _quiet.set(enabled or _quiet.get())
+    try:
+        yield
+    finally:
+        _quiet.reset(token)
+
+
+def log(*args, **kwargs):
+    """print(), если вывод текущего потока не заглушен quiet_output()"""
+    if not _quiet.get():
+        print(*args, **kwargs)
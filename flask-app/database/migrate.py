@@ -0,0 +1,112 @@
+# database/migrate.py
+"""
+Версионные миграции схемы для уже существующих баз.
+
+Новые таблицы создает create_tables() по моделям, а изменения существующих таблиц
+(индексы, колонки, ограничения) описываются SQL-файлами database/migrations/NNNN_имя.sql.
+Примененные версии хранятся в таблице schema_migrations, каждая миграция выполняется
+в своей транзакции. ALTER TABLE ... ADD COLUMN пропускается, если колонка уже есть
+(новая база создается create_tables() сразу с ней). Запуск вручную:
+
+    python -m database.migrate            # применить новые миграции
+    python -m database.migrate --status   # показать состояние
+"""
+import argparse
+import os
+import re
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import inspect, text
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+_MIGRATION_FILE = re.compile(r'^(\d{4})_([\w-]+)\.sql$')
+_ADD_COLUMN = re.compile(r'^ALTER\s+TABLE\s+(\w+)\s+ADD\s+COLUMN\s+(\w+)', re.IGNORECASE)
+
+# Произвольный ключ advisory-lock: несколько воркеров gunicorn стартуют одновременно
+_PG_LOCK_KEY = 48151623
+
+
+def list_migrations() -> List[Tuple[str, str, str]]:
+    """(версия, имя, путь) всех файлов миграций по возрастанию версии"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = _MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((match.group(1), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return migrations
+
+
+def _split_statements(sql: str) -> List[str]:
+    """Разбивка файла на операторы (без комментариев; в миграциях нет ';' внутри строк)"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def _column_exists(connection, table: str, column: str) -> bool:
+    return column in {c['name'] for c in inspect(connection).get_columns(table)}
+
+
+def _ensure_table(connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version VARCHAR(16) PRIMARY KEY, name VARCHAR(200) NOT NULL, applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_versions(engine) -> set:
+    with engine.begin() as connection:
+        _ensure_table(connection)
+        return {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def apply_migrations(engine) -> List[str]:
+    """Применяет новые миграции, возвращает список примененных версий"""
+    applied = []
+    for version, name, path in list_migrations():
+        with engine.begin() as connection:
+            _ensure_table(connection)
+            if connection.dialect.name == 'postgresql':
+                connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': _PG_LOCK_KEY})
+
+            exists = connection.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :version"), {'version': version}
+            ).first()
+            if exists:
+                continue
+
+            with open(path, encoding='utf-8') as f:
+                statements = _split_statements(f.read())
+            for statement in statements:
+                add_column = _ADD_COLUMN.match(statement)
+                if add_column and _column_exists(connection, *add_column.groups()):
+                    continue
+                connection.execute(text(statement))
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {'version': version, 'name': name, 'applied_at': datetime.now()}
+            )
+            print(f"✓ Миграция {version}_{name} применена")
+            applied.append(version)
+    return applied
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--status', action='store_true', help='показать примененные и ожидающие миграции')
+    args = arg_parser.parse_args()
+
+    from database.connection import db_connection
+
+    if args.status:
+        done = applied_versions(db_connection.engine)
+        for version, name, _ in list_migrations():
+            print(f"{'✅' if version in done else '⏳'} {version}_{name}")
+        return
+
+    applied = apply_migrations(db_connection.engine)
+    print(f"Применено миграций: {len(applied)}" if applied else "Новых миграций нет")
+
+
+if __name__ == '__main__':
+    main()
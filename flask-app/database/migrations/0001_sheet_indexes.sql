@@ -0,0 +1,26 @@
+-- 0001: индексы под горячие запросы по листам
+--   (company_id, report_date) - последние данные компании в get_aggregated_data
+--   file_id                   - удаление старых записей файла перед повторной загрузкой
+
+CREATE INDEX IF NOT EXISTS ix_uploaded_files_company_date ON uploaded_files (company_id, report_date);
+
+CREATE INDEX IF NOT EXISTS ix_sheet1_structure_company_date ON sheet1_structure (company_id, report_date);
+CREATE INDEX IF NOT EXISTS ix_sheet1_structure_file_id ON sheet1_structure (file_id);
+
+CREATE INDEX IF NOT EXISTS ix_sheet2_demand_company_date ON sheet2_demand (company_id, report_date);
+CREATE INDEX IF NOT EXISTS ix_sheet2_demand_file_id ON sheet2_demand (file_id);
+
+CREATE INDEX IF NOT EXISTS ix_sheet3_balance_company_date ON sheet3_balance (company_id, report_date);
+CREATE INDEX IF NOT EXISTS ix_sheet3_balance_file_id ON sheet3_balance (file_id);
+
+CREATE INDEX IF NOT EXISTS ix_sheet4_supply_company_date ON sheet4_supply (company_id, report_date);
+CREATE INDEX IF NOT EXISTS ix_sheet4_supply_file_id ON sheet4_supply (file_id);
+
+CREATE INDEX IF NOT EXISTS ix_sheet5_sales_company_date ON sheet5_sales (company_id, report_date);
+CREATE INDEX IF NOT EXISTS ix_sheet5_sales_file_id ON sheet5_sales (file_id);
+
+CREATE INDEX IF NOT EXISTS ix_sheet6_aviation_company_date ON sheet6_aviation (company_id, report_date);
+CREATE INDEX IF NOT EXISTS ix_sheet6_aviation_file_id ON sheet6_aviation (file_id);
+
+CREATE INDEX IF NOT EXISTS ix_sheet7_comments_company_date ON sheet7_comments (company_id, report_date);
+CREATE INDEX IF NOT EXISTS ix_sheet7_comments_file_id ON sheet7_comments (file_id);
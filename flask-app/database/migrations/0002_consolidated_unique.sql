@@ -0,0 +1,2 @@
+-- 0002: одна строка consolidated_data на (компания, дата отчета) - ее обновляет этап консолидации
+CREATE UNIQUE INDEX IF NOT EXISTS uq_consolidated_data_company_date ON consolidated_data (company_id, report_date);
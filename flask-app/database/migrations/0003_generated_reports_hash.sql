@@ -0,0 +1,3 @@
+-- 0003: хэш входных данных отчета - повторная генерация без новых загрузок отдает готовый файл
+ALTER TABLE generated_reports ADD COLUMN content_hash VARCHAR(64);
+CREATE INDEX IF NOT EXISTS ix_generated_reports_content_hash ON generated_reports (content_hash);
@@ -0,0 +1,3 @@
+-- 0004: хэш содержимого загруженного файла - повторная загрузка того же файла не разбирается заново
+ALTER TABLE uploaded_files ADD COLUMN content_hash VARCHAR(64);
+CREATE INDEX IF NOT EXISTS ix_uploaded_files_content_hash ON uploaded_files (content_hash);
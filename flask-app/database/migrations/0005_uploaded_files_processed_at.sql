@@ -0,0 +1,2 @@
+-- 0005: время, когда данные файла полностью сохранены и кэш снимка сброшен (версия данных отчетов)
+ALTER TABLE uploaded_files ADD COLUMN processed_at TIMESTAMP;
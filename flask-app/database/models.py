@@ -1,5 +1,5 @@
 # database/models.py
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Text, JSON, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -30,10 +30,16 @@ class UploadedFile(Base):
     file_size = Column(Integer)
     status = Column(String(50), default='uploaded')
     error_message = Column(Text)
+    # sha256 содержимого файла: повторная загрузка того же файла не разбирается заново
+    content_hash = Column(String(64))
+    # Данные файла сохранены, итоги пересчитаны, кэш снимка сброшен (ставится последним)
+    processed_at = Column(DateTime)
     
     company = relationship("Company", back_populates="uploaded_files")
     
     __table_args__ = (
+        Index('ix_uploaded_files_company_date', 'company_id', 'report_date'),
+        Index('ix_uploaded_files_content_hash', 'content_hash'),
         {'sqlite_autoincrement': True},
     )
 
@@ -52,6 +58,11 @@ class Sheet1Structure(Base):
     working_azs_count = Column(Integer)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        Index('ix_sheet1_structure_company_date', 'company_id', 'report_date'),
+        Index('ix_sheet1_structure_file_id', 'file_id'),
+    )
 
 class Sheet2Demand(Base):
     __tablename__ = 'sheet2_demand'
@@ -88,6 +99,11 @@ class Sheet2Demand(Base):
     monthly_diesel_intermediate = Column(Float)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        Index('ix_sheet2_demand_company_date', 'company_id', 'report_date'),
+        Index('ix_sheet2_demand_file_id', 'file_id'),
+    )
 
 class Sheet3Balance(Base):
     __tablename__ = 'sheet3_balance'
@@ -133,6 +149,11 @@ class Sheet3Balance(Base):
     capacity_diesel_intermediate = Column(Float)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        Index('ix_sheet3_balance_company_date', 'company_id', 'report_date'),
+        Index('ix_sheet3_balance_file_id', 'file_id'),
+    )
 
 class Sheet4Supply(Base):
     __tablename__ = 'sheet4_supply'
@@ -157,6 +178,11 @@ class Sheet4Supply(Base):
     supply_diesel_intermediate = Column(Float)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        Index('ix_sheet4_supply_company_date', 'company_id', 'report_date'),
+        Index('ix_sheet4_supply_file_id', 'file_id'),
+    )
 
 class Sheet5Sales(Base):
     __tablename__ = 'sheet5_sales'
@@ -192,6 +218,11 @@ class Sheet5Sales(Base):
     monthly_diesel_intermediate = Column(Float)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        Index('ix_sheet5_sales_company_date', 'company_id', 'report_date'),
+        Index('ix_sheet5_sales_file_id', 'file_id'),
+    )
 # В models.py добавляем эти классы после Sheet5Sales:
 
 class Sheet6Aviation(Base):
@@ -214,6 +245,11 @@ class Sheet6Aviation(Base):
     end_of_day_balance = Column(Float)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        Index('ix_sheet6_aviation_company_date', 'company_id', 'report_date'),
+        Index('ix_sheet6_aviation_file_id', 'file_id'),
+    )
 
 class Sheet7Comments(Base):
     __tablename__ = 'sheet7_comments'
@@ -228,6 +264,11 @@ class Sheet7Comments(Base):
     comments = Column(Text)
     
     created_at = Column(DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        Index('ix_sheet7_comments_company_date', 'company_id', 'report_date'),
+        Index('ix_sheet7_comments_file_id', 'file_id'),
+    )
 
 class DataHistory(Base):
     __tablename__ = 'data_history'
@@ -263,6 +304,12 @@ class GeneratedReport(Base):
     generated_by = Column(String(100))
     generated_at = Column(DateTime, default=datetime.now)
     status = Column(String(50), default='generated')
+    # sha256 входных данных (файлы, шаблон, бэкенд) - по нему находится готовый отчет
+    content_hash = Column(String(64))
+    
+    __table_args__ = (
+        Index('ix_generated_reports_content_hash', 'content_hash'),
+    )
     
 class ConsolidatedData(Base):
     """Модель для хранения сводных данных по компаниям"""
@@ -296,3 +343,7 @@ class ConsolidatedData(Base):
     created_at = Column(DateTime, default=datetime.now)
     
     company = relationship("Company")
+    
+    __table_args__ = (
+        UniqueConstraint('company_id', 'report_date', name='uq_consolidated_data_company_date'),
+    )
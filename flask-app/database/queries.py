@@ -1,8 +1,14 @@
 # database/queries.py - ПОЛНЫЙ ИСПРАВЛЕННЫЙ ФАЙЛ
 from .connection import db_connection
 from .models import *
+from .snapshot_cache import get_snapshot_cache
+from app_parser.company_resolver import get_company_directory, get_company_resolver
+from console import log
+from sqlalchemy import and_, func, insert
 from datetime import datetime, date as dt_date
 from typing import List, Dict, Any
+import csv
+import io
 import json
 import os
 
@@ -22,50 +28,17 @@ class DatabaseQueries:
         clean_lower = clean.lower()
         clean_lower = clean_lower.replace('"', '').replace('ооо', '').replace('ао', '').replace('пао', '').replace('«', '').replace('»', '').strip()
         
-        print(f"🔍 Нормализация: '{original_name}' -> '{clean_lower}'")
+        log(f"🔍 Нормализация: '{original_name}' -> '{clean_lower}'")
         
-        # Расширенное сопоставление с приоритетом точных совпадений
-        exact_mappings = {
-            'саханефтегазсбыт': 'Саханефтегазсбыт',
-            'снгс': 'Саханефтегазсбыт',
-            'санги': 'Саханефтегазсбыт',
-            'туймаада-нефть': 'Туймаада-Нефть', 
-            'туймааданефть': 'Туймаада-Нефть',
-            'туймаада': 'Туймаада-Нефть',
-            'сибойл': 'Сибойл',
-            'сибирьойл': 'Сибойл',
-            'сибирь ойл': 'Сибойл',
-            'экто-ойл': 'ЭКТО-Ойл',
-            'эктоойл': 'ЭКТО-Ойл',
-            'экто': 'ЭКТО-Ойл',
-            'сибирское топливо': 'Сибирское топливо',
-            'сибтопливо': 'Сибирское топливо',
-            'паритет': 'Паритет',
-        }
-        
-        # Сначала проверяем точные совпадения
-        for pattern, normalized_name in exact_mappings.items():
-            if pattern in clean_lower:
-                print(f"  ✅ Точное совпадение: '{normalized_name}'")
-                return normalized_name
-        
-        # Затем проверяем частичные совпадения
-        partial_mappings = [
-            (['саха', 'нефтегазсбыт'], 'Саханефтегазсбыт'),
-            (['туймаада', 'нефть'], 'Туймаада-Нефть'),
-            (['сиб', 'ойл'], 'Сибойл'),
-            (['сибирск', 'топливо'], 'Сибирское топливо'),
-            (['экто', 'ойл'], 'ЭКТО-Ойл'),
-        ]
-        
-        for patterns, normalized_name in partial_mappings:
-            if all(pattern in clean_lower for pattern in patterns):
-                print(f"  ✅ Частичное совпадение: '{normalized_name}'")
-                return normalized_name
+        # Псевдонимы и составные признаки компаний - в одном скомпилированном выражении
+        normalized_name = get_company_resolver().resolve(clean_lower)
+        if normalized_name:
+            log(f"  ✅ Совпадение: '{normalized_name}'")
+            return normalized_name
         
         # Если не нашли, возвращаем оригинальное название (очищенное)
         result = clean
-        print(f"  ⚠️  Совпадений не найдено, используем: '{result}'")
+        log(f"  ⚠️  Совпадений не найдено, используем: '{result}'")
         return result
     
     def add_company(self, name: str, code: str = None, email_pattern: str = None) -> Company:
@@ -79,6 +52,7 @@ class DatabaseQueries:
             )
             session.add(company)
             session.commit()
+            get_company_directory().invalidate()
             return company
         except Exception as e:
             session.rollback()
@@ -93,36 +67,37 @@ class DatabaseQueries:
         try:
             # Нормализуем название компании
             normalized_name = self.normalize_company_name(company_name)
-            print(f"💾 Сохранение файла: '{filename}'")
-            print(f"   Исходное название компании: '{company_name}'")
-            print(f"   Нормализованное название: '{normalized_name}'")
+            log(f"💾 Сохранение файла: '{filename}'")
+            log(f"   Исходное название компании: '{company_name}'")
+            log(f"   Нормализованное название: '{normalized_name}'")
             
-            # Ищем компанию в базе по нормализованному имени
+            # Ищем компанию по нормализованному имени в кэше таблицы companies;
+            # если запись в БД не совпала с кэшем (удалена, переименована), кэш перечитывается
             company = None
-            all_companies = session.query(Company).all()
-            
-            # Сначала точное совпадение
-            for c in all_companies:
-                if normalized_name.lower() == c.name.lower():
-                    company = c
-                    print(f"   ✅ Найдена точное совпадение: {c.name} (ID: {c.id})")
+            directory = get_company_directory()
+            for _ in range(2):
+                found = directory.find(
+                    normalized_name,
+                    lambda: session.query(Company.id, Company.name).order_by(Company.id).all()
+                )
+                if not found:
                     break
-            
-            # Если точного нет, ищем частичное
-            if not company:
-                for c in all_companies:
-                    if (normalized_name.lower() in c.name.lower() or 
-                        c.name.lower() in normalized_name.lower()):
-                        company = c
-                        print(f"   ✅ Найдено частичное совпадение: {c.name} (ID: {c.id})")
-                        break
+                company_id, found_name, exact = found
+                company = session.get(Company, company_id)
+                if company is not None and company.name == found_name:
+                    kind = 'точное' if exact else 'частичное'
+                    log(f"   ✅ Найдено {kind} совпадение: {found_name} (ID: {company_id})")
+                    break
+                company = None
+                directory.invalidate()
             
             # Если не нашли, создаем новую компанию
             if not company:
                 company = Company(name=normalized_name)
                 session.add(company)
                 session.commit()
-                print(f"   🆕 Создана новая компания: {normalized_name} (ID: {company.id})")
+                directory.invalidate()
+                log(f"   🆕 Создана новая компания: {normalized_name} (ID: {company.id})")
             
             # Проверяем, нет ли уже файла на эту дату для этой компании
             existing = session.query(UploadedFile).filter(
@@ -136,8 +111,12 @@ class DatabaseQueries:
                 existing.file_path = file_path
                 existing.upload_date = datetime.now()
                 existing.status = 'processed'
+                existing.file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+                # Хэш нового содержимого записывается только после сохранения его данных
+                existing.content_hash = None
+                session.commit()
                 file_id = existing.id
-                print(f"   📝 Обновлен существующий файл ID: {file_id}")
+                log(f"   📝 Обновлен существующий файл ID: {file_id}")
             else:
                 # Создаем новый файл
                 uploaded_file = UploadedFile(
@@ -151,13 +130,13 @@ class DatabaseQueries:
                 session.add(uploaded_file)
                 session.commit()
                 file_id = uploaded_file.id
-                print(f"   📄 Создан новый файл ID: {file_id}")
+                log(f"   📄 Создан новый файл ID: {file_id}")
             
             return file_id, company.id
             
         except Exception as e:
             session.rollback()
-            print(f"❌ Ошибка сохранения файла: {e}")
+            log(f"❌ Ошибка сохранения файла: {e}")
             raise e
         finally:
             self.db.close_session()
@@ -187,6 +166,7 @@ class DatabaseQueries:
                 {
                     'id': file.UploadedFile.id,
                     'filename': file.UploadedFile.filename,
+                    'file_path': file.UploadedFile.file_path,
                     'company_name': file.company_name,
                     'report_date': file.UploadedFile.report_date,
                     'upload_date': file.UploadedFile.upload_date,
@@ -197,23 +177,111 @@ class DatabaseQueries:
         finally:
             self.db.close_session()
             
-    def save_sheet1_data(self, file_id: int, company_id: int, report_date: dt_date, data: List[Dict]):
-        """Сохранение данных из листа 1"""
+    # Построители строк: словарь значений колонок для одной записи листа.
+    # Используются и ORM-путем (save_sheetN_data), и пакетной вставкой (save_all_sheets_bulk).
+    
+    def _sheet1_row(self, item: Dict) -> Dict[str, Any]:
+        return {
+            'affiliation': item.get('affiliation', ''),
+            'company_name': item.get('company', ''),
+            'oil_depots_count': item.get('oil_depots_count', 0),
+            'azs_count': item.get('azs_count', 0),
+            'working_azs_count': item.get('working_azs_count', 0),
+        }
+    
+    def _sheet2_row(self, data: Dict) -> Dict[str, Any]:
+        return {
+            'year': datetime.now().year,
+            'gasoline_total': data.get('yearly_gasoline_total', 0),
+            'gasoline_ai92': data.get('yearly_ai92', 0),
+            'gasoline_ai95': data.get('yearly_ai95', 0),
+            'diesel_total': data.get('yearly_diesel_total', 0),
+            'month': datetime.now().strftime('%B'),
+            'monthly_gasoline_total': data.get('monthly_gasoline_total', 0),
+            'monthly_gasoline_ai92': data.get('monthly_ai92', 0),
+            'monthly_gasoline_ai95': data.get('monthly_ai95', 0),
+            'monthly_diesel_total': data.get('monthly_diesel_total', 0),
+        }
+    
+    def _sheet3_row(self, item: Dict) -> Dict[str, Any]:
+        return {
+            'affiliation': item.get('group', ''),
+            'company_name': item.get('company', ''),
+            'location_type': 'Объект',
+            'location_name': item.get('object_name', ''),
+            'stock_ai92': item.get('stock_ai92', 0),
+            'stock_ai95': item.get('stock_ai95', 0),
+            'stock_ai98_100': item.get('stock_ai98_100', 0),
+            'stock_diesel_winter': item.get('stock_diesel_winter', 0),
+            'stock_diesel_arctic': item.get('stock_diesel_arctic', 0),
+            'stock_diesel_summer': item.get('stock_diesel_summer', 0),
+            'transit_ai92': item.get('transit_ai92', 0),
+            'transit_ai95': item.get('transit_ai95', 0),
+            'transit_ai98_100': item.get('transit_ai98_100', 0),
+            'transit_diesel_winter': item.get('transit_diesel_winter', 0),
+            'transit_diesel_arctic': item.get('transit_diesel_arctic', 0),
+            'transit_diesel_summer': item.get('transit_diesel_summer', 0),
+            'capacity_ai92': item.get('capacity_ai92', 0),
+            'capacity_ai95': item.get('capacity_ai95', 0),
+            'capacity_ai98_100': item.get('capacity_ai98_100', 0),
+            'capacity_diesel_winter': item.get('capacity_diesel_winter', 0),
+            'capacity_diesel_arctic': item.get('capacity_diesel_arctic', 0),
+            'capacity_diesel_summer': item.get('capacity_diesel_summer', 0),
+        }
+    
+    def _sheet4_row(self, item: Dict) -> Dict[str, Any]:
+        return {
+            'company_name': item.get('company', ''),
+            'oil_depot_name': item.get('oil_depot', ''),
+            'supply_date': self._parse_date_string(item.get('supply_date', '')),
+            'supply_ai92': item.get('supply_ai92', 0),
+            'supply_ai95': item.get('supply_ai95', 0),
+            'supply_ai98_100': item.get('supply_ai98_100', 0),
+            'supply_diesel_winter': item.get('supply_diesel_winter', 0),
+            'supply_diesel_arctic': item.get('supply_diesel_arctic', 0),
+            'supply_diesel_summer': item.get('supply_diesel_summer', 0),
+        }
+    
+    def _sheet5_row(self, item: Dict) -> Dict[str, Any]:
+        return {
+            'company_name': item.get('company', ''),
+            'location_name': item.get('object_name', ''),
+            'daily_ai92': item.get('daily_ai92', 0),
+            'daily_ai95': item.get('daily_ai95', 0),
+            'daily_ai98_100': item.get('daily_ai98_100', 0),
+            'daily_diesel_winter': item.get('daily_winter', 0),
+            'daily_diesel_arctic': item.get('daily_arctic', 0),
+            'daily_diesel_summer': item.get('daily_summer', 0),
+            'monthly_ai92': item.get('monthly_ai92', 0),
+            'monthly_ai95': item.get('monthly_ai95', 0),
+            'monthly_ai98_100': item.get('monthly_ai98_100', 0),
+            'monthly_diesel_winter': item.get('monthly_winter', 0),
+            'monthly_diesel_arctic': item.get('monthly_arctic', 0),
+            'monthly_diesel_summer': item.get('monthly_summer', 0),
+        }
+    
+    def _sheet6_row(self, item: Dict) -> Dict[str, Any]:
+        return {
+            'airport_name': item.get('airport', ''), 'tzk_name': item.get('tzk', ''),
+            'contracts_info': item.get('contracts', ''), 'supply_week': item.get('supply_week', 0),
+            'supply_month_start': item.get('supply_month_start', 0), 'monthly_demand': item.get('monthly_demand', 0),
+            'consumption_week': item.get('consumption_week', 0), 'consumption_month_start': item.get('consumption_month_start', 0),
+            'end_of_day_balance': item.get('end_of_day_balance', 0)
+        }
+    
+    def _sheet7_row(self, item: Dict) -> Dict[str, Any]:
+        return {
+            'fuel_type': item.get('fuel_type', ''), 'situation': item.get('situation', ''),
+            'comments': item.get('comments', '')
+        }
+    
+    def _save_sheet_rows(self, model, file_id: int, company_id: int, report_date: dt_date, rows: List[Dict]):
+        """ORM-сохранение строк одного листа: удаляем старые записи файла и добавляем новые"""
         session = self.db.get_session()
         try:
-            session.query(Sheet1Structure).filter(Sheet1Structure.file_id == file_id).delete()
-            for item in data:
-                sheet1 = Sheet1Structure(
-                    file_id=file_id,
-                    company_id=company_id,
-                    report_date=report_date,
-                    affiliation=item.get('affiliation', ''),
-                    company_name=item.get('company', ''),
-                    oil_depots_count=item.get('oil_depots_count', 0),
-                    azs_count=item.get('azs_count', 0),
-                    working_azs_count=item.get('working_azs_count', 0)
-                )
-                session.add(sheet1)
+            session.query(model).filter(model.file_id == file_id).delete()
+            for row in rows:
+                session.add(model(file_id=file_id, company_id=company_id, report_date=report_date, **row))
             session.commit()
         except Exception as e:
             session.rollback()
@@ -221,175 +289,105 @@ class DatabaseQueries:
         finally:
             self.db.close_session()
     
+    def save_sheet1_data(self, file_id: int, company_id: int, report_date: dt_date, data: List[Dict]):
+        """Сохранение данных из листа 1"""
+        self._save_sheet_rows(Sheet1Structure, file_id, company_id, report_date,
+                              [self._sheet1_row(item) for item in data])
+    
     def save_sheet2_data(self, file_id: int, company_id: int, report_date: dt_date, data: Dict):
         """Сохранение данных из листа 2"""
         if not data: return
-        session = self.db.get_session()
-        try:
-            session.query(Sheet2Demand).filter(Sheet2Demand.file_id == file_id).delete()
-            sheet2 = Sheet2Demand(
-                file_id=file_id,
-                company_id=company_id,
-                report_date=report_date,
-                year=datetime.now().year,
-                gasoline_total=data.get('yearly_gasoline_total', 0),
-                gasoline_ai92=data.get('yearly_ai92', 0),
-                gasoline_ai95=data.get('yearly_ai95', 0),
-                diesel_total=data.get('yearly_diesel_total', 0),
-                month=datetime.now().strftime('%B'),
-                monthly_gasoline_total=data.get('monthly_gasoline_total', 0),
-                monthly_gasoline_ai92=data.get('monthly_ai92', 0),
-                monthly_gasoline_ai95=data.get('monthly_ai95', 0),
-                monthly_diesel_total=data.get('monthly_diesel_total', 0),
-            )
-            session.add(sheet2)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            self.db.close_session()
+        self._save_sheet_rows(Sheet2Demand, file_id, company_id, report_date, [self._sheet2_row(data)])
     
     def save_sheet3_data(self, file_id: int, company_id: int, report_date: dt_date, data: List[Dict]):
         """Сохранение данных из листа 3"""
-        session = self.db.get_session()
-        try:
-            session.query(Sheet3Balance).filter(Sheet3Balance.file_id == file_id).delete()
-            for item in data:
-                sheet3 = Sheet3Balance(
-                    file_id=file_id,
-                    company_id=company_id,
-                    report_date=report_date,
-                    affiliation=item.get('group', ''),
-                    company_name=item.get('company', ''),
-                    location_type='Объект',
-                    location_name=item.get('object_name', ''),
-                    stock_ai92=item.get('stock_ai92', 0),
-                    stock_ai95=item.get('stock_ai95', 0),
-                    stock_ai98_100=item.get('stock_ai98_100', 0),
-                    stock_diesel_winter=item.get('stock_diesel_winter', 0),
-                    stock_diesel_arctic=item.get('stock_diesel_arctic', 0),
-                    stock_diesel_summer=item.get('stock_diesel_summer', 0),
-                    transit_ai92=item.get('transit_ai92', 0),
-                    transit_ai95=item.get('transit_ai95', 0),
-                    transit_ai98_100=item.get('transit_ai98_100', 0),
-                    transit_diesel_winter=item.get('transit_diesel_winter', 0),
-                    transit_diesel_arctic=item.get('transit_diesel_arctic', 0),
-                    transit_diesel_summer=item.get('transit_diesel_summer', 0),
-                    capacity_ai92=item.get('capacity_ai92', 0),
-                    capacity_ai95=item.get('capacity_ai95', 0),
-                    capacity_ai98_100=item.get('capacity_ai98_100', 0),
-                    capacity_diesel_winter=item.get('capacity_diesel_winter', 0),
-                    capacity_diesel_arctic=item.get('capacity_diesel_arctic', 0),
-                    capacity_diesel_summer=item.get('capacity_diesel_summer', 0),
-                )
-                session.add(sheet3)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            self.db.close_session()
+        self._save_sheet_rows(Sheet3Balance, file_id, company_id, report_date,
+                              [self._sheet3_row(item) for item in data])
     
     def save_sheet4_data(self, file_id: int, company_id: int, report_date: dt_date, data: List[Dict]):
         """Сохранение данных из листа 4"""
-        session = self.db.get_session()
-        try:
-            session.query(Sheet4Supply).filter(Sheet4Supply.file_id == file_id).delete()
-            for item in data:
-                sheet4 = Sheet4Supply(
-                    file_id=file_id,
-                    company_id=company_id,
-                    report_date=report_date,
-                    company_name=item.get('company', ''),
-                    oil_depot_name=item.get('oil_depot', ''),
-                    supply_date=self._parse_date_string(item.get('supply_date', '')),
-                    supply_ai92=item.get('supply_ai92', 0),
-                    supply_ai95=item.get('supply_ai95', 0),
-                    supply_ai98_100=item.get('supply_ai98_100', 0),
-                    supply_diesel_winter=item.get('supply_diesel_winter', 0),
-                    supply_diesel_arctic=item.get('supply_diesel_arctic', 0),
-                    supply_diesel_summer=item.get('supply_diesel_summer', 0),
-                )
-                session.add(sheet4)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            self.db.close_session()
+        self._save_sheet_rows(Sheet4Supply, file_id, company_id, report_date,
+                              [self._sheet4_row(item) for item in data])
     
     def save_sheet5_data(self, file_id: int, company_id: int, report_date: dt_date, data: List[Dict]):
         """Сохранение данных из листа 5"""
-        session = self.db.get_session()
-        try:
-            session.query(Sheet5Sales).filter(Sheet5Sales.file_id == file_id).delete()
-            for item in data:
-                sheet5 = Sheet5Sales(
-                    file_id=file_id,
-                    company_id=company_id,
-                    report_date=report_date,
-                    company_name=item.get('company', ''),
-                    location_name=item.get('object_name', ''),
-                    daily_ai92=item.get('daily_ai92', 0),
-                    daily_ai95=item.get('daily_ai95', 0),
-                    daily_ai98_100=item.get('daily_ai98_100', 0),
-                    daily_diesel_winter=item.get('daily_winter', 0),
-                    daily_diesel_arctic=item.get('daily_arctic', 0),
-                    daily_diesel_summer=item.get('daily_summer', 0),
-                    monthly_ai92=item.get('monthly_ai92', 0),
-                    monthly_ai95=item.get('monthly_ai95', 0),
-                    monthly_ai98_100=item.get('monthly_ai98_100', 0),
-                    monthly_diesel_winter=item.get('monthly_winter', 0),
-                    monthly_diesel_arctic=item.get('monthly_arctic', 0),
-                    monthly_diesel_summer=item.get('monthly_summer', 0),
-                )
-                session.add(sheet5)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            self.db.close_session()
+        self._save_sheet_rows(Sheet5Sales, file_id, company_id, report_date,
+                              [self._sheet5_row(item) for item in data])
             
     def save_sheet6_data(self, file_id: int, company_id: int, report_date: dt_date, data: List[Dict]):
-        session = self.db.get_session()
-        try:
-            session.query(Sheet6Aviation).filter(Sheet6Aviation.file_id == file_id).delete()
-            for item in data:
-                sheet6 = Sheet6Aviation(
-                    file_id=file_id, company_id=company_id, report_date=report_date,
-                    airport_name=item.get('airport', ''), tzk_name=item.get('tzk', ''),
-                    contracts_info=item.get('contracts', ''), supply_week=item.get('supply_week', 0),
-                    supply_month_start=item.get('supply_month_start', 0), monthly_demand=item.get('monthly_demand', 0),
-                    consumption_week=item.get('consumption_week', 0), consumption_month_start=item.get('consumption_month_start', 0),
-                    end_of_day_balance=item.get('end_of_day_balance', 0)
-                )
-                session.add(sheet6)
-            session.commit()
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            self.db.close_session()
+        self._save_sheet_rows(Sheet6Aviation, file_id, company_id, report_date,
+                              [self._sheet6_row(item) for item in data])
 
     def save_sheet7_data(self, file_id: int, company_id: int, report_date: dt_date, data: List[Dict]):
+        self._save_sheet_rows(Sheet7Comments, file_id, company_id, report_date,
+                              [self._sheet7_row(item) for item in data])
+
+    def save_all_sheets_bulk(self, file_id: int, company_id: int, report_date: dt_date,
+                             all_data: Dict[str, Any]) -> Dict[str, int]:
+        """Пакетное сохранение всех листов файла в одной транзакции.
+        
+        Семантика та же, что у save_sheetN_data: записи файла удаляются и вставляются заново.
+        Вставка - executemany через Core insert, на PostgreSQL - COPY.
+        Возвращает число сохраненных записей по листам.
+        """
+        sheets = [
+            ('sheet1', Sheet1Structure, self._sheet1_row),
+            ('sheet2', Sheet2Demand, self._sheet2_row),
+            ('sheet3', Sheet3Balance, self._sheet3_row),
+            ('sheet4', Sheet4Supply, self._sheet4_row),
+            ('sheet5', Sheet5Sales, self._sheet5_row),
+            ('sheet6', Sheet6Aviation, self._sheet6_row),
+            ('sheet7', Sheet7Comments, self._sheet7_row),
+        ]
         session = self.db.get_session()
         try:
-            session.query(Sheet7Comments).filter(Sheet7Comments.file_id == file_id).delete()
-            for item in data:
-                sheet7 = Sheet7Comments(
-                    file_id=file_id, company_id=company_id, report_date=report_date,
-                    fuel_type=item.get('fuel_type', ''), situation=item.get('situation', ''),
-                    comments=item.get('comments', '')
-                )
-                session.add(sheet7)
+            use_copy = session.get_bind().dialect.name == 'postgresql'
+            saved_counts = {}
+            for sheet_key, model, build_row in sheets:
+                data = all_data.get(sheet_key)
+                if not data:
+                    continue
+                items = [data] if sheet_key == 'sheet2' else data
+                created_at = datetime.now()
+                rows = [
+                    dict(build_row(item), file_id=file_id, company_id=company_id,
+                         report_date=report_date, created_at=created_at)
+                    for item in items
+                ]
+                
+                session.query(model).filter(model.file_id == file_id).delete(synchronize_session=False)
+                if use_copy:
+                    self._copy_rows(session, model, rows)
+                else:
+                    session.execute(insert(model), rows)
+                saved_counts[sheet_key] = len(rows)
             session.commit()
+            return saved_counts
         except Exception as e:
             session.rollback()
             raise e
         finally:
             self.db.close_session()
+    
+    def _copy_rows(self, session, model, rows: List[Dict]):
+        """COPY ... FROM STDIN (PostgreSQL) в рамках текущей транзакции сессии"""
+        if not rows:
+            return
+        columns = list(rows[0].keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['\\N' if row[col] is None else row[col] for col in columns])
+        buffer.seek(0)
+        
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                buffer
+            )
+        finally:
+            cursor.close()
 
     def _parse_date_string(self, date_str: str):
         if not date_str: return None
@@ -414,78 +412,122 @@ class DatabaseQueries:
         if 'sheet7' in parsed_data: self.save_sheet7_data(file_id, company_id, report_date, parsed_data['sheet7'])
         return file_id
 
+    def _latest_rows(self, session, model, company_ids: List[int]) -> Dict[int, List[Any]]:
+        """Записи листа за последнюю report_date каждой компании - один запрос на лист.
+        
+        Последняя дата считается подзапросом MAX(report_date) ... GROUP BY company_id,
+        так что история за прошлые даты из БД не читается.
+        """
+        latest = (
+            session.query(model.company_id.label('company_id'), func.max(model.report_date).label('report_date'))
+            .filter(model.company_id.in_(company_ids))
+            .group_by(model.company_id)
+            .subquery()
+        )
+        rows = (
+            session.query(model)
+            .join(latest, and_(model.company_id == latest.c.company_id,
+                               model.report_date == latest.c.report_date))
+            .order_by(model.company_id, model.id)
+            .all()
+        )
+        by_company = {}
+        for row in rows:
+            by_company.setdefault(row.company_id, []).append(row)
+        return by_company
+
     def get_aggregated_data(self, report_date: datetime = None, company_id: int = None) -> Dict[str, Any]:
+        """Снимок последних данных по компаниям; кэшируется до обработки следующего файла"""
+        return self.get_aggregated_snapshot(report_date, company_id)[0]
+
+    def get_aggregated_snapshot(self, report_date: datetime = None, company_id: int = None) -> tuple:
+        """(снимок, версия данных get_report_data_version, с которой он посчитан).
+
+        Версия хранится вместе со снимком: отчет из устаревшего снимка (TTL кэша в другом
+        процессе, расчет во время обработки файла) регистрируется под версией снимка,
+        а не под текущей версией БД."""
+        snapshot = get_snapshot_cache().get_or_compute(
+            (report_date, company_id),
+            lambda: self._compute_versioned_snapshot(report_date, company_id)
+        )
+        return snapshot if snapshot else ({}, None)
+
+    def _compute_versioned_snapshot(self, report_date: datetime = None, company_id: int = None):
+        # Версия читается до расчета: данные снимка не старше этой версии
+        version = self.get_report_data_version()
+        data = self._compute_aggregated_data(report_date, company_id)
+        # Пустой снимок не кэшируется
+        return (data, version) if data else None
+
+    def invalidate_aggregated_data(self):
+        get_snapshot_cache().invalidate()
+
+    def _compute_aggregated_data(self, report_date: datetime = None, company_id: int = None) -> Dict[str, Any]:
         session = self.db.get_session()
         try:
             result = {}
             companies = session.query(Company).filter(Company.id == company_id).all() if company_id else session.query(Company).filter(Company.is_active == True).all()
+            if not companies:
+                return result
+            company_ids = [company.id for company in companies]
+            
+            s1 = self._latest_rows(session, Sheet1Structure, company_ids)
+            s2 = self._latest_rows(session, Sheet2Demand, company_ids)
+            s3 = self._latest_rows(session, Sheet3Balance, company_ids)
+            s4 = self._latest_rows(session, Sheet4Supply, company_ids)
+            s5 = self._latest_rows(session, Sheet5Sales, company_ids)
+            s6 = self._latest_rows(session, Sheet6Aviation, company_ids)
+            s7 = self._latest_rows(session, Sheet7Comments, company_ids)
+            
             for company in companies:
                 company_data = {'name': company.name, 'sheet1': [], 'sheet2': {}, 'sheet3_data': [], 'sheet4_data': [], 'sheet5_data': [], 'sheet6_data': [], 'sheet7_data': []}
                 has_data = False
                 
                 # Sheet 1
-                s1 = session.query(Sheet1Structure).filter(Sheet1Structure.company_id == company.id).order_by(Sheet1Structure.report_date.desc()).all()
-                if s1:
-                    last_date = s1[0].report_date
-                    for item in [x for x in s1 if x.report_date == last_date]:
-                        company_data['sheet1'].append({'affiliation': item.affiliation, 'company_name': item.company_name, 'oil_depots_count': item.oil_depots_count, 'azs_count': item.azs_count, 'working_azs_count': item.working_azs_count})
-                        has_data = True
-
-                # Sheet 2
-                s2 = session.query(Sheet2Demand).filter(Sheet2Demand.company_id == company.id).order_by(Sheet2Demand.report_date.desc()).first()
-                if s2:
-                    company_data['sheet2'] = {'year': s2.report_date.year, 'gasoline_total': s2.gasoline_total, 'gasoline_ai92': s2.gasoline_ai92, 'gasoline_ai95': s2.gasoline_ai95, 'diesel_total': s2.diesel_total, 'monthly_gasoline_total': s2.monthly_gasoline_total, 'monthly_diesel_total': s2.monthly_diesel_total}
+                for item in s1.get(company.id, []):
+                    company_data['sheet1'].append({'affiliation': item.affiliation, 'company_name': item.company_name, 'oil_depots_count': item.oil_depots_count, 'azs_count': item.azs_count, 'working_azs_count': item.working_azs_count})
+                    has_data = True
+
+                # Sheet 2 (одна запись на файл)
+                if company.id in s2:
+                    item = s2[company.id][0]
+                    company_data['sheet2'] = {'year': item.report_date.year, 'gasoline_total': item.gasoline_total, 'gasoline_ai92': item.gasoline_ai92, 'gasoline_ai95': item.gasoline_ai95, 'diesel_total': item.diesel_total, 'monthly_gasoline_total': item.monthly_gasoline_total, 'monthly_diesel_total': item.monthly_diesel_total}
                     has_data = True
 
                 # Sheet 3
-                s3 = session.query(Sheet3Balance).filter(Sheet3Balance.company_id == company.id).order_by(Sheet3Balance.report_date.desc()).all()
-                if s3:
-                    last_date = s3[0].report_date
-                    for item in [x for x in s3 if x.report_date == last_date]:
-                        company_data['sheet3_data'].append({
-                            'location_name': item.location_name, 'stock_ai92': item.stock_ai92, 'stock_ai95': item.stock_ai95, 'stock_ai98_ai100': item.stock_ai98_100,
-                            'stock_diesel_winter': item.stock_diesel_winter, 'stock_diesel_arctic': item.stock_diesel_arctic, 'stock_diesel_summer': item.stock_diesel_summer,
-                            'transit_ai92': item.transit_ai92, 'transit_ai95': item.transit_ai95, 'transit_ai98_ai100': item.transit_ai98_100,
-                            'transit_diesel_winter': item.transit_diesel_winter, 'transit_diesel_arctic': item.transit_diesel_arctic, 'transit_diesel_summer': item.transit_diesel_summer,
-                            'capacity_ai92': item.capacity_ai92, 'capacity_ai95': item.capacity_ai95, 'capacity_ai98_ai100': item.capacity_ai98_100,
-                            'capacity_diesel_winter': item.capacity_diesel_winter, 'capacity_diesel_arctic': item.capacity_diesel_arctic, 'capacity_diesel_summer': item.capacity_diesel_summer,
-                        })
-                        has_data = True
+                for item in s3.get(company.id, []):
+                    company_data['sheet3_data'].append({
+                        'location_name': item.location_name, 'stock_ai92': item.stock_ai92, 'stock_ai95': item.stock_ai95, 'stock_ai98_ai100': item.stock_ai98_100,
+                        'stock_diesel_winter': item.stock_diesel_winter, 'stock_diesel_arctic': item.stock_diesel_arctic, 'stock_diesel_summer': item.stock_diesel_summer,
+                        'transit_ai92': item.transit_ai92, 'transit_ai95': item.transit_ai95, 'transit_ai98_ai100': item.transit_ai98_100,
+                        'transit_diesel_winter': item.transit_diesel_winter, 'transit_diesel_arctic': item.transit_diesel_arctic, 'transit_diesel_summer': item.transit_diesel_summer,
+                        'capacity_ai92': item.capacity_ai92, 'capacity_ai95': item.capacity_ai95, 'capacity_ai98_ai100': item.capacity_ai98_100,
+                        'capacity_diesel_winter': item.capacity_diesel_winter, 'capacity_diesel_arctic': item.capacity_diesel_arctic, 'capacity_diesel_summer': item.capacity_diesel_summer,
+                    })
+                    has_data = True
 
                 # Sheet 4
-                s4 = session.query(Sheet4Supply).filter(Sheet4Supply.company_id == company.id).order_by(Sheet4Supply.report_date.desc()).all()
-                if s4:
-                    last_date = s4[0].report_date
-                    for item in [x for x in s4 if x.report_date == last_date]:
-                        company_data['sheet4_data'].append({'oil_depot_name': item.oil_depot_name, 'supply_date': item.supply_date, 'supply_ai92': item.supply_ai92, 'supply_ai95': item.supply_ai95, 'supply_ai98_100': item.supply_ai98_100, 'supply_diesel_winter': item.supply_diesel_winter, 'supply_diesel_arctic': item.supply_diesel_arctic, 'supply_diesel_summer': item.supply_diesel_summer})
-                        has_data = True
+                for item in s4.get(company.id, []):
+                    company_data['sheet4_data'].append({'oil_depot_name': item.oil_depot_name, 'supply_date': item.supply_date, 'supply_ai92': item.supply_ai92, 'supply_ai95': item.supply_ai95, 'supply_ai98_100': item.supply_ai98_100, 'supply_diesel_winter': item.supply_diesel_winter, 'supply_diesel_arctic': item.supply_diesel_arctic, 'supply_diesel_summer': item.supply_diesel_summer})
+                    has_data = True
 
                 # Sheet 5
-                s5 = session.query(Sheet5Sales).filter(Sheet5Sales.company_id == company.id).order_by(Sheet5Sales.report_date.desc()).all()
-                if s5:
-                    last_date = s5[0].report_date
-                    for item in [x for x in s5 if x.report_date == last_date]:
-                        company_data['sheet5_data'].append({
-                            'location_name': item.location_name, 'daily_ai92': item.daily_ai92, 'daily_ai95': item.daily_ai95, 'daily_ai98_100': item.daily_ai98_100, 'daily_winter': item.daily_diesel_winter, 'daily_arctic': item.daily_diesel_arctic, 'daily_summer': item.daily_diesel_summer,
-                            'monthly_ai92': item.monthly_ai92, 'monthly_ai95': item.monthly_ai95, 'monthly_ai98_100': item.monthly_ai98_100, 'monthly_diesel_winter': item.monthly_diesel_winter, 'monthly_diesel_arctic': item.monthly_diesel_arctic, 'monthly_diesel_summer': item.monthly_diesel_summer
-                        })
-                        has_data = True
+                for item in s5.get(company.id, []):
+                    company_data['sheet5_data'].append({
+                        'location_name': item.location_name, 'daily_ai92': item.daily_ai92, 'daily_ai95': item.daily_ai95, 'daily_ai98_100': item.daily_ai98_100, 'daily_winter': item.daily_diesel_winter, 'daily_arctic': item.daily_diesel_arctic, 'daily_summer': item.daily_diesel_summer,
+                        'monthly_ai92': item.monthly_ai92, 'monthly_ai95': item.monthly_ai95, 'monthly_ai98_100': item.monthly_ai98_100, 'monthly_diesel_winter': item.monthly_diesel_winter, 'monthly_diesel_arctic': item.monthly_diesel_arctic, 'monthly_diesel_summer': item.monthly_diesel_summer
+                    })
+                    has_data = True
 
                 # Sheet 6
-                s6 = session.query(Sheet6Aviation).filter(Sheet6Aviation.company_id == company.id).order_by(Sheet6Aviation.report_date.desc()).all()
-                if s6:
-                    last_date = s6[0].report_date
-                    for item in [x for x in s6 if x.report_date == last_date]:
-                        company_data['sheet6_data'].append({'airport_name': item.airport_name, 'tzk_name': item.tzk_name, 'contracts_info': item.contracts_info, 'supply_week': item.supply_week, 'supply_month_start': item.supply_month_start, 'monthly_demand': item.monthly_demand, 'consumption_week': item.consumption_week, 'consumption_month_start': item.consumption_month_start, 'end_of_day_balance': item.end_of_day_balance})
-                        has_data = True
+                for item in s6.get(company.id, []):
+                    company_data['sheet6_data'].append({'airport_name': item.airport_name, 'tzk_name': item.tzk_name, 'contracts_info': item.contracts_info, 'supply_week': item.supply_week, 'supply_month_start': item.supply_month_start, 'monthly_demand': item.monthly_demand, 'consumption_week': item.consumption_week, 'consumption_month_start': item.consumption_month_start, 'end_of_day_balance': item.end_of_day_balance})
+                    has_data = True
 
                 # Sheet 7
-                s7 = session.query(Sheet7Comments).filter(Sheet7Comments.company_id == company.id).order_by(Sheet7Comments.report_date.desc()).all()
-                if s7:
-                    last_date = s7[0].report_date
-                    for item in [x for x in s7 if x.report_date == last_date]:
-                        company_data['sheet7_data'].append({'fuel_type': item.fuel_type, 'situation': item.situation, 'comments': item.comments})
-                        has_data = True
+                for item in s7.get(company.id, []):
+                    company_data['sheet7_data'].append({'fuel_type': item.fuel_type, 'situation': item.situation, 'comments': item.comments})
+                    has_data = True
 
                 if has_data: result[company.name] = company_data
             return result
@@ -495,14 +537,276 @@ class DatabaseQueries:
         finally:
             self.db.close_session()
 
-    def update_file_status(self, file_id: int, status: str, error_message: str = None):
+    def update_consolidated_data(self, company_id: int, report_date: dt_date) -> bool:
+        """Пересчет строки consolidated_data для одной пары (компания, дата отчета).
+        
+        Итоги считаются SQL-агрегатами только по строкам этой компании за эту дату,
+        поэтому стоимость не зависит от объема истории.
+        """
+        session = self.db.get_session()
+        try:
+            def totals(model, *columns):
+                """SUM по колонкам (NULL считаем нулем) для строк компании за дату"""
+                return session.query(*[func.coalesce(func.sum(func.coalesce(column, 0)), 0) for column in columns]).filter(
+                    model.company_id == company_id, model.report_date == report_date
+                ).one()
+
+            azs_count, working_azs, oil_depots = totals(
+                Sheet1Structure, Sheet1Structure.azs_count, Sheet1Structure.working_azs_count,
+                Sheet1Structure.oil_depots_count
+            )
+            stock_ai92, stock_ai95, stock_diesel = totals(
+                Sheet3Balance, Sheet3Balance.stock_ai92, Sheet3Balance.stock_ai95,
+                func.coalesce(Sheet3Balance.stock_diesel_winter, 0) + func.coalesce(Sheet3Balance.stock_diesel_arctic, 0)
+                + func.coalesce(Sheet3Balance.stock_diesel_summer, 0) + func.coalesce(Sheet3Balance.stock_diesel_intermediate, 0)
+            )
+            monthly_ai92, monthly_ai95, monthly_diesel = totals(
+                Sheet5Sales, Sheet5Sales.monthly_ai92, Sheet5Sales.monthly_ai95,
+                func.coalesce(Sheet5Sales.monthly_diesel_winter, 0) + func.coalesce(Sheet5Sales.monthly_diesel_arctic, 0)
+                + func.coalesce(Sheet5Sales.monthly_diesel_summer, 0) + func.coalesce(Sheet5Sales.monthly_diesel_intermediate, 0)
+            )
+            yearly_ai92, yearly_ai95, demand_ai92, demand_ai95 = totals(
+                Sheet2Demand, Sheet2Demand.gasoline_ai92, Sheet2Demand.gasoline_ai95,
+                Sheet2Demand.monthly_gasoline_ai92, Sheet2Demand.monthly_gasoline_ai95
+            )
+
+            totals_row = {
+                'total_azs_count': azs_count,
+                'total_working_azs': working_azs,
+                'total_oil_depots': oil_depots,
+                'total_stock_ai92': stock_ai92,
+                'total_stock_ai95': stock_ai95,
+                'total_stock_diesel': stock_diesel,
+                'total_monthly_ai92': monthly_ai92,
+                'total_monthly_ai95': monthly_ai95,
+                'total_monthly_diesel': monthly_diesel,
+                'yearly_demand_ai92': yearly_ai92,
+                'yearly_demand_ai95': yearly_ai95,
+                'monthly_demand_ai92': demand_ai92,
+                'monthly_demand_ai95': demand_ai95,
+                'created_at': datetime.now(),
+            }
+            # Одна инструкция INSERT ... ON CONFLICT DO UPDATE по уникальному индексу (миграция 0002):
+            # две задачи с той же компанией и датой не вставят строку дважды
+            if session.get_bind().dialect.name == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            statement = insert(ConsolidatedData).values(company_id=company_id, report_date=report_date, **totals_row)
+            session.execute(statement.on_conflict_do_update(index_elements=['company_id', 'report_date'],
+                                                            set_=totals_row))
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            self.db.close_session()
+
+    def rebuild_consolidated_data(self) -> int:
+        """Полный пересчет consolidated_data по всем загруженным файлам (для уже заполненной базы)"""
+        session = self.db.get_session()
+        try:
+            pairs = session.query(UploadedFile.company_id, UploadedFile.report_date).filter(
+                UploadedFile.company_id.isnot(None)
+            ).distinct().all()
+        finally:
+            self.db.close_session()
+
+        for company_id, report_date in pairs:
+            self.update_consolidated_data(company_id, report_date)
+        return len(pairs)
+
+    def get_consolidated_summary(self, company_id: int = None) -> List[Dict[str, Any]]:
+        """Итоги по компаниям за последнюю дату отчета каждой - одна строка на компанию"""
+        session = self.db.get_session()
+        try:
+            companies = session.query(Company).filter(Company.id == company_id).all() if company_id else session.query(Company).filter(Company.is_active == True).all()
+            if not companies:
+                return []
+            latest = self._latest_rows(session, ConsolidatedData, [company.id for company in companies])
+
+            summary = []
+            for company in companies:
+                if company.id not in latest:
+                    continue
+                item = latest[company.id][-1]
+                summary.append({
+                    'company_id': company.id,
+                    'company': company.name,
+                    'report_date': item.report_date.strftime('%Y-%m-%d'),
+                    'structure': {'azs_count': item.total_azs_count, 'working_azs_count': item.total_working_azs,
+                                  'oil_depots_count': item.total_oil_depots},
+                    'stock': {'ai92': item.total_stock_ai92, 'ai95': item.total_stock_ai95,
+                              'diesel': item.total_stock_diesel},
+                    'monthly_sales': {'ai92': item.total_monthly_ai92, 'ai95': item.total_monthly_ai95,
+                                      'diesel': item.total_monthly_diesel},
+                    'demand': {'yearly_ai92': item.yearly_demand_ai92, 'yearly_ai95': item.yearly_demand_ai95,
+                               'monthly_ai92': item.monthly_demand_ai92, 'monthly_ai95': item.monthly_demand_ai95},
+                    'updated_at': item.created_at.isoformat() if item.created_at else None,
+                })
+            return summary
+        finally:
+            self.db.close_session()
+
+    def get_all_data_summary(self) -> Dict[str, Any]:
+        """Сводка по базе для админки: файлы и итоги по компаниям из consolidated_data"""
+        session = self.db.get_session()
+        try:
+            files_total = session.query(UploadedFile).count()
+            files_processed = session.query(UploadedFile).filter(UploadedFile.status == 'processed').count()
+        finally:
+            self.db.close_session()
+
+        companies = self.get_consolidated_summary()
+        return {
+            'files_total': files_total,
+            'files_processed': files_processed,
+            'companies_with_data': len(companies),
+            'companies': companies,
+        }
+
+    def get_report_data_version(self) -> Dict[str, Any]:
+        """Версия входных данных отчета - агрегаты по загруженным файлам (без списка id).
+
+        processed_at ставится update_file_status после сохранения листов, пересчета итогов и
+        сброса кэша снимка, поэтому версия с новым last_processed появляется только когда
+        данные файла полностью в БД; upload_date меняется уже в начале обработки."""
+        session = self.db.get_session()
+        try:
+            files, last_file_id, last_upload, last_processed = session.query(
+                func.count(UploadedFile.id),
+                func.max(UploadedFile.id),
+                func.max(UploadedFile.upload_date),
+                func.max(UploadedFile.processed_at),
+            ).one()
+            return {
+                'files': files,
+                'last_file_id': last_file_id,
+                'last_upload': last_upload.isoformat() if last_upload else None,
+                'last_processed': last_processed.isoformat() if last_processed else None,
+            }
+        finally:
+            self.db.close_session()
+
+    def find_generated_report(self, content_hash: str) -> Dict[str, Any]:
+        """Последний действующий отчет с таким хэшем входных данных (или None)"""
+        session = self.db.get_session()
+        try:
+            report = session.query(GeneratedReport).filter(
+                GeneratedReport.content_hash == content_hash,
+                GeneratedReport.status == 'generated'
+            ).order_by(GeneratedReport.generated_at.desc(), GeneratedReport.id.desc()).first()
+            if report is None:
+                return None
+            return {
+                'id': report.id,
+                'report_date': report.report_date,
+                'file_path': report.file_path,
+                'file_size': report.file_size,
+            }
+        finally:
+            self.db.close_session()
+
+    def save_generated_report(self, report_date: dt_date, file_path: str, file_size: int,
+                              content_hash: str, generated_by: str = None) -> int:
+        """Регистрирует отчет; прежние записи с тем же файлом помечаются 'replaced' (файл перезаписан)"""
+        session = self.db.get_session()
+        try:
+            session.query(GeneratedReport).filter(
+                GeneratedReport.file_path == file_path,
+                GeneratedReport.status == 'generated'
+            ).update({GeneratedReport.status: 'replaced'}, synchronize_session=False)
+            report = GeneratedReport(
+                report_date=report_date,
+                file_path=file_path,
+                file_size=file_size,
+                content_hash=content_hash,
+                generated_by=generated_by,
+            )
+            session.add(report)
+            session.commit()
+            return report.id
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.db.close_session()
+
+    def mark_generated_reports(self, file_paths: List[str], status: str) -> int:
+        """Меняет статус действующих записей отчетов по путям файлов (например, 'evicted')"""
+        if not file_paths:
+            return 0
+        session = self.db.get_session()
+        try:
+            updated = session.query(GeneratedReport).filter(
+                GeneratedReport.file_path.in_(file_paths),
+                GeneratedReport.status == 'generated'
+            ).update({GeneratedReport.status: status}, synchronize_session=False)
+            session.commit()
+            return updated
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.db.close_session()
+
+    def get_generated_report_paths(self) -> List[str]:
+        """Пути действующих (не вытесненных и не перезаписанных) отчетов"""
+        session = self.db.get_session()
+        try:
+            rows = session.query(GeneratedReport.file_path).filter(
+                GeneratedReport.status == 'generated'
+            ).distinct()
+            return [row[0] for row in rows]
+        finally:
+            self.db.close_session()
+
+    def find_processed_upload(self, content_hash: str, report_date: dt_date) -> Dict[str, Any]:
+        """Обработанный файл с таким же содержимым за эту дату отчета и число его записей по листам (или None).
+        
+        Запись (компания, дата) хранит хэш последнего сохраненного файла, поэтому совпадение
+        означает, что в БД сейчас именно данные этого файла.
+        """
+        session = self.db.get_session()
+        try:
+            uploaded = session.query(UploadedFile).filter(
+                UploadedFile.content_hash == content_hash,
+                UploadedFile.report_date == report_date,
+                UploadedFile.status == 'processed'
+            ).order_by(UploadedFile.upload_date.desc()).first()
+            if uploaded is None:
+                return None
+            sheets = [('sheet1', Sheet1Structure), ('sheet2', Sheet2Demand), ('sheet3', Sheet3Balance),
+                      ('sheet4', Sheet4Supply), ('sheet5', Sheet5Sales), ('sheet6', Sheet6Aviation),
+                      ('sheet7', Sheet7Comments)]
+            return {
+                'file_id': uploaded.id,
+                'company_id': uploaded.company_id,
+                'company': uploaded.company.name if uploaded.company else None,
+                'filename': uploaded.filename,
+                'report_date': uploaded.report_date,
+                'upload_date': uploaded.upload_date,
+                'counts': {
+                    sheet_key: session.query(func.count(model.id)).filter(model.file_id == uploaded.id).scalar()
+                    for sheet_key, model in sheets
+                },
+            }
+        finally:
+            self.db.close_session()
+
+    def update_file_status(self, file_id: int, status: str, error_message: str = None,
+                           content_hash: str = None):
         session = self.db.get_session()
         try:
             f = session.query(UploadedFile).get(file_id)
             if f:
                 f.status = status
                 if error_message: f.error_message = error_message
+                if content_hash: f.content_hash = content_hash
+                if status == 'processed': f.processed_at = datetime.now()
                 session.commit()
+                self.invalidate_aggregated_data()
                 return True
             return False
         finally:
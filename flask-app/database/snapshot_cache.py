@@ -0,0 +1,208 @@
+# database/snapshot_cache.py
+"""
+Кэш агрегированного снимка данных (результат DatabaseQueries.get_aggregated_data).
+
+Данные меняются только при обработке загруженного файла, поэтому снимок кэшируется
+по ключу (дата отчета, фильтр по компании) и сбрасывается после сохранения данных.
+
+Бэкенды (Config.AGGREGATE_CACHE_BACKEND):
+  memory - словарь в памяти процесса; сброс виден только этому процессу, поэтому
+           записи дополнительно живут не дольше Config.AGGREGATE_CACHE_TTL секунд
+  redis  - снимки в Redis, общие для всех воркеров; сброс - увеличение номера поколения,
+           старые ключи просто перестают читаться и истекают по TTL
+  none   - кэш выключен
+
+Поколение кэша читается до вычисления снимка, и снимок сохраняется под этим поколением:
+если файл обработан (invalidate) во время расчета, устаревший снимок не попадет в новое
+поколение.
+
+Снимок из памяти отдается без копирования - вызывающий код не должен его изменять.
+"""
+import pickle
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from config import Config
+
+try:
+    from prometheus_client import Counter
+    _CACHE_EVENTS = Counter('aggregated_snapshot_cache_total', 'Обращения к кэшу агрегированных данных', ['event'])
+except ImportError:  # метрики необязательны
+    _CACHE_EVENTS = None
+
+
+class SnapshotCache:
+    """Базовый класс: счетчики попаданий/промахов и get_or_compute (сам по себе ничего не хранит)"""
+
+    backend = 'none'
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._stats_lock = threading.Lock()
+
+    def get_or_compute(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        # Поколение фиксируется до compute(): сброс во время расчета делает результат
+        # устаревшим, и он сохраняется под старым поколением, которое уже не читается
+        generation = self._generation()
+        value = self._get(key, generation)
+        if value is not None:
+            self._count('hit')
+            return value
+
+        self._count('miss')
+        value = compute()
+        # Пустой результат (в т.ч. ошибка запроса) не кэшируем
+        if value:
+            self._set(key, value, generation)
+        return value
+
+    def invalidate(self):
+        self._count('invalidation')
+        self._clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                'backend': self.backend,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / total, 3) if total else None,
+            }
+
+    def _count(self, event: str):
+        with self._stats_lock:
+            if event == 'hit':
+                self.hits += 1
+            elif event == 'miss':
+                self.misses += 1
+            else:
+                self.invalidations += 1
+        if _CACHE_EVENTS is not None:
+            _CACHE_EVENTS.labels(event=event).inc()
+
+    def _generation(self) -> int:
+        return 0
+
+    def _get(self, key: tuple, generation: int) -> Optional[Any]:
+        return None
+
+    def _set(self, key: tuple, value: Any, generation: int):
+        pass
+
+    def _clear(self):
+        pass
+
+
+class LocalSnapshotCache(SnapshotCache):
+    """Кэш в памяти процесса"""
+
+    backend = 'memory'
+
+    def __init__(self, ttl: int = 300):
+        super().__init__()
+        self.ttl = ttl
+        self._entries: Dict[tuple, tuple] = {}
+        self._generation_number = 0
+        self._lock = threading.Lock()
+
+    def _generation(self) -> int:
+        with self._lock:
+            return self._generation_number
+
+    def _get(self, key: tuple, generation: int) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            return value
+
+    def _set(self, key: tuple, value: Any, generation: int):
+        with self._lock:
+            # Кэш сброшен, пока снимок считался, - снимок мог не увидеть новых данных
+            if generation == self._generation_number:
+                self._entries[key] = (time.monotonic(), value)
+
+    def _clear(self):
+        with self._lock:
+            self._generation_number += 1
+            self._entries.clear()
+
+
+class RedisSnapshotCache(SnapshotCache):
+    """Кэш в Redis, общий для всех процессов"""
+
+    backend = 'redis'
+    GENERATION_KEY = 'aggregated:generation'
+    # v2: значение - (снимок, версия данных)
+    SNAPSHOT_KEY = 'aggregated:v2:{}:{}'
+
+    def __init__(self, redis_url: str, ttl: int = 300):
+        super().__init__()
+        import redis  # опциональная зависимость, нужна только для этого бэкенда
+
+        self.redis = redis.Redis.from_url(redis_url)
+        self.ttl = ttl
+
+    def _generation(self) -> Optional[int]:
+        try:
+            return int(self.redis.get(self.GENERATION_KEY) or 0)
+        except Exception as e:
+            print(f"⚠️ Кэш агрегированных данных недоступен: {e}")
+            return None
+
+    def _key(self, key: tuple, generation: int) -> str:
+        return self.SNAPSHOT_KEY.format(generation, ':'.join(str(part) for part in key))
+
+    def _get(self, key: tuple, generation: Optional[int]) -> Optional[Any]:
+        if generation is None:
+            return None
+        try:
+            raw = self.redis.get(self._key(key, generation))
+        except Exception as e:
+            print(f"⚠️ Кэш агрегированных данных недоступен: {e}")
+            return None
+        return pickle.loads(raw) if raw else None
+
+    def _set(self, key: tuple, value: Any, generation: Optional[int]):
+        # Поколение прочитано до расчета: если с тех пор был сброс, ключ старого
+        # поколения уже никто не читает и он истечет по TTL
+        if generation is None:
+            return
+        try:
+            self.redis.set(self._key(key, generation), pickle.dumps(value), ex=self.ttl or None)
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить снимок в кэш: {e}")
+
+    def _clear(self):
+        try:
+            self.redis.incr(self.GENERATION_KEY)
+        except Exception as e:
+            print(f"⚠️ Не удалось сбросить кэш агрегированных данных: {e}")
+
+
+_snapshot_cache = None
+_snapshot_cache_lock = threading.Lock()
+
+
+def get_snapshot_cache() -> SnapshotCache:
+    """Общий для процесса кэш, бэкенд выбирается Config.AGGREGATE_CACHE_BACKEND"""
+    global _snapshot_cache
+    with _snapshot_cache_lock:
+        if _snapshot_cache is None:
+            backend = Config.AGGREGATE_CACHE_BACKEND
+            if backend == 'redis':
+                _snapshot_cache = RedisSnapshotCache(Config.REDIS_URL, ttl=Config.AGGREGATE_CACHE_TTL)
+            elif backend == 'memory':
+                _snapshot_cache = LocalSnapshotCache(ttl=Config.AGGREGATE_CACHE_TTL)
+            else:
+                _snapshot_cache = SnapshotCache()
+        return _snapshot_cache
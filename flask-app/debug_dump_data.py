@@ -22,6 +22,8 @@ def create_data_dump():
     
     # Получаем агрегированные данные
     aggregated_data = db.get_aggregated_data()
+    # Итоги берем из consolidated_data, а не суммируем строки листов
+    totals_by_company = {item['company']: item for item in db.get_consolidated_summary()}
     
     # Создаем структурированный дамп
     dump = {
@@ -45,8 +47,8 @@ def create_data_dump():
             "sheet3_sample": company_data.get('sheet3_data', [])[:3] if company_data.get('sheet3_data') else [],
             "sheet4_sample": company_data.get('sheet4_data', [])[:2] if company_data.get('sheet4_data') else [],
             "sheet5_sample": company_data.get('sheet5_data', [])[:3] if company_data.get('sheet5_data') else [],
-            "sheet3_totals": company_data.get('sheet3_totals', {}),
-            "sheet5_totals": company_data.get('sheet5_totals', {})
+            "sheet3_totals": totals_by_company.get(company_name, {}).get('stock', {}),
+            "sheet5_totals": totals_by_company.get(company_name, {}).get('monthly_sales', {})
         }
     
     # Сохраняем дамп в файл
@@ -0,0 +1,162 @@
+# reports/batch_report.py
+"""
+Пакетная генерация отчетов за диапазон дат (например, все дни месяца одной задачей).
+
+Вместо N отдельных запросов /generate-report:
+  - готовые отчеты берутся из кэша отчетов (reports/report_cache.py),
+  - агрегированные данные запрашиваются из БД один раз на весь пакет,
+  - остальные даты отрисовываются в пуле процессов; снимок данных передается
+    каждому процессу один раз при его запуске, БД процессы не используют,
+  - результат - список ссылок на скачивание и, по желанию, zip-архив.
+"""
+import contextlib
+import io
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+from config import Config
+from reports.report_cache import ReportArtifactCache
+from reports.report_registry import get_report_registry
+from reports.template_report_generator import TemplateReportGenerator
+
+
+class SnapshotSource:
+    """Источник данных для генератора в процессе пула: готовый снимок вместо БД"""
+
+    def __init__(self, aggregated_data: dict):
+        self.aggregated_data = aggregated_data
+
+    def get_aggregated_data(self, report_date=None, company_id=None):
+        return self.aggregated_data
+
+    def get_aggregated_snapshot(self, report_date=None, company_id=None):
+        return self.aggregated_data, None
+
+
+_worker_generator = None
+
+
+def _init_worker(aggregated_data, template_path, backend, reports_dir):
+    global _worker_generator
+    _worker_generator = TemplateReportGenerator(SnapshotSource(aggregated_data), template_path,
+                                                backend=backend, use_report_cache=False)
+    _worker_generator.reports_dir = reports_dir
+
+
+def _render_in_worker(report_date: date):
+    """Выполняется в процессе пула: отрисовка одной даты из снимка"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = _worker_generator.render_report(report_date, _worker_generator.db.aggregated_data)
+    return report_date, path, dict(_worker_generator.timings)
+
+
+def date_range(date_from: date, date_to: date) -> List[date]:
+    return [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+
+
+def generate_report_batch(db, report_dates: List[date], workers: int = None, make_zip: bool = False,
+                          template_path: str = None, backend: str = None,
+                          progress: Callable[[str, int], None] = None) -> Dict:
+    """Отчеты на все даты; возвращает {'reports': [...], 'archive': ..., 'timings': ...}"""
+    started = time.perf_counter()
+    generator = TemplateReportGenerator(db, template_path, backend=backend)
+    reports_dir = os.path.abspath(generator.reports_dir)
+    os.makedirs(reports_dir, exist_ok=True)
+    registry = get_report_registry()
+
+    def report(stage: str, percent: int):
+        if progress:
+            progress(stage, percent)
+
+    # 1. Готовые отчеты из кэша (версия данных запрашивается один раз)
+    paths: Dict[date, str] = {}
+    hashes: Dict[date, Optional[str]] = {}
+    report_cache = ReportArtifactCache(db, reports_dir) if generator.use_report_cache else None
+    if report_cache:
+        version = db.get_report_data_version()
+        for report_date in report_dates:
+            hashes[report_date] = report_cache.content_hash(report_date, generator.template_path,
+                                                            generator.backend, version=version)
+            cached_path = report_cache.lookup(hashes[report_date]) if hashes[report_date] else None
+            if cached_path:
+                paths[report_date] = cached_path
+    cached = set(paths)
+    pending = [d for d in report_dates if d not in paths]
+    print(f"📦 Пакет отчетов: {len(report_dates)} дат, из кэша {len(cached)}, к генерации {len(pending)}")
+
+    # 2. Один снимок данных на все даты
+    timings = {}
+    if pending:
+        report('aggregate', 5)
+        fetch_started = time.perf_counter()
+        aggregated_data, data_version = db.get_aggregated_snapshot()
+        timings['aggregate'] = round(time.perf_counter() - fetch_started, 4)
+        if not aggregated_data:
+            raise Exception("Нет данных в БД")
+        # Снимок посчитан по другой версии данных (устарел или новее) - отчеты
+        # регистрируются под версией снимка, из которого они отрисованы
+        if report_cache and data_version != version:
+            for report_date in pending:
+                hashes[report_date] = (report_cache.content_hash(report_date, generator.template_path,
+                                                                 generator.backend, version=data_version)
+                                       if data_version else None)
+
+        # 3. Отрисовка: в пуле процессов или, для одного воркера, прямо здесь
+        render_started = time.perf_counter()
+        workers = min(workers or Config.REPORT_BATCH_WORKERS or os.cpu_count() or 1, len(pending))
+        if workers <= 1:
+            for done, report_date in enumerate(pending, 1):
+                paths[report_date] = generator.render_report(report_date, aggregated_data, data_version)
+                report('render', 10 + 80 * done // len(pending))
+        else:
+            # spawn: процессы не наследуют потоки и соединения с БД веб-воркера
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_worker,
+                                     initargs=(aggregated_data, generator.template_path,
+                                               generator.backend, reports_dir)) as pool:
+                futures = [pool.submit(_render_in_worker, report_date) for report_date in pending]
+                for done, future in enumerate(as_completed(futures), 1):
+                    report_date, path, _ = future.result()
+                    paths[report_date] = path
+                    report('render', 10 + 80 * done // len(pending))
+        timings['render'] = round(time.perf_counter() - render_started, 4)
+
+        if report_cache:
+            for report_date in pending:
+                if hashes.get(report_date):
+                    report_cache.store(report_date, paths[report_date], hashes[report_date], evict=False)
+
+    for path in paths.values():
+        registry.register(path)
+
+    # 4. Архив и ответ
+    reports = [{
+        'report_date': report_date.isoformat(),
+        'filename': os.path.basename(paths[report_date]),
+        'download_url': f'/download-report/{os.path.basename(paths[report_date])}',
+        'cached': report_date in cached,
+    } for report_date in report_dates]
+
+    archive, archive_path = None, None
+    if make_zip and report_dates:
+        report('archive', 95)
+        archive_name = f"Отчеты_{report_dates[0]:%d%m%Y}-{report_dates[-1]:%d%m%Y}.zip"
+        archive_path = os.path.join(reports_dir, archive_name)
+        # xlsx уже сжат - архив без повторного сжатия
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_STORED) as zf:
+            for report_date in report_dates:
+                zf.write(paths[report_date], arcname=os.path.basename(paths[report_date]))
+        registry.register(archive_path)
+        archive = {'filename': archive_name, 'download_url': f'/download-report/{archive_name}'}
+
+    if report_cache:
+        report_cache.evict(keep=[*paths.values(), *filter(None, [archive_path])])
+
+    timings['total'] = round(time.perf_counter() - started, 4)
+    print(f"✅ Пакет готов: {len(reports)} отчетов за {timings['total']:.1f} c")
+    return {'success': True, 'reports': reports, 'archive': archive, 'timings': timings}
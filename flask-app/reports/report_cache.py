@@ -0,0 +1,94 @@
+# reports/report_cache.py
+"""
+Кэш готовых отчетов (reports_output/).
+
+Отчет полностью определяется входными данными: версией данных (число и последний id
+загруженных файлов, время последней загрузки и последней завершенной обработки),
+датой отчета, шаблоном и бэкендом генерации. Хэш этих данных
+сохраняется в GeneratedReport.content_hash; если ничего не изменилось, повторная
+генерация отдает уже созданный файл.
+
+Объем папки ограничен Config.REPORT_CACHE_MAX_MB: после создания отчета удаляются
+файлы, к которым дольше всего не обращались (время изменения файла обновляется
+при каждом попадании в кэш), их записи помечаются 'evicted'.
+"""
+import hashlib
+import json
+import os
+from datetime import date
+from typing import Iterable, List, Optional
+
+from config import Config
+
+
+class ReportArtifactCache:
+    """Поиск, регистрация и вытеснение готовых отчетов"""
+
+    def __init__(self, db, reports_dir: str, max_bytes: int = None):
+        self.db = db
+        self.reports_dir = reports_dir
+        self.max_bytes = max_bytes if max_bytes is not None else Config.REPORT_CACHE_MAX_MB * 1024 * 1024
+
+    def content_hash(self, report_date: date, template_path: str, backend: str,
+                     version: dict = None) -> Optional[str]:
+        """Хэш входных данных отчета; None, если загруженных файлов нет (кэшировать нечего).
+        version - готовый результат get_report_data_version() (пакетная генерация запрашивает его один раз)"""
+        version = version or self.db.get_report_data_version()
+        if not version['files']:
+            return None
+        payload = {
+            'report_date': report_date.isoformat(),
+            'version': version,
+            'template': os.path.basename(template_path),
+            'template_mtime': os.path.getmtime(template_path),
+            'backend': backend,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def lookup(self, content_hash: str) -> Optional[str]:
+        """Путь к готовому отчету с таким хэшем, если файл на месте и не изменен"""
+        report = self.db.find_generated_report(content_hash)
+        if report is None:
+            return None
+        path = report['file_path']
+        if not os.path.exists(path) or os.path.getsize(path) != report['file_size']:
+            self.db.mark_generated_reports([path], 'missing')
+            return None
+        os.utime(path)  # отметка последнего обращения для вытеснения
+        return path
+
+    def store(self, report_date: date, path: str, content_hash: str, evict: bool = True):
+        path = os.path.abspath(path)
+        self.db.save_generated_report(report_date, path, os.path.getsize(path), content_hash)
+        if evict:
+            self.evict(keep=[path])
+
+    def evict(self, keep: Iterable[str] = ()) -> List[str]:
+        """Удаляет самые давние отчеты и архивы, пока папка больше лимита; возвращает удаленные пути"""
+        keep = {os.path.abspath(path) for path in keep}
+        files = []
+        for name in os.listdir(self.reports_dir):
+            path = os.path.abspath(os.path.join(self.reports_dir, name))
+            if name.endswith(('.xlsx', '.zip')) and os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        removed = []
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"⚠️ Не удалось удалить отчет {path}: {e}")
+                continue
+            total -= size
+            removed.append(path)
+
+        if removed:
+            self.db.mark_generated_reports(removed, 'evicted')
+            print(f"🧹 Удалено старых отчетов: {len(removed)}")
+        return removed
@@ -0,0 +1,93 @@
+# reports/report_registry.py
+"""
+Реестр готовых отчетов: имя файла -> абсолютный путь.
+
+Заполняется при старте приложения (папка отчетов, прежние папки и действующие записи
+GeneratedReport) и при каждой генерации, поэтому скачивание не ищет файл по диску.
+Реестр свой у каждого процесса; отчет, созданный другим воркером, находится
+по прямому пути в Config.REPORTS_FOLDER.
+"""
+import os
+import threading
+from typing import Dict, List, Optional
+
+from config import Config
+
+# Папки, где отчеты лежали в прежних версиях (просматриваются только при старте, без рекурсии)
+LEGACY_REPORT_DIRS = ['app/reports_output', '../reports_output']
+
+
+class ReportRegistry:
+    """Индекс отчетов в памяти процесса"""
+
+    def __init__(self, reports_dir: str = None):
+        self.reports_dir = os.path.abspath(reports_dir or Config.REPORTS_FOLDER)
+        self._paths: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def register(self, path: str):
+        path = os.path.abspath(path)
+        with self._lock:
+            self._paths[os.path.basename(path)] = path
+
+    def resolve(self, filename: str) -> Optional[str]:
+        """Абсолютный путь к отчету или None (удаленный файл убирается из реестра)"""
+        with self._lock:
+            path = self._paths.get(filename)
+        if path and os.path.isfile(path):
+            return path
+
+        direct = os.path.join(self.reports_dir, filename)
+        if os.path.isfile(direct):
+            self.register(direct)
+            return direct
+
+        if path:
+            with self._lock:
+                self._paths.pop(filename, None)
+        return None
+
+    def rebuild(self, db=None) -> int:
+        """Заполняет реестр заново; возвращает число найденных отчетов"""
+        paths = {}
+        # Прежние папки первыми - при совпадении имен приоритет у основной папки и записей БД
+        for directory in [*LEGACY_REPORT_DIRS, self.reports_dir]:
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.abspath(os.path.join(directory, name))
+                if name.endswith('.xlsx') and os.path.isfile(path):
+                    paths[name] = path
+
+        if db is not None:
+            for path in db.get_generated_report_paths():
+                if os.path.isfile(path):
+                    paths[os.path.basename(path)] = os.path.abspath(path)
+
+        with self._lock:
+            self._paths = paths
+        return len(paths)
+
+    def relative_path(self, path: str) -> Optional[str]:
+        """Путь внутри папки отчетов (для X-Accel-Redirect) или None, если файл вне ее"""
+        relative = os.path.relpath(os.path.abspath(path), self.reports_dir)
+        if relative.startswith(os.pardir):
+            return None
+        return relative.replace(os.sep, '/')
+
+    def list(self) -> List[str]:
+        with self._lock:
+            return sorted(self._paths.values())
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_report_registry() -> ReportRegistry:
+    """Общий для процесса реестр отчетов"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ReportRegistry()
+        return _registry
@@ -0,0 +1,234 @@
+# reports/streaming_writer.py
+"""
+Потоковый бэкенд генерации отчета (Config.REPORT_BACKEND = 'streaming').
+
+Вместо копирования шаблона и load_workbook на каждый отчет:
+  1. шаблон один раз компилируется в CompiledTemplate - значения и индексы стилей
+     ячеек, объединения, размеры колонок/строк, настройки печати и разметка
+     TemplateLayout (кэш по mtime файла);
+  2. методы _fill_*_sheet_full TemplateReportGenerator пишут в ReportBuffer -
+     легкую замену книги openpyxl с тем же интерфейсом (cell(), max_row, sheetnames),
+     поэтому логика заполнения у обоих бэкендов общая;
+  3. StreamingReportWriter выгружает буфер в Workbook(write_only=True) построчно;
+     таблицы стилей новой книги - копии таблиц шаблона, так что индексы стилей
+     ячеек переносятся как есть.
+
+Память на отчет - компактные буферы листов вместо полной модели книги openpyxl,
+и она освобождается после записи каждого листа.
+"""
+import os
+import threading
+from copy import copy, deepcopy
+from typing import Dict, Tuple
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import MergedCell
+from openpyxl.styles.styleable import StyleArray
+from openpyxl.utils.indexed_list import IndexedList
+from openpyxl.worksheet.dimensions import ColumnDimension, RowDimension
+
+from reports.template_layout import TemplateLayout
+
+
+class CompiledSheet:
+    """Описание листа шаблона: ячейки {(строка, колонка): (значение, стиль)} и объединенные ячейки"""
+
+    def __init__(self, ws):
+        self.title = ws.title
+        self.source = ws  # настройки листа (размеры, печать, виды) копируются из него при записи
+        self.cells: Dict[Tuple[int, int], tuple] = {}
+        self.merged = set()
+        for (row, col), cell in ws._cells.items():
+            style = tuple(cell._style) if cell.has_style else None
+            if isinstance(cell, MergedCell):
+                self.merged.add((row, col))
+                self.cells[(row, col)] = (None, style)
+            else:
+                self.cells[(row, col)] = (cell.value, style)
+
+
+class CompiledTemplate:
+    """Шаблон отчета, разобранный один раз: листы и таблицы стилей книги"""
+
+    def __init__(self, template_path: str):
+        self.template_path = template_path
+        self.mtime = os.path.getmtime(template_path)
+        self.wb = load_workbook(template_path)
+        self.sheets = [CompiledSheet(ws) for ws in self.wb.worksheets]
+        # Строки компаний/аэропортов и ячейки дат - общие для обоих бэкендов
+        self.layout = TemplateLayout(self)
+
+
+_compiled_templates: Dict[str, CompiledTemplate] = {}
+_compiled_lock = threading.Lock()
+
+
+def compile_template(template_path: str) -> CompiledTemplate:
+    """CompiledTemplate из кэша; шаблон перечитывается, только если файл изменился"""
+    key = os.path.abspath(template_path)
+    mtime = os.path.getmtime(template_path)
+    with _compiled_lock:
+        compiled = _compiled_templates.get(key)
+        if compiled is None or compiled.mtime != mtime:
+            compiled = CompiledTemplate(template_path)
+            _compiled_templates[key] = compiled
+        return compiled
+
+
+class BufferCell:
+    """Ячейка буфера: только значение и индексы стиля (в таблицах стилей шаблона)"""
+
+    __slots__ = ('value', '_style')
+
+    def __init__(self, value=None, style=None):
+        self.value = value
+        self._style = StyleArray(style) if style is not None else None
+
+    @property
+    def has_style(self):
+        return self._style is not None and any(self._style)
+
+
+class MergedBufferCell(BufferCell):
+    """Часть объединенной ячейки (кроме левой верхней): запись значения запрещена, как у MergedCell"""
+
+    __slots__ = ()
+
+    @property
+    def value(self):
+        return None
+
+    @value.setter
+    def value(self, value):
+        if value is not None:
+            raise AttributeError("Значение объединенной ячейки доступно только для чтения")
+
+
+class SheetBuffer:
+    """Лист в памяти с интерфейсом, который нужен методам заполнения отчета"""
+
+    def __init__(self, compiled: CompiledSheet, parent: 'ReportBuffer'):
+        self.title = compiled.title
+        self.compiled = compiled
+        self.parent = parent
+        self._cells: Dict[Tuple[int, int], BufferCell] = {}
+        for key, (value, style) in compiled.cells.items():
+            cell_class = MergedBufferCell if key in compiled.merged else BufferCell
+            self._cells[key] = cell_class(value, style)
+
+    def cell(self, row: int, column: int) -> BufferCell:
+        # Как и в openpyxl, обращение к ячейке создает ее (это влияет на max_row)
+        cell = self._cells.get((row, column))
+        if cell is None:
+            cell = self._cells[(row, column)] = BufferCell()
+        return cell
+
+    @property
+    def max_row(self) -> int:
+        return max((row for row, _ in self._cells), default=1)
+
+
+class ReportBuffer:
+    """Книга отчета в памяти: листы шаблона в исходном порядке"""
+
+    def __init__(self, compiled: CompiledTemplate):
+        self.compiled = compiled
+        # Новые выравнивания (перенос текста) добавляются в копию таблицы шаблона
+        self._alignments = IndexedList(compiled.wb._alignments)
+        self.sheets = {sheet.title: SheetBuffer(sheet, self) for sheet in compiled.sheets}
+
+    @property
+    def sheetnames(self):
+        return list(self.sheets)
+
+    def __getitem__(self, title: str) -> SheetBuffer:
+        return self.sheets[title]
+
+
+class StreamingReportWriter:
+    """Запись ReportBuffer в xlsx через Workbook(write_only=True)"""
+
+    def __init__(self, compiled: CompiledTemplate):
+        self.compiled = compiled
+
+    def write(self, buffer: ReportBuffer, output_path: str):
+        template_wb = self.compiled.wb
+        wb = Workbook(write_only=True)
+        # Таблицы стилей - копии таблиц шаблона (в т.ч. стиль по умолчанию с индексом 0)
+        wb._fonts = IndexedList(template_wb._fonts)
+        wb._fills = IndexedList(template_wb._fills)
+        wb._borders = IndexedList(template_wb._borders)
+        wb._protections = IndexedList(template_wb._protections)
+        wb._alignments = IndexedList(buffer._alignments)
+        wb._number_formats = IndexedList(template_wb._number_formats)
+        wb._named_styles = copy(template_wb._named_styles)  # при записи не изменяются
+        wb._colors = copy(template_wb._colors)
+        for name, defined_name in template_wb.defined_names.items():
+            wb.defined_names[name] = copy(defined_name)
+
+        for title in list(buffer.sheets):
+            sheet = buffer.sheets.pop(title)  # буфер листа больше не нужен после записи
+            ws = wb.create_sheet(title)
+            self._copy_sheet_settings(sheet.compiled.source, ws)
+            self._write_cells(sheet, ws)
+
+        wb.active = template_wb.index(template_wb.active)
+        wb.save(output_path)
+
+    def _write_cells(self, sheet: SheetBuffer, ws):
+        rows: Dict[int, Dict[int, BufferCell]] = {}
+        for (row, col), cell in sheet._cells.items():
+            if cell.value is None and not cell.has_style:
+                continue
+            rows.setdefault(row, {})[col] = cell
+
+        for row in range(1, max(rows, default=0) + 1):
+            cells = rows.get(row)
+            if not cells:
+                ws.append([])
+                continue
+            values = [None] * max(cells)
+            for col, cell in cells.items():
+                out = WriteOnlyCell(ws, value=cell.value)
+                if cell.has_style:
+                    out._style = StyleArray(cell._style)
+                values[col - 1] = out
+            ws.append(values)
+
+    def _copy_sheet_settings(self, source, ws):
+        ws.sheet_state = source.sheet_state
+        ws.sheet_properties = deepcopy(source.sheet_properties)
+        ws.sheet_format = deepcopy(source.sheet_format)
+        ws.views = deepcopy(source.views)
+        ws.print_options = deepcopy(source.print_options)
+        ws.page_margins = deepcopy(source.page_margins)
+        ws.HeaderFooter = deepcopy(source.HeaderFooter)
+        for attr in source.page_setup.__attrs__:
+            setattr(ws.page_setup, attr, getattr(source.page_setup, attr))
+        ws._print_area = copy(source._print_area)
+        ws._print_rows = source._print_rows
+        ws._print_cols = source._print_cols
+        for name, defined_name in source.defined_names.items():
+            ws.defined_names[name] = copy(defined_name)
+        ws.conditional_formatting = deepcopy(source.conditional_formatting)
+        ws.data_validations = deepcopy(source.data_validations)
+        ws.auto_filter = deepcopy(source.auto_filter)
+        for merged_range in source.merged_cells.ranges:
+            ws.merged_cells.add(merged_range.coord)
+
+        for key, dim in source.column_dimensions.items():
+            new_dim = ColumnDimension(ws, index=dim.index, width=dim.width, bestFit=dim.bestFit, hidden=dim.hidden,
+                                      outlineLevel=dim.outlineLevel, collapsed=dim.collapsed,
+                                      min=dim.min, max=dim.max)
+            if dim.has_style:
+                new_dim._style = StyleArray(dim._style)
+            ws.column_dimensions[key] = new_dim
+        for index, dim in source.row_dimensions.items():
+            new_dim = RowDimension(ws, index=index, ht=dim.ht, customHeight=dim.customHeight, hidden=dim.hidden,
+                                   outlineLevel=dim.outlineLevel, collapsed=dim.collapsed,
+                                   thickBot=dim.thickBot, thickTop=dim.thickTop)
+            if dim.has_style:
+                new_dim._style = StyleArray(dim._style)
+            ws.row_dimensions[index] = new_dim
+
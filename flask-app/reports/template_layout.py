@@ -0,0 +1,73 @@
+# reports/template_layout.py
+"""
+Разметка шаблона отчета, вычисляемая один раз при компиляции шаблона.
+
+Раньше при каждой генерации просматривались шапки всех листов (ячейки с 'дата'),
+колонка B листа 4 (компании) и колонка A листа 6 (аэропорты) до ws.max_row.
+TemplateLayout хранит результат этих просмотров; он живет в CompiledTemplate и
+пересчитывается вместе с ним при изменении файла шаблона (кэш по mtime).
+"""
+from typing import Dict, List, Tuple
+
+SUPPLY_SHEET = '4-Поставка'
+AVIATION_SHEET = '6-Авиатопливо'
+STRUCTURE_SHEET = '1-Структура'
+
+
+class TemplateLayout:
+    """Координаты, которые генератор раньше искал в книге при каждом отчете"""
+
+    def __init__(self, compiled):
+        values = {sheet.title: {key: value for key, (value, _) in sheet.cells.items()} for sheet in compiled.sheets}
+        max_rows = {sheet.title: max((row for row, _ in sheet.cells), default=1) for sheet in compiled.sheets}
+
+        self.sheetnames: List[str] = [sheet.title for sheet in compiled.sheets]
+        # Ячейки для даты отчета: справа от подписи 'дата' в строках 1-5, колонках 1-9
+        self.date_cells: Dict[str, List[Tuple[int, int]]] = {
+            title: self._date_cells(values[title]) for title in self.sheetnames
+        }
+        # Лист 1: ячейка для даты "по состоянию на" (дата отчета минус день)
+        self.as_of_cell = self._as_of_cell(values.get(STRUCTURE_SHEET, {}))
+        # Название в нижнем регистре -> строка шаблона
+        self.supply_rows = self._label_rows(values.get(SUPPLY_SHEET, {}), max_rows.get(SUPPLY_SHEET, 1), 9, 2)
+        self.aviation_rows = self._label_rows(values.get(AVIATION_SHEET, {}), max_rows.get(AVIATION_SHEET, 1), 8, 1)
+
+    @staticmethod
+    def _date_cells(values: dict) -> List[Tuple[int, int]]:
+        # Порядок как у прежнего просмотра: записанная дата уже не содержит 'дата'
+        written, cells = set(), []
+        for row in range(1, 6):
+            for col in range(1, 10):
+                value = values.get((row, col))
+                if (row, col) not in written and value and 'дата' in str(value).lower():
+                    cells.append((row, col + 1))
+                    written.add((row, col + 1))
+        return cells
+
+    @staticmethod
+    def _as_of_cell(values: dict) -> Tuple[int, int]:
+        # Колонка A не попадает в date_cells (дата пишется правее подписи), значения шаблона актуальны
+        for row in range(1, 5):
+            value = values.get((row, 1))
+            if value and 'состоянию' in str(value).lower():
+                return row, 2
+        return 1, 2
+
+    @staticmethod
+    def _label_rows(values: dict, max_row: int, start_row: int, column: int) -> Dict[str, int]:
+        rows = {}
+        for row in range(start_row, max_row + 1):
+            value = values.get((row, column))
+            if value and str(value).strip():
+                rows[str(value).strip().lower()] = row
+        return rows
+
+    def to_dict(self) -> dict:
+        """Разметка в виде JSON для /admin/debug-template"""
+        return {
+            'sheetnames': self.sheetnames,
+            'date_cells': {title: [list(cell) for cell in cells] for title, cells in self.date_cells.items() if cells},
+            'as_of_cell': list(self.as_of_cell),
+            'supply_rows': self.supply_rows,
+            'aviation_rows': self.aviation_rows,
+        }
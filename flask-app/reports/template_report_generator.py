@@ -1,18 +1,91 @@
 # reports/template_report_generator.py
 import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 from openpyxl import load_workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Alignment
+from openpyxl.styles.styleable import StyleArray
 from datetime import datetime, date, timedelta
 import json
 import re
 from copy import copy
 
+from app_parser.company_resolver import get_company_resolver
+from config import Config
+from reports.report_cache import ReportArtifactCache
+from reports.report_registry import get_report_registry
+from reports.streaming_writer import ReportBuffer, StreamingReportWriter, compile_template
+from reports.location_frames import LocationSummary
+from reports.template_layout import TemplateLayout
+
+try:
+    from prometheus_client import Histogram
+    _SHEET_SECONDS = Histogram('report_sheet_seconds', 'Время построения и записи листов отчета', ['sheet', 'stage'])
+except ImportError:  # метрики необязательны
+    _SHEET_SECONDS = None
+
 class TemplateReportGenerator:
-    def __init__(self, db_connection, template_path: str = None):
+    # Заполняемые листы в порядке записи (лист 7 остается статичным из шаблона)
+    FILLED_SHEETS = ['1-Структура', '2-Потребность', '3-Остатки', '4-Поставка', '5-Реализация', '6-Авиатопливо']
+    # Колонки числовых данных листа 3 (остатки / в пути / емкость) и листа 5 (сутки / месяц)
+    STOCKS_COLUMNS = {
+        5: 'stock_ai92', 6: 'stock_ai95', 7: 'stock_ai98_ai100',
+        8: 'stock_diesel_winter', 9: 'stock_diesel_arctic', 10: 'stock_diesel_summer',
+        13: 'transit_ai92', 14: 'transit_ai95', 15: 'transit_ai98_ai100',
+        16: 'transit_diesel_winter', 17: 'transit_diesel_arctic', 18: 'transit_diesel_summer',
+        21: 'capacity_ai92', 22: 'capacity_ai95', 23: 'capacity_ai98_ai100',
+        24: 'capacity_diesel_winter', 25: 'capacity_diesel_arctic', 26: 'capacity_diesel_summer',
+    }
+    SALES_COLUMNS = {
+        5: 'daily_ai92', 6: 'daily_ai95', 7: 'daily_ai98_100',
+        8: 'daily_winter', 9: 'daily_arctic', 10: 'daily_summer',
+        13: 'monthly_ai92', 14: 'monthly_ai95', 15: 'monthly_ai98_100',
+        16: 'monthly_diesel_winter', 17: 'monthly_diesel_arctic', 18: 'monthly_diesel_summer',
+    }
+
+    # Колонка B листов 3-5 (поставщики) и колонка C листа 4 (нефтебазы) по компаниям
+    SUPPLIERS = {
+        'Саханефтегазсбыт': 'ООО Газпромнефть-РП (Омская НПЗ)',
+        'Туймаада-Нефть': 'Ангарский НПЗ, Ачинский НПЗ, Омский НПЗ, Сургутский ЗСК ',
+        'Сибойл': 'ПАО "НК "Роснефть",ООО "Татнефть-АЗС Центр",ООО "ГАЗПРОМ ГАЗОНЕФТЕПРОДУКТ ПРОДАЖИ",ПАО "Газпром нефть"',
+        'ЭКТО-Ойл': 'ПАО "НК "Роснефть",ООО "Татнефть-АЗС Центр",ООО "ГАЗПРОМ ГАЗОНЕФТЕПРОДУКТ ПРОДАЖИ",ПАО "Газпром нефть"',
+        'Паритет': 'Стандарт, ТЭК Восток, Синергия, ПетроТрейд, ПетроТрейд, Миком',
+    }
+    OIL_DEPOTS = {
+        'Саханефтегазсбыт': 'НБ Батагайская, НБ Белогорская, НБ Жиганская,НБ Зырянская,НБ Ленская, НБ Нагорнинская, НБ Нижне-Бестяхская, НБ Нижнеколымская,НБ Нижнеянская, НБ Нюрбинская,НБ Олекминская, НБ Сангарская, НБ Среднеколымская, НБ Томмотская, НБ Усть- Куйгинская, НБ Хандыгская, НБ Чокурдахская, НБ Эльдиканская, НБ Якутская       ',
+        'Туймаада-Нефть': 'Нижне-Бестяхская нефтебаза, Сунтарская нефтебаза (договор хранения), Нюрбинская нефтебаза (договор хранения), Якутская нефтебаза (договор хранения)',
+        'Сибойл': 'АО НК "Туймаада-Нефть"',
+        'Паритет': 'ООО "Дорснаб", ООО "Экресурс"',
+    }
+
+    def __init__(self, db_connection, template_path: str = None, use_style_cache: bool = True, backend: str = None,
+                 use_report_cache: bool = None, parallel_sheets: bool = None, aggregation_engine: str = None):
         self.db = db_connection
-        self.reports_dir = 'reports_output'
+        self.reports_dir = Config.REPORTS_FOLDER
+        # Готовый отчет отдается повторно, если входные данные не менялись (reports/report_cache.py)
+        self.use_report_cache = Config.REPORT_CACHE_ENABLED if use_report_cache is None else use_report_cache
+        # Строки листов строятся параллельно в пуле потоков, запись в книгу - одним проходом
+        self.parallel_sheets = Config.REPORT_PARALLEL_SHEETS if parallel_sheets is None else parallel_sheets
+        self.sheet_workers = Config.REPORT_SHEET_WORKERS
+        # Итоги АЗС листов 3 и 5: 'python' - построчный расчет, 'pandas' - колоночный (reports/location_frames.py)
+        self.aggregation_engine = aggregation_engine or Config.REPORT_AGGREGATION_ENGINE
+        if self.aggregation_engine not in ('pandas', 'python'):
+            raise ValueError(f"Неизвестный движок агрегации: {self.aggregation_engine}")
+        # Версия данных отрисовываемого снимка: по ней запоминается колоночная сводка
+        self._data_version = None
+        # Время этапов последнего отчета: aggregate, build:<лист>, apply:<лист>, save
+        self.timings = {}
+        # 'template' - копия шаблона, заполняемая в памяти; 'streaming' - запись в write-only книгу
+        self.backend = backend or Config.REPORT_BACKEND
+        if self.backend not in ('template', 'streaming'):
+            raise ValueError(f"Неизвестный бэкенд отчета: {self.backend}")
+        # Стили строк-шаблонов вычисляются один раз на отчет; False - прежнее копирование для каждой ячейки
+        # (потоковый бэкенд работает только с индексами стилей)
+        self.use_style_cache = use_style_cache or self.backend == 'streaming'
+        self._style_cache = {}
+        self._wrapped_alignments = {}
         os.makedirs(self.reports_dir, exist_ok=True)
         
         if template_path is None:
@@ -40,23 +113,50 @@ class TemplateReportGenerator:
 
             print(f"\n🎯 ГЕНЕРАЦИЯ ОТЧЕТА НА {report_date.strftime('%d.%m.%Y')}")
 
-            aggregated_data = self.db.get_aggregated_data()
+            self.timings = {}
+            report_cache, content_hash, version = None, None, None
+            if self.use_report_cache:
+                try:
+                    report_cache = ReportArtifactCache(self.db, self.reports_dir)
+                    version = self.db.get_report_data_version()
+                    content_hash = report_cache.content_hash(report_date, self.template_path, self.backend,
+                                                             version=version)
+                    cached_path = report_cache.lookup(content_hash) if content_hash else None
+                    if cached_path:
+                        print(f"♻️ Данные не менялись, отдаем готовый отчет: {cached_path}")
+                        get_report_registry().register(cached_path)
+                        return cached_path
+                except Exception as e:
+                    print(f"⚠️ Кэш отчетов недоступен: {e}")
+                    report_cache = None
+
+            started = time.perf_counter()
+            aggregated_data, data_version = self.db.get_aggregated_snapshot()
+            self.timings['aggregate'] = round(time.perf_counter() - started, 4)
             if not aggregated_data:
                 raise Exception("Нет данных в БД")
+            # Отчет регистрируется под версией данных снимка: снимок, посчитанный до
+            # завершения обработки файла, не должен попасть в кэш под новой версией
+            if report_cache and data_version != version:
+                try:
+                    content_hash = (report_cache.content_hash(report_date, self.template_path, self.backend,
+                                                              version=data_version) if data_version else None)
+                except Exception as e:
+                    print(f"⚠️ Кэш отчетов недоступен: {e}")
+                    content_hash = None
 
-            timestamp = report_date.strftime('%d%m%Y')
-            filename = f'{timestamp}_Топливо_Респ_Саха_Якутия.xlsx'
-            output_path = os.path.join(self.reports_dir, filename)
-            
-            shutil.copy2(self.template_path, output_path)
-
-            wb = load_workbook(output_path)
-            self._update_report_info(wb, report_date)
-            self._fill_all_company_data(wb, aggregated_data, report_date)
-            wb.save(output_path)
+            output_path = self.render_report(report_date, aggregated_data, data_version)
 
             if os.path.exists(output_path):
                 print(f"✅ Отчет создан успешно: {output_path}")
+                print("⏱️ Этапы генерации: " + ', '.join(f"{stage} {seconds:.2f} c"
+                                                       for stage, seconds in self.timings.items()))
+                get_report_registry().register(output_path)
+                if report_cache and content_hash:
+                    try:
+                        report_cache.store(report_date, output_path, content_hash)
+                    except Exception as e:
+                        print(f"⚠️ Не удалось зарегистрировать отчет в кэше: {e}")
                 return output_path
             else:
                 raise Exception("Файл не был создан")
@@ -64,6 +164,38 @@ class TemplateReportGenerator:
             print(f"❌ Ошибка: {e}")
             raise
 
+    def report_filename(self, report_date: date) -> str:
+        return f"{report_date.strftime('%d%m%Y')}_Топливо_Респ_Саха_Якутия.xlsx"
+
+    def render_report(self, report_date: date, aggregated_data: dict, data_version: dict = None) -> str:
+        """Записывает отчет на дату из готового снимка данных (без БД и кэша отчетов)"""
+        output_path = os.path.join(self.reports_dir, self.report_filename(report_date))
+        
+        self._reset_style_cache()
+        self._data_version = data_version
+        started = time.perf_counter()
+        # Разметка шаблона (строки компаний и аэропортов, ячейки дат) - из кэша по mtime
+        compiled = compile_template(self.template_path)
+        layout = compiled.layout
+        if self.backend == 'streaming':
+            buffer = ReportBuffer(compiled)
+            self._update_report_info(buffer, report_date, layout)
+            self.timings['template'] = round(time.perf_counter() - started, 4)
+            self._fill_all_company_data(buffer, aggregated_data, report_date, layout)
+            started = time.perf_counter()
+            StreamingReportWriter(compiled).write(buffer, output_path)
+        else:
+            shutil.copy2(self.template_path, output_path)
+
+            wb = load_workbook(output_path)
+            self._update_report_info(wb, report_date, layout)
+            self.timings['template'] = round(time.perf_counter() - started, 4)
+            self._fill_all_company_data(wb, aggregated_data, report_date, layout)
+            started = time.perf_counter()
+            wb.save(output_path)
+        self.timings['save'] = round(time.perf_counter() - started, 4)
+        return output_path
+
     def _copy_style(self, source_cell, target_cell):
         """Копирует форматирование из эталонной ячейки и включает перенос текста"""
         if source_cell.has_style:
@@ -85,6 +217,60 @@ class TemplateReportGenerator:
                     indent=al.indent
                 )
 
+    def _reset_style_cache(self):
+        """Кэш привязан к индексам стилей конкретной книги - сбрасываем для каждого отчета"""
+        self._style_cache = {}
+        self._wrapped_alignments = {}
+
+    def _wrapped_alignment_id(self, wb, alignment_id: int) -> int:
+        """Индекс выравнивания с wrap_text=True, построенного из выравнивания alignment_id"""
+        wrapped_id = self._wrapped_alignments.get(alignment_id)
+        if wrapped_id is None:
+            al = wb._alignments[alignment_id]
+            wrapped_id = wb._alignments.add(Alignment(
+                horizontal=al.horizontal,
+                vertical=al.vertical,
+                text_rotation=al.text_rotation,
+                wrap_text=True,
+                shrink_to_fit=al.shrink_to_fit,
+                indent=al.indent
+            ))
+            self._wrapped_alignments[alignment_id] = wrapped_id
+        return wrapped_id
+
+    def _template_style(self, ws, template_row: int, col: int):
+        """Индексы (шрифт, заливка, граница, формат, защита, выравнивание с переносом) ячейки-шаблона.
+        
+        Вычисляются один раз на (лист, строка-шаблон, колонка); None - у шаблона нет стиля.
+        """
+        key = (ws.title, template_row, col)
+        if key in self._style_cache:
+            return self._style_cache[key]
+        
+        source_cell = ws.cell(row=template_row, column=col)
+        style_ids = None
+        if source_cell.has_style:
+            style = source_cell._style
+            style_ids = (style.fontId, style.fillId, style.borderId, style.numFmtId, style.protectionId,
+                         self._wrapped_alignment_id(ws.parent, style.alignmentId))
+        self._style_cache[key] = style_ids
+        return style_ids
+
+    def _apply_template_style(self, ws, target_cell, template_row: int, col: int):
+        """То же, что _copy_style, но присваивает общие индексы стилей вместо копий объектов"""
+        style_ids = self._template_style(ws, template_row, col)
+        if style_ids is None:
+            return
+        if target_cell._style is None:
+            target_cell._style = StyleArray()
+        style = target_cell._style
+        style.fontId, style.fillId, style.borderId, style.numFmtId, style.protectionId, style.alignmentId = style_ids
+
+    def _write_row(self, ws, row: int, values: dict, template_row: int = None):
+        """Записывает строку целиком: {колонка: значение}, стили берутся из строки-шаблона"""
+        for col, value in values.items():
+            self._set_cell_value(ws, row, col, value, template_row)
+
     def _set_cell_value(self, ws, row: int, col: int, value, template_row: int = None):
         """Устанавливает значение ячейки и копирует стиль, если указана строка-шаблон"""
         try:
@@ -94,10 +280,21 @@ class TemplateReportGenerator:
                 target_cell = ws.cell(row=row, column=col)
                 target_cell.value = value
                 
+                if self.use_style_cache and self._style_cache:
+                    # Ячейка сама может быть шаблоном (строки-шаблоны тоже заполняются) - ее стиль меняется
+                    self._style_cache.pop((ws.title, row, col), None)
+                
                 # Если передан номер строки шаблона, копируем из неё стиль
                 if template_row and row != template_row:
-                    source_cell = ws.cell(row=template_row, column=col)
-                    self._copy_style(source_cell, target_cell)
+                    if self.use_style_cache:
+                        self._apply_template_style(ws, target_cell, template_row, col)
+                    else:
+                        source_cell = ws.cell(row=template_row, column=col)
+                        self._copy_style(source_cell, target_cell)
+                elif self.use_style_cache:
+                    if target_cell._style is None:
+                        target_cell._style = StyleArray()
+                    target_cell._style.alignmentId = self._wrapped_alignment_id(ws.parent, target_cell._style.alignmentId)
                 else:
                     # Даже если нет шаблона, предотвращаем вылезание текста
                     al = target_cell.alignment
@@ -126,36 +323,26 @@ class TemplateReportGenerator:
 
     def _get_supplier_string(self, company_name: str) -> str:
         """Определяет строку поставщиков на основе имени компании"""
-        name_lower = str(company_name).lower()
-        if 'саханефтегазсбыт' in name_lower or 'снгс' in name_lower:
-            return 'ООО Газпромнефть-РП (Омская НПЗ)'
-        elif 'туймаада' in name_lower:
-            return 'Ангарский НПЗ, Ачинский НПЗ, Омский НПЗ, Сургутский ЗСК '
-        elif 'сибойл' in name_lower:
-            return 'ПАО "НК "Роснефть",ООО "Татнефть-АЗС Центр",ООО "ГАЗПРОМ ГАЗОНЕФТЕПРОДУКТ ПРОДАЖИ",ПАО "Газпром нефть"'
-        elif 'экто' in name_lower:
-            return 'ПАО "НК "Роснефть",ООО "Татнефть-АЗС Центр",ООО "ГАЗПРОМ ГАЗОНЕФТЕПРОДУКТ ПРОДАЖИ",ПАО "Газпром нефть"'
-        elif 'паритет' in name_lower:
-            return 'Стандарт, ТЭК Восток, Синергия, ПетроТрейд, ПетроТрейд, Миком'
-        return ''
+        return self.SUPPLIERS.get(get_company_resolver().resolve(company_name, partial=False), '')
 
     def _get_oil_depot_string(self, company_name: str) -> str:
         """Определяет строку нефтебаз (Колонка C) для Листа 4 на основе имени компании"""
-        name_lower = str(company_name).lower()
-        if 'саханефтегазсбыт' in name_lower or 'снгс' in name_lower:
-            return 'НБ Батагайская, НБ Белогорская, НБ Жиганская,НБ Зырянская,НБ Ленская, НБ Нагорнинская, НБ Нижне-Бестяхская, НБ Нижнеколымская,НБ Нижнеянская, НБ Нюрбинская,НБ Олекминская, НБ Сангарская, НБ Среднеколымская, НБ Томмотская, НБ Усть- Куйгинская, НБ Хандыгская, НБ Чокурдахская, НБ Эльдиканская, НБ Якутская       '
-        elif 'туймаада' in name_lower:
-            return 'Нижне-Бестяхская нефтебаза, Сунтарская нефтебаза (договор хранения), Нюрбинская нефтебаза (договор хранения), Якутская нефтебаза (договор хранения)'
-        elif 'сибойл' in name_lower:
-            return 'АО НК "Туймаада-Нефть"'
-        elif 'паритет' in name_lower:
-            return 'ООО "Дорснаб", ООО "Экресурс"'
-        return 'Все объекты'
-
-    def _update_report_info(self, wb, report_date: date):
+        return self.OIL_DEPOTS.get(get_company_resolver().resolve(company_name, partial=False), 'Все объекты')
+
+    def _update_report_info(self, wb, report_date: date, layout: TemplateLayout = None):
         date_str = report_date.strftime('%d.%m.%Y')
         past_date_str = (report_date - timedelta(days=1)).strftime('%d.%m.%Y')
         
+        if layout is not None:
+            for sheet_name in wb.sheetnames:
+                ws = wb[sheet_name]
+                for row, col in layout.date_cells.get(sheet_name, []):
+                    ws.cell(row=row, column=col).value = date_str
+            if '1-Структура' in wb.sheetnames:
+                row, col = layout.as_of_cell
+                wb['1-Структура'].cell(row=row, column=col).value = past_date_str
+            return
+        
         for sheet_name in wb.sheetnames:
             ws = wb[sheet_name]
             for row in range(1, 6):
@@ -178,162 +365,209 @@ class TemplateReportGenerator:
             if not found:
                 ws1.cell(row=1, column=2).value = past_date_str
 
-    def _fill_all_company_data(self, wb, aggregated_data: dict, report_date: date):
-        if '1-Структура' in wb.sheetnames:
-            self._fill_structure_sheet_full(wb['1-Структура'], aggregated_data)
-        if '2-Потребность' in wb.sheetnames:
-            self._fill_demand_sheet_full(wb['2-Потребность'], aggregated_data)
-        if '3-Остатки' in wb.sheetnames:
-            self._fill_stocks_sheet_full(wb['3-Остатки'], aggregated_data)
-        if '4-Поставка' in wb.sheetnames:
-            self._fill_supply_sheet_full(wb['4-Поставка'], aggregated_data, report_date)
-        if '5-Реализация' in wb.sheetnames:
-            self._fill_sales_sheet_full(wb['5-Реализация'], aggregated_data)
-        if '6-Авиатопливо' in wb.sheetnames:
-            self._fill_aviation_sheet_full(wb['6-Авиатопливо'], aggregated_data)
-        
+    def _fill_all_company_data(self, wb, aggregated_data: dict, report_date: date, layout: TemplateLayout = None):
+        """Заполняет листы: сначала строятся строки всех листов (параллельно в режиме parallel_sheets),
+        затем они записываются в книгу одним проходом"""
+        sheets = [name for name in self.FILLED_SHEETS if name in wb.sheetnames]
+        # Разметка шаблона известна заранее: построение строк не обращается к книге
+        if layout is not None:
+            layouts = {'4-Поставка': layout.supply_rows, '6-Авиатопливо': layout.aviation_rows}
+        else:
+            layouts = {
+                '4-Поставка': self._template_rows(wb['4-Поставка'], 9, 2) if '4-Поставка' in sheets else None,
+                '6-Авиатопливо': self._template_rows(wb['6-Авиатопливо'], 8, 1) if '6-Авиатопливо' in sheets else None,
+            }
+
+        if self.parallel_sheets and len(sheets) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.sheet_workers, len(sheets))) as pool:
+                futures = {name: pool.submit(self._timed_build, name, aggregated_data, report_date, layouts)
+                           for name in sheets}
+                payloads = {name: future.result() for name, future in futures.items()}
+        else:
+            payloads = {name: self._timed_build(name, aggregated_data, report_date, layouts) for name in sheets}
+
+        for name in sheets:
+            started = time.perf_counter()
+            self._apply_rows(wb[name], payloads[name])
+            self._record_timing(name, 'apply', time.perf_counter() - started)
+
         # Лист 7 оставлен закомментированным, чтобы он не перезаписывался и оставался статичным из шаблона
         # if '7-Комментарии' in wb.sheetnames:
         #     self._fill_comments_sheet_full(wb['7-Комментарии'], aggregated_data)
 
+    def _timed_build(self, sheet_name: str, aggregated_data: dict, report_date: date, layouts: dict) -> list:
+        started = time.perf_counter()
+        if sheet_name == '1-Структура':
+            rows = self._build_structure_rows(aggregated_data)
+        elif sheet_name == '2-Потребность':
+            rows = self._build_demand_rows(aggregated_data)
+        elif sheet_name == '3-Остатки':
+            rows = self._build_location_rows(aggregated_data, 'sheet3_data', self.STOCKS_COLUMNS)
+        elif sheet_name == '4-Поставка':
+            rows = self._build_supply_rows(aggregated_data, report_date, layouts['4-Поставка'])
+        elif sheet_name == '5-Реализация':
+            rows = self._build_location_rows(aggregated_data, 'sheet5_data', self.SALES_COLUMNS)
+        else:
+            rows = self._build_aviation_rows(aggregated_data, layouts['6-Авиатопливо'])
+        self._record_timing(sheet_name, 'build', time.perf_counter() - started)
+        return rows
+
+    def _record_timing(self, sheet_name: str, stage: str, seconds: float):
+        self.timings[f'{stage}:{sheet_name}'] = round(seconds, 4)
+        if _SHEET_SECONDS is not None:
+            _SHEET_SECONDS.labels(sheet=sheet_name, stage=stage).observe(seconds)
+
+    def _apply_rows(self, ws, rows: list):
+        """Записывает подготовленные строки: [(строка, {колонка: значение}, строка-шаблон), ...]"""
+        for row, values, template_row in rows:
+            self._write_row(ws, row, values, template_row)
+
+    def _template_rows(self, ws, start_row: int, column: int) -> dict:
+        """Строки шаблона с подписью в колонке column: название в нижнем регистре -> номер строки"""
+        template_rows = {}
+        for r in range(start_row, ws.max_row + 1):
+            value = ws.cell(row=r, column=column).value
+            if value and str(value).strip():
+                template_rows[str(value).strip().lower()] = r
+        return template_rows
+
     def _fill_structure_sheet_full(self, ws, aggregated_data: dict):
+        self._apply_rows(ws, self._build_structure_rows(aggregated_data))
+
+    def _build_structure_rows(self, aggregated_data: dict) -> list:
         start_row = 13
         current_row = start_row
+        rows = []
         for company_name, company_data in aggregated_data.items():
             for record in company_data.get('sheet1', []):
                 if 'наименование компаний' in str(record.get('company_name', '')).lower(): continue
-                self._set_cell_value(ws, current_row, 1, record.get('affiliation', ''), start_row)
-                self._set_cell_value(ws, current_row, 2, record.get('company_name', company_name), start_row)
-                self._set_cell_value(ws, current_row, 3, record.get('oil_depots_count', 0), start_row)
-                self._set_cell_value(ws, current_row, 4, record.get('azs_count', 0), start_row)
-                self._set_cell_value(ws, current_row, 5, record.get('working_azs_count', 0), start_row)
+                rows.append((current_row, {
+                    1: record.get('affiliation', ''),
+                    2: record.get('company_name', company_name),
+                    3: record.get('oil_depots_count', 0),
+                    4: record.get('azs_count', 0),
+                    5: record.get('working_azs_count', 0),
+                }, start_row))
                 current_row += 1
+        return rows
 
     def _fill_demand_sheet_full(self, ws, aggregated_data: dict):
+        self._apply_rows(ws, self._build_demand_rows(aggregated_data))
+
+    def _build_demand_rows(self, aggregated_data: dict) -> list:
         year_row = 7
         month_row = 13
         cur_year_row = year_row
         cur_month_row = month_row
+        rows = []
         for company_name, company_data in aggregated_data.items():
             data = company_data.get('sheet2', {})
             if data:
-                self._set_cell_value(ws, cur_year_row, 1, company_name, year_row)
-                self._set_cell_value(ws, cur_year_row, 4, data.get('gasoline_ai92', 0), year_row)
-                self._set_cell_value(ws, cur_year_row, 5, data.get('gasoline_ai95', 0), year_row)
-                self._set_cell_value(ws, cur_year_row, 8, data.get('diesel_total', 0), year_row)
+                rows.append((cur_year_row, {
+                    1: company_name,
+                    4: data.get('gasoline_ai92', 0),
+                    5: data.get('gasoline_ai95', 0),
+                    8: data.get('diesel_total', 0),
+                }, year_row))
                 
-                self._set_cell_value(ws, cur_month_row, 1, company_name, month_row)
-                self._set_cell_value(ws, cur_month_row, 4, data.get('monthly_gasoline_total', 0) / 2 if data.get('monthly_gasoline_total') else 0, month_row)
-                self._set_cell_value(ws, cur_month_row, 5, data.get('monthly_gasoline_total', 0) / 2 if data.get('monthly_gasoline_total') else 0, month_row)
-                self._set_cell_value(ws, cur_month_row, 8, data.get('monthly_diesel_total', 0), month_row)
+                monthly_gasoline_half = data.get('monthly_gasoline_total', 0) / 2 if data.get('monthly_gasoline_total') else 0
+                rows.append((cur_month_row, {
+                    1: company_name,
+                    4: monthly_gasoline_half,
+                    5: monthly_gasoline_half,
+                    8: data.get('monthly_diesel_total', 0),
+                }, month_row))
                 cur_year_row += 1
                 cur_month_row += 1
+        return rows
 
     def _fill_stocks_sheet_full(self, ws, aggregated_data: dict):
+        self._apply_rows(ws, self._build_location_rows(aggregated_data, 'sheet3_data', self.STOCKS_COLUMNS))
+
+    def _fill_sales_sheet_full(self, ws, aggregated_data: dict):
+        self._apply_rows(ws, self._build_location_rows(aggregated_data, 'sheet5_data', self.SALES_COLUMNS))
+
+    def _build_location_rows(self, aggregated_data: dict, data_key: str, columns: dict) -> list:
+        """Строки листов 3 и 5: нефтебазы компании, под ними одна сведенная строка АЗС"""
         start_row = 9
         current_row = start_row
+        rows = []
+        keys = list(columns.values())
+        if self.aggregation_engine == 'pandas':
+            from reports.location_frames import summarize_locations
+            summaries = summarize_locations(aggregated_data, data_key, keys, version=self._data_version)
+        else:
+            summaries = {company_name: self._summarize_company_locations(company_data.get(data_key, []), keys)
+                         for company_name, company_data in aggregated_data.items()}
+
         for company_name, company_data in aggregated_data.items():
-            sheet3_recs = company_data.get('sheet3_data', [])
-            
-            azs_count = 0
-            azs_totals = {
-                'stock_ai92': 0, 'stock_ai95': 0, 'stock_ai98_ai100': 0,
-                'stock_diesel_winter': 0, 'stock_diesel_arctic': 0, 'stock_diesel_summer': 0,
-                'transit_ai92': 0, 'transit_ai95': 0, 'transit_ai98_ai100': 0,
-                'transit_diesel_winter': 0, 'transit_diesel_arctic': 0, 'transit_diesel_summer': 0,
-                'capacity_ai92': 0, 'capacity_ai95': 0, 'capacity_ai98_ai100': 0,
-                'capacity_diesel_winter': 0, 'capacity_diesel_arctic': 0, 'capacity_diesel_summer': 0,
-            }
-            non_azs_locations = []
-
-            for loc in sheet3_recs:
-                loc_name_full = str(loc.get('location_name', ''))
-                loc_name_lower = loc_name_full.lower()
-                if 'азс' in loc_name_lower or loc_name_full.strip().isdigit() or 'шт' in loc_name_lower:
-                    # Извлекаем число АЗС из строки, а не считаем ряды
-                    azs_count += self._extract_azs_count(loc_name_full)
-                    for key in azs_totals.keys():
-                        azs_totals[key] += float(loc.get(key, 0) or 0)
-                else:
-                    non_azs_locations.append(loc)
+            summary = summaries.get(company_name)
+            if summary is None:
+                continue
+            records = company_data.get(data_key, [])
+            supplier = self._get_supplier_string(company_name) if summary.depot_positions else None
 
             # 1. СНАЧАЛА записываем объекты (нефтебазы)
-            for loc in non_azs_locations:
-                self._set_cell_value(ws, current_row, 1, company_name, start_row)
-                # Для нефтебаз колонку B заполняем
-                self._set_cell_value(ws, current_row, 2, self._get_supplier_string(company_name), start_row)
-                # Колонка C: Нефтебаза — принадлежит конкретной компании
-                self._set_cell_value(ws, current_row, 3, loc.get('location_name', ''), start_row)
-                
-                self._set_cell_value(ws, current_row, 5, loc.get('stock_ai92', 0), start_row)
-                self._set_cell_value(ws, current_row, 6, loc.get('stock_ai95', 0), start_row)
-                self._set_cell_value(ws, current_row, 7, loc.get('stock_ai98_ai100', 0), start_row)
-                self._set_cell_value(ws, current_row, 8, loc.get('stock_diesel_winter', 0), start_row)
-                self._set_cell_value(ws, current_row, 9, loc.get('stock_diesel_arctic', 0), start_row)
-                self._set_cell_value(ws, current_row, 10, loc.get('stock_diesel_summer', 0), start_row)
-                
-                self._set_cell_value(ws, current_row, 13, loc.get('transit_ai92', 0), start_row)
-                self._set_cell_value(ws, current_row, 14, loc.get('transit_ai95', 0), start_row)
-                self._set_cell_value(ws, current_row, 15, loc.get('transit_ai98_ai100', 0), start_row)
-                self._set_cell_value(ws, current_row, 16, loc.get('transit_diesel_winter', 0), start_row)
-                self._set_cell_value(ws, current_row, 17, loc.get('transit_diesel_arctic', 0), start_row)
-                self._set_cell_value(ws, current_row, 18, loc.get('transit_diesel_summer', 0), start_row)
-                
-                self._set_cell_value(ws, current_row, 21, loc.get('capacity_ai92', 0), start_row)
-                self._set_cell_value(ws, current_row, 22, loc.get('capacity_ai95', 0), start_row)
-                self._set_cell_value(ws, current_row, 23, loc.get('capacity_ai98_ai100', 0), start_row)
-                self._set_cell_value(ws, current_row, 24, loc.get('capacity_diesel_winter', 0), start_row)
-                self._set_cell_value(ws, current_row, 25, loc.get('capacity_diesel_arctic', 0), start_row)
-                self._set_cell_value(ws, current_row, 26, loc.get('capacity_diesel_summer', 0), start_row)
-                
+            for position in summary.depot_positions:
+                loc = records[position]
+                row_values = {
+                    1: company_name,
+                    # Для нефтебаз колонку B заполняем
+                    2: supplier,
+                    # Колонка C: Нефтебаза — принадлежит конкретной компании
+                    3: loc.get('location_name', ''),
+                }
+                for col, key in columns.items():
+                    row_values[col] = loc.get(key, 0)
+                rows.append((current_row, row_values, start_row))
                 current_row += 1
 
             # 2. ЗАТЕМ записываем сведенную строку АЗС (под нефтебазами)
-            if azs_count > 0:
-                self._set_cell_value(ws, current_row, 1, company_name, start_row)
-                # Колонка 2 (B) для строки с АЗС ПРОПУСКАЕТСЯ по просьбе пользователя
-                # Колонка C: суммарное количество АЗС для данной компании
-                self._set_cell_value(ws, current_row, 3, f"АЗС ({azs_count} шт)", start_row)
-                
-                self._set_cell_value(ws, current_row, 5, azs_totals['stock_ai92'], start_row)
-                self._set_cell_value(ws, current_row, 6, azs_totals['stock_ai95'], start_row)
-                self._set_cell_value(ws, current_row, 7, azs_totals['stock_ai98_ai100'], start_row)
-                self._set_cell_value(ws, current_row, 8, azs_totals['stock_diesel_winter'], start_row)
-                self._set_cell_value(ws, current_row, 9, azs_totals['stock_diesel_arctic'], start_row)
-                self._set_cell_value(ws, current_row, 10, azs_totals['stock_diesel_summer'], start_row)
-                
-                self._set_cell_value(ws, current_row, 13, azs_totals['transit_ai92'], start_row)
-                self._set_cell_value(ws, current_row, 14, azs_totals['transit_ai95'], start_row)
-                self._set_cell_value(ws, current_row, 15, azs_totals['transit_ai98_ai100'], start_row)
-                self._set_cell_value(ws, current_row, 16, azs_totals['transit_diesel_winter'], start_row)
-                self._set_cell_value(ws, current_row, 17, azs_totals['transit_diesel_arctic'], start_row)
-                self._set_cell_value(ws, current_row, 18, azs_totals['transit_diesel_summer'], start_row)
-                
-                self._set_cell_value(ws, current_row, 21, azs_totals['capacity_ai92'], start_row)
-                self._set_cell_value(ws, current_row, 22, azs_totals['capacity_ai95'], start_row)
-                self._set_cell_value(ws, current_row, 23, azs_totals['capacity_ai98_ai100'], start_row)
-                self._set_cell_value(ws, current_row, 24, azs_totals['capacity_diesel_winter'], start_row)
-                self._set_cell_value(ws, current_row, 25, azs_totals['capacity_diesel_arctic'], start_row)
-                self._set_cell_value(ws, current_row, 26, azs_totals['capacity_diesel_summer'], start_row)
-                
+            if summary.azs_count > 0:
+                row_values = {
+                    1: company_name,
+                    # Колонка 2 (B) для строки с АЗС ПРОПУСКАЕТСЯ по просьбе пользователя
+                    # Колонка C: суммарное количество АЗС для данной компании
+                    3: f"АЗС ({summary.azs_count} шт)",
+                }
+                for col, total in zip(columns, summary.azs_totals):
+                    row_values[col] = total
+                rows.append((current_row, row_values, start_row))
                 current_row += 1
+        return rows
+
+    def _summarize_company_locations(self, records: list, keys: list) -> LocationSummary:
+        """Построчное деление записей компании на нефтебазы и АЗС (движок 'python')"""
+        azs_count = 0
+        azs_totals = [0] * len(keys)
+        depot_positions = []
+        for position, loc in enumerate(records):
+            loc_name_full = str(loc.get('location_name', ''))
+            loc_name_lower = loc_name_full.lower()
+            if 'азс' in loc_name_lower or loc_name_full.strip().isdigit() or 'шт' in loc_name_lower:
+                # Извлекаем число АЗС из строки, а не считаем ряды
+                azs_count += self._extract_azs_count(loc_name_full)
+                for i, key in enumerate(keys):
+                    azs_totals[i] += float(loc.get(key, 0) or 0)
+            else:
+                depot_positions.append(position)
+        return LocationSummary(depot_positions, azs_count, azs_totals)
 
     def _fill_supply_sheet_full(self, ws, aggregated_data: dict, report_date: date):
+        template_rows = self._template_rows(ws, 9, 2)
+        self._apply_rows(ws, self._build_supply_rows(aggregated_data, report_date, template_rows))
+
+    def _build_supply_rows(self, aggregated_data: dict, report_date: date, template_rows: dict) -> list:
+        """template_rows - существующие строки шаблона (колонка B = название компании)"""
         start_row = 9
         current_month = report_date.strftime('%m')
         current_year = report_date.strftime('%Y')
         static_date = f"28.{current_month}.{current_year}"
         
-        # 1. Читаем все существующие строки шаблона (col B = название компании)
-        template_rows = {}  # company_name_lower -> row_number
-        for r in range(start_row, ws.max_row + 1):
-            cell_b = ws.cell(row=r, column=2).value
-            if cell_b and str(cell_b).strip():
-                template_rows[str(cell_b).strip().lower()] = r
-        
         # Определяем первую свободную строку после шаблонных
         next_free_row = max(template_rows.values()) + 1 if template_rows else start_row
         filled_rows = set()
+        rows = []
         
         for company_name, company_data in aggregated_data.items():
             sheet4_recs = company_data.get('sheet4_data', [])
@@ -363,123 +597,52 @@ class TemplateReportGenerator:
             
             filled_rows.add(target_row)
             
-            # Колонка 1: Поставщик (из нашей функции)
-            self._set_cell_value(ws, target_row, 1, self._get_supplier_string(company_name), start_row)
-            # Колонка 2: Название компании
-            self._set_cell_value(ws, target_row, 2, company_name, start_row)
-            # Колонка 3: Нефтебаза - берем из функции _get_oil_depot_string
-            self._set_cell_value(ws, target_row, 3, self._get_oil_depot_string(company_name), start_row)
-            # Колонки 4-12: Дата и числовые данные (даже если 0)
-            self._set_cell_value(ws, target_row, 4, static_date, start_row)
-            self._set_cell_value(ws, target_row, 6, totals['supply_ai92'], start_row)
-            self._set_cell_value(ws, target_row, 7, totals['supply_ai95'], start_row)
-            self._set_cell_value(ws, target_row, 8, totals['supply_ai98_100'], start_row)
-            self._set_cell_value(ws, target_row, 9, totals['supply_diesel_winter'], start_row)
-            self._set_cell_value(ws, target_row, 10, totals['supply_diesel_arctic'], start_row)
-            self._set_cell_value(ws, target_row, 11, totals['supply_diesel_summer'], start_row)
-            # Колонки с накоплением и прочим оставляем как есть или 0
-            self._set_cell_value(ws, target_row, 5, 0, start_row)
-            # Колонка 12: Межсезонное или пусто
-            self._set_cell_value(ws, target_row, 12, 0, start_row)
+            rows.append((target_row, {
+                # Колонка 1: Поставщик (из нашей функции)
+                1: self._get_supplier_string(company_name),
+                # Колонка 2: Название компании
+                2: company_name,
+                # Колонка 3: Нефтебаза - берем из функции _get_oil_depot_string
+                3: self._get_oil_depot_string(company_name),
+                # Колонки 4-12: Дата и числовые данные (даже если 0)
+                4: static_date,
+                6: totals['supply_ai92'],
+                7: totals['supply_ai95'],
+                8: totals['supply_ai98_100'],
+                9: totals['supply_diesel_winter'],
+                10: totals['supply_diesel_arctic'],
+                11: totals['supply_diesel_summer'],
+                # Колонки с накоплением и прочим оставляем как есть или 0
+                5: 0,
+                # Колонка 12: Межсезонное или пусто
+                12: 0,
+            }, start_row))
 
         # 3. Заполняем нулями все оставшиеся строки из шаблона, для которых ВООБЩЕ нет данных в БД
         for tmpl_name, tmpl_row in template_rows.items():
             if tmpl_row not in filled_rows:
-                self._set_cell_value(ws, tmpl_row, 4, static_date, start_row)
+                row_values = {4: static_date}
                 for col in [5, 6, 7, 8, 9, 10, 11, 12]:
-                    self._set_cell_value(ws, tmpl_row, col, 0, start_row)
-
-    def _fill_sales_sheet_full(self, ws, aggregated_data: dict):
-        start_row = 9
-        current_row = start_row
-        for company_name, company_data in aggregated_data.items():
-            sheet5_recs = company_data.get('sheet5_data', [])
-            
-            azs_count = 0
-            azs_totals = {
-                'daily_ai92': 0, 'daily_ai95': 0, 'daily_ai98_100': 0,
-                'daily_winter': 0, 'daily_arctic': 0, 'daily_summer': 0,
-                'monthly_ai92': 0, 'monthly_ai95': 0, 'monthly_ai98_100': 0,
-                'monthly_diesel_winter': 0, 'monthly_diesel_arctic': 0, 'monthly_diesel_summer': 0
-            }
-            non_azs_locations = []
-            
-            for loc in sheet5_recs:
-                loc_name_full = str(loc.get('location_name', ''))
-                loc_name_lower = loc_name_full.lower()
-                if 'азс' in loc_name_lower or loc_name_full.strip().isdigit() or 'шт' in loc_name_lower:
-                    # Извлекаем число АЗС из строки, а не считаем ряды
-                    azs_count += self._extract_azs_count(loc_name_full)
-                    for key in azs_totals.keys():
-                        azs_totals[key] += float(loc.get(key, 0) or 0)
-                else:
-                    non_azs_locations.append(loc)
-                    
-            # 1. СНАЧАЛА записываем остальные объекты (нефтебазы)
-            for loc in non_azs_locations:
-                self._set_cell_value(ws, current_row, 1, company_name, start_row)
-                # Для нефтебаз колонку B заполняем
-                self._set_cell_value(ws, current_row, 2, self._get_supplier_string(company_name), start_row)
-                # Колонка C: Нефтебаза — принадлежит конкретной компании
-                self._set_cell_value(ws, current_row, 3, loc.get('location_name', ''), start_row)
-                
-                self._set_cell_value(ws, current_row, 5, loc.get('daily_ai92', 0), start_row)
-                self._set_cell_value(ws, current_row, 6, loc.get('daily_ai95', 0), start_row)
-                self._set_cell_value(ws, current_row, 7, loc.get('daily_ai98_100', 0), start_row)
-                self._set_cell_value(ws, current_row, 8, loc.get('daily_winter', 0), start_row)
-                self._set_cell_value(ws, current_row, 9, loc.get('daily_arctic', 0), start_row)
-                self._set_cell_value(ws, current_row, 10, loc.get('daily_summer', 0), start_row)
-                
-                self._set_cell_value(ws, current_row, 13, loc.get('monthly_ai92', 0), start_row)
-                self._set_cell_value(ws, current_row, 14, loc.get('monthly_ai95', 0), start_row)
-                self._set_cell_value(ws, current_row, 15, loc.get('monthly_ai98_100', 0), start_row)
-                self._set_cell_value(ws, current_row, 16, loc.get('monthly_diesel_winter', 0), start_row)
-                self._set_cell_value(ws, current_row, 17, loc.get('monthly_diesel_arctic', 0), start_row)
-                self._set_cell_value(ws, current_row, 18, loc.get('monthly_diesel_summer', 0), start_row)
-                
-                current_row += 1
-
-            # 2. ЗАТЕМ записываем сведенную строку АЗС (под нефтебазами)
-            if azs_count > 0:
-                self._set_cell_value(ws, current_row, 1, company_name, start_row)
-                # Колонка 2 (B) для строки с АЗС ПРОПУСКАЕТСЯ по просьбе пользователя
-                # Колонка C: суммарное количество АЗС для данной компании
-                self._set_cell_value(ws, current_row, 3, f"АЗС ({azs_count} шт)", start_row)
-                
-                self._set_cell_value(ws, current_row, 5, azs_totals['daily_ai92'], start_row)
-                self._set_cell_value(ws, current_row, 6, azs_totals['daily_ai95'], start_row)
-                self._set_cell_value(ws, current_row, 7, azs_totals['daily_ai98_100'], start_row)
-                self._set_cell_value(ws, current_row, 8, azs_totals['daily_winter'], start_row)
-                self._set_cell_value(ws, current_row, 9, azs_totals['daily_arctic'], start_row)
-                self._set_cell_value(ws, current_row, 10, azs_totals['daily_summer'], start_row)
-                
-                self._set_cell_value(ws, current_row, 13, azs_totals['monthly_ai92'], start_row)
-                self._set_cell_value(ws, current_row, 14, azs_totals['monthly_ai95'], start_row)
-                self._set_cell_value(ws, current_row, 15, azs_totals['monthly_ai98_100'], start_row)
-                self._set_cell_value(ws, current_row, 16, azs_totals['monthly_diesel_winter'], start_row)
-                self._set_cell_value(ws, current_row, 17, azs_totals['monthly_diesel_arctic'], start_row)
-                self._set_cell_value(ws, current_row, 18, azs_totals['monthly_diesel_summer'], start_row)
-                
-                current_row += 1
+                    row_values[col] = 0
+                rows.append((tmpl_row, row_values, start_row))
+        return rows
 
     def _fill_aviation_sheet_full(self, ws, aggregated_data: dict):
+        template_airports = self._template_rows(ws, 8, 1)
+        self._apply_rows(ws, self._build_aviation_rows(aggregated_data, template_airports))
+
+    def _build_aviation_rows(self, aggregated_data: dict, template_airports: dict) -> list:
+        """template_airports - аэропорты шаблона (колонка A) -> номер строки"""
         start_row = 8
+        rows = []
         
-        # 1. Читаем все аэропорты из шаблона и запоминаем их
-        template_airports = {}  # normalized_name -> row_number
-        for r in range(start_row, ws.max_row + 1):
-            cell_a = ws.cell(row=r, column=1).value
-            if cell_a and str(cell_a).strip():
-                name_norm = str(cell_a).strip().lower()
-                template_airports[name_norm] = r
-        
-        # 2. Собираем все данные из всех компаний
+        # Собираем все данные из всех компаний
         all_items = []
         for company_name, company_data in aggregated_data.items():
             for item in company_data.get('sheet6_data', []):
                 all_items.append(item)
         
-        # 3. Для каждого элемента данных — ищем совпадение в шаблоне
+        # Для каждого элемента данных — ищем совпадение в шаблоне
         next_free_row = max(template_airports.values()) + 1 if template_airports else start_row
         
         for item in all_items:
@@ -500,21 +663,44 @@ class TemplateReportGenerator:
                 # Аэропорт не найден в шаблоне — добавляем в конец
                 target_row = next_free_row
                 next_free_row += 1
-                self._set_cell_value(ws, target_row, 1, airport_name, start_row)
-                self._set_cell_value(ws, target_row, 2, item.get('tzk_name', ''), start_row)
-                self._set_cell_value(ws, target_row, 3, item.get('contracts_info', ''), start_row)
+                rows.append((target_row, {
+                    1: airport_name,
+                    2: item.get('tzk_name', ''),
+                    3: item.get('contracts_info', ''),
+                }, start_row))
             
             # Записываем числовые данные (колонки D-I)
-            self._set_cell_value(ws, target_row, 4, item.get('supply_week', 0), start_row)
-            self._set_cell_value(ws, target_row, 5, item.get('supply_month_start', 0), start_row)
+            row_values = {
+                4: item.get('supply_week', 0),
+                5: item.get('supply_month_start', 0),
+            }
             # Колонка F: записываем monthly_demand только если есть реальные данные
             monthly_demand = item.get('monthly_demand', 0)
             if monthly_demand and float(monthly_demand) > 0:
-                self._set_cell_value(ws, target_row, 6, monthly_demand, start_row)
+                row_values[6] = monthly_demand
             # Если monthly_demand = 0 или None, оставляем текст шаблона нетронутым
-            self._set_cell_value(ws, target_row, 7, item.get('consumption_week', 0), start_row)
-            self._set_cell_value(ws, target_row, 8, item.get('consumption_month_start', 0), start_row)
-            self._set_cell_value(ws, target_row, 9, item.get('end_of_day_balance', 0), start_row)
+            row_values[7] = item.get('consumption_week', 0)
+            row_values[8] = item.get('consumption_month_start', 0)
+            row_values[9] = item.get('end_of_day_balance', 0)
+            rows.append((target_row, row_values, start_row))
+        return rows
+
+    def debug_template_structure(self) -> dict:
+        """Скомпилированная разметка шаблона (выводится в консоль и возвращается словарем)"""
+        compiled = compile_template(self.template_path)
+        layout = compiled.layout.to_dict()
+        print(f"📐 Шаблон: {self.template_path}")
+        print(f"   Листы: {', '.join(layout['sheetnames'])}")
+        for sheet_name, cells in layout['date_cells'].items():
+            print(f"   {sheet_name}: ячейки даты {cells}")
+        print(f"   Лист 1, дата 'по состоянию': {layout['as_of_cell']}")
+        print(f"   Лист 4, строки компаний: {layout['supply_rows']}")
+        print(f"   Лист 6, строки аэропортов: {layout['aviation_rows']}")
+        return {
+            'template_path': os.path.abspath(self.template_path),
+            'template_mtime': datetime.fromtimestamp(compiled.mtime).isoformat(),
+            'layout': layout,
+        }
 
 def generate_complete_report(db_connection, template_path=None):
     generator = TemplateReportGenerator(db_connection, template_path)
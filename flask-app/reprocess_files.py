@@ -1,37 +1,184 @@
 # reprocess_files.py
+"""
+Повторная обработка всех файлов из uploads/ (например, после исправления парсера).
+
+    python reprocess_files.py                      # параллельно: парсинг в пуле процессов
+    python reprocess_files.py --workers 8 --writers 2
+    python reprocess_files.py --sequential         # по одному файлу, как раньше
+"""
+import argparse
+import contextlib
+import io
 import os
 import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 # Добавляем текущую директорию в путь поиска модулей
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
 from app.services.file_processor import FileProcessor
+from app_parser.company_resolver import get_company_resolver
+from database.connection import db_connection
 
-def reprocess():
-    processor = FileProcessor()
-    upload_folder = 'uploads'
-    
+_worker_processor = None
+
+
+def _list_files(upload_folder):
     if not os.path.exists(upload_folder):
         print(f"Папка {upload_folder} не найдена.")
-        return
+        return []
 
-    files = [f for f in os.listdir(upload_folder) if f.endswith(('.xlsx', '.xls'))]
-    
+    files = sorted(f for f in os.listdir(upload_folder) if f.endswith(('.xlsx', '.xls')))
     if not files:
         print("В папке uploads нет файлов для обработки.")
+    return files
+
+
+def _parse_in_worker(filename, file_path, verbose):
+    """Выполняется в процессе пула: только парсинг, без БД"""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = FileProcessor()
+
+    started = time.perf_counter()
+    if verbose:
+        parser_name, all_data = _worker_processor.parse_file(file_path)
+    else:
+        # Подробный вывод парсера из нескольких процессов перемешивается - глушим его
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser_name, all_data = _worker_processor.parse_file(file_path)
+    return filename, file_path, parser_name, all_data, time.perf_counter() - started
+
+
+def _save_parsed(processor, filename, file_path, parser_name, all_data, verbose):
+    """Выполняется в одном из потоков-писателей.
+    Вывод глушится только в этом потоке: redirect_stdout подменил бы sys.stdout
+    всему процессу, и строки главного потока о готовых файлах пропадали бы."""
+    started = time.perf_counter()
+    result = processor.save_parsed(filename, file_path, parser_name, all_data, quiet=not verbose)
+    return result, time.perf_counter() - started
+
+
+def _writer_index(all_data, writers: int) -> int:
+    """Писатель для файла: все файлы одной компании пишет один поток.
+    Дата отчета у всех файлов - сегодня, поэтому два файла компании в разных потоках
+    могли бы оба не найти запись (компания, дата) и создать по дубликату."""
+    company = str(all_data.get('metadata', {}).get('company') or '')
+    key = get_company_resolver().resolve(company.lower()) or company.strip().lower()
+    return zlib.crc32(key.encode('utf-8')) % writers
+
+
+def _print_summary(total, failures, started):
+    print("\n" + "=" * 50)
+    print(f"Обработано файлов: {total - len(failures)} из {total} за {time.perf_counter() - started:.1f} c")
+    if failures:
+        print(f"Ошибки ({len(failures)}):")
+        for filename, error in failures:
+            print(f"   ❌ {filename}: {error}")
+
+
+def reprocess_sequential(upload_folder='uploads'):
+    processor = FileProcessor()
+    files = _list_files(upload_folder)
+    if not files:
         return
 
     print(f"Найдено файлов для обработки: {len(files)}")
-    
+    started = time.perf_counter()
+    failures = []
+
     for filename in files:
         file_path = os.path.join(upload_folder, filename)
         print(f"\nОбработка {filename}...")
+        file_started = time.perf_counter()
         result = processor.process_file(filename, file_path)
         if result.get('success'):
-            print(f"✅ Успешно: {result['message']}")
+            print(f"✅ Успешно: {result['message']} ({time.perf_counter() - file_started:.2f} c)")
             print(f"   Данные: {result['data_extracted']}")
         else:
             print(f"❌ Ошибка: {result.get('error')}")
+            failures.append((filename, result.get('error')))
+
+    _print_summary(len(files), failures, started)
+
+
+def reprocess(upload_folder='uploads', workers=None, writers=2, verbose=False):
+    """Парсинг в пуле процессов, запись в БД - небольшим числом потоков-писателей
+    (у каждого писателя своя очередь, файлы одной компании - в одной очереди)"""
+    files = _list_files(upload_folder)
+    if not files:
+        return
+
+    workers = workers or os.cpu_count() or 1
+    print(f"Найдено файлов для обработки: {len(files)} (процессов парсинга: {workers}, писателей БД: {writers})")
+
+    processor = FileProcessor()
+    started = time.perf_counter()
+    failures = []
+
+    writers = max(1, writers)
+    write_pools = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'db-writer-{index}')
+                   for index in range(writers)]
+    with ProcessPoolExecutor(max_workers=workers) as parse_pool, contextlib.ExitStack() as stack:
+        for write_pool in write_pools:
+            stack.enter_context(write_pool)
+        parse_futures = {
+            parse_pool.submit(_parse_in_worker, filename, os.path.join(upload_folder, filename), verbose): filename
+            for filename in files
+        }
+        write_futures = {}
+
+        # Разобранные файлы сразу передаем писателям, не дожидаясь остальных
+        for future in as_completed(parse_futures):
+            filename = parse_futures[future]
+            try:
+                filename, file_path, parser_name, all_data, parse_time = future.result()
+            except Exception as e:
+                print(f"❌ {filename}: ошибка парсинга: {e}")
+                failures.append((filename, f'парсинг: {e}'))
+                continue
+            write_pool = write_pools[_writer_index(all_data, writers)]
+            write_future = write_pool.submit(_save_parsed, processor, filename, file_path,
+                                             parser_name, all_data, verbose)
+            write_futures[write_future] = (filename, parse_time)
+
+        for future in as_completed(write_futures):
+            filename, parse_time = write_futures[future]
+            try:
+                result, save_time = future.result()
+            except Exception as e:
+                print(f"❌ {filename}: ошибка сохранения: {e}")
+                failures.append((filename, f'сохранение: {e}'))
+                continue
+            if result.get('success'):
+                print(f"✅ {filename}: {result['company']} - парсинг {parse_time:.2f} c, "
+                      f"сохранение {save_time:.2f} c, данные: {result['data_extracted']}")
+            else:
+                print(f"❌ {filename}: {result.get('error')}")
+                failures.append((filename, result.get('error')))
+
+    _print_summary(len(files), failures, started)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--folder', default='uploads', help='папка с файлами (по умолчанию uploads)')
+    arg_parser.add_argument('--workers', type=int, default=None, help='процессов парсинга (по умолчанию - число ядер)')
+    arg_parser.add_argument('--writers', type=int, default=2, help='потоков записи в БД (для SQLite используйте 1)')
+    arg_parser.add_argument('--sequential', action='store_true', help='обрабатывать файлы по одному')
+    arg_parser.add_argument('--verbose', action='store_true', help='подробный вывод парсера')
+    args = arg_parser.parse_args()
+
+    # На пустой базе таблиц еще может не быть
+    db_connection.create_tables()
+
+    if args.sequential:
+        reprocess_sequential(args.folder)
+    else:
+        reprocess(args.folder, workers=args.workers, writers=args.writers, verbose=args.verbose)
+
 
 if __name__ == "__main__":
-    reprocess()
+    main()
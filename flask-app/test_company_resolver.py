@@ -0,0 +1,62 @@
+# test_company_resolver.py
+"""Определение компании: приоритет псевдонимов, составные признаки, кэш таблицы companies"""
+
+
+def test_resolver_prefers_company_priority_over_position():
+    from app_parser.company_resolver import CompanyResolver
+
+    resolver = CompanyResolver()
+    assert resolver.resolve('Отчет ЭКТО-Ойл для АО "Саханефтегазсбыт"') == 'Саханефтегазсбыт'
+    assert resolver.resolve('ООО "Сибирьойл" 01.06.2024') == 'Сибойл'
+    assert resolver.resolve('сиб_нефть_ойл.xlsx') == 'Сибойл'
+    assert resolver.resolve('сиб_нефть_ойл.xlsx', partial=False) is None
+
+
+def test_scan_reports_matched_cell_and_stays_in_bounds(tmp_path):
+    import openpyxl
+    from app_parser.company_resolver import CompanyResolver
+
+    wb = openpyxl.Workbook()
+    wb.active.title = 'Справочник'
+    wb.active['A2'] = 'Сибирское топливо'
+    wb.create_sheet('7-Справка')['B3'] = 'ООО "Паритет"'
+    sheet3 = wb.create_sheet('3-Остатки')
+    sheet3['C9'] = 'АО "Саханефтегазсбыт"'
+    sheet3['C60'] = 'Сибойл'
+    path = tmp_path / 'report.xlsx'
+    wb.save(path)
+
+    resolver = CompanyResolver()
+    assert resolver.scan_workbook(openpyxl.load_workbook(path, read_only=True)) == (
+        'Саханефтегазсбыт', '3-Остатки', 'C9', 'АО "Саханефтегазсбыт"')
+
+    loaded = openpyxl.load_workbook(path)
+    del loaded['3-Остатки']['C9']
+    assert resolver.scan_workbook(loaded).sheet == '7-Справка'
+    assert loaded['7-Справка'].max_row == 3
+
+
+def test_directory_reloads_on_miss_and_invalidate():
+    from app_parser.company_resolver import CompanyDirectory
+
+    table = [(1, 'Сибойл')]
+    loads = []
+
+    def load():
+        loads.append(1)
+        return list(table)
+
+    directory = CompanyDirectory()
+    assert directory.find('сибойл', load) == (1, 'Сибойл', True)
+    assert directory.find('Сибойл', load) == (1, 'Сибойл', True)
+    assert len(loads) == 1
+
+    # Компанию добавил другой процесс: промах перечитывает таблицу
+    table.append((2, 'Паритет'))
+    assert directory.find('Паритет', load) == (2, 'Паритет', True)
+    assert directory.find('ЭКТО-Ойл', load) is None
+    assert len(loads) == 3
+
+    directory.invalidate()
+    assert directory.find('Туймаада-Нефть Паритет', load) == (2, 'Паритет', False)
+    assert len(loads) == 4
@@ -0,0 +1,92 @@
+# test_consolidated_data.py
+"""Итоги consolidated_data пересчитываются по каждой загрузке, повтор заменяет их, а не суммирует"""
+from datetime import date
+
+from database.models import ConsolidatedData
+
+REPORT_DATE = date(2024, 6, 1)
+
+
+def upload(queries, tmp_path, company: str, report_date: date, stock_ai92: float, monthly_ai92: float):
+    """Как FileProcessor.save_parsed: файл, листы, пересчет итогов"""
+    path = tmp_path / f"{company}_{report_date:%d%m%Y}.xlsx"
+    path.write_bytes(b'test')
+    file_id, company_id = queries.save_uploaded_file(path.name, str(path), company, report_date)
+    queries.save_all_sheets_bulk(file_id, company_id, report_date, {
+        'sheet1': [{'azs_count': 10, 'working_azs_count': 8, 'oil_depots_count': 2}],
+        'sheet2': {'yearly_ai92': 1200.0, 'yearly_ai95': 600.0, 'monthly_ai92': 100.0, 'monthly_ai95': 50.0},
+        'sheet3': [{'object_name': 'Нефтебаза', 'stock_ai92': stock_ai92, 'stock_diesel_winter': 3.0,
+                    'stock_diesel_arctic': None},
+                   {'object_name': 'АЗС', 'stock_ai92': 1.0, 'stock_ai95': 2.0}],
+        'sheet5': [{'object_name': 'АЗС', 'monthly_ai92': monthly_ai92, 'monthly_winter': 4.0}],
+    })
+    queries.update_consolidated_data(company_id, report_date)
+    return company_id
+
+
+def consolidated_rows(queries, company_id):
+    session = queries.db.get_session()
+    try:
+        return session.query(ConsolidatedData).filter(ConsolidatedData.company_id == company_id).all()
+    finally:
+        queries.db.close_session()
+
+
+def test_totals_saved_per_upload_and_summarized(sqlite_queries, tmp_path):
+    sakha = upload(sqlite_queries, tmp_path, 'Саханефтегазсбыт', REPORT_DATE, 10.0, 30.0)
+    upload(sqlite_queries, tmp_path, 'Сибойл', REPORT_DATE, 5.0, 20.0)
+
+    [row] = consolidated_rows(sqlite_queries, sakha)
+    assert row.report_date == REPORT_DATE
+    assert (row.total_azs_count, row.total_working_azs, row.total_oil_depots) == (10, 8, 2)
+    assert (row.total_stock_ai92, row.total_stock_ai95, row.total_stock_diesel) == (11.0, 2.0, 3.0)
+    assert (row.total_monthly_ai92, row.total_monthly_diesel) == (30.0, 4.0)
+    assert (row.yearly_demand_ai92, row.monthly_demand_ai95) == (1200.0, 50.0)
+
+    summary = {item['company']: item for item in sqlite_queries.get_consolidated_summary()}
+    assert summary.keys() == {'Саханефтегазсбыт', 'Сибойл'}
+    assert summary['Сибойл']['stock'] == {'ai92': 6.0, 'ai95': 2.0, 'diesel': 3.0}
+    assert summary['Саханефтегазсбыт']['monthly_sales']['ai92'] == 30.0
+    assert summary['Саханефтегазсбыт']['report_date'] == '2024-06-01'
+
+
+def test_reupload_replaces_totals(sqlite_queries, tmp_path):
+    company_id = upload(sqlite_queries, tmp_path, 'Сибойл', REPORT_DATE, 5.0, 20.0)
+    upload(sqlite_queries, tmp_path, 'Сибойл', REPORT_DATE, 7.0, 25.0)
+
+    [row] = consolidated_rows(sqlite_queries, company_id)
+    assert (row.total_stock_ai92, row.total_monthly_ai92) == (8.0, 25.0)
+
+    # Новая дата - отдельная строка, в сводке последняя дата
+    upload(sqlite_queries, tmp_path, 'Сибойл', date(2024, 6, 2), 1.0, 2.0)
+    assert len(consolidated_rows(sqlite_queries, company_id)) == 2
+    [item] = sqlite_queries.get_consolidated_summary(company_id=company_id)
+    assert (item['report_date'], item['stock']['ai92']) == ('2024-06-02', 2.0)
+
+
+def test_concurrent_insert_of_same_row_updates_it(sqlite_queries, tmp_path):
+    from sqlalchemy import event, insert
+
+    company_id = upload(sqlite_queries, tmp_path, 'Сибойл', REPORT_DATE, 5.0, 20.0)
+    engine = sqlite_queries.db.engine
+    with engine.begin() as connection:
+        connection.execute(ConsolidatedData.__table__.delete())
+
+    inserted = []
+
+    def other_job_inserts_first(conn, cursor, statement, parameters, context, executemany):
+        # Вторая задача с той же компанией и датой успевает вставить строку раньше
+        if statement.startswith('INSERT INTO consolidated_data') and not inserted:
+            inserted.append(True)
+            with engine.begin() as other:
+                other.execute(insert(ConsolidatedData).values(company_id=company_id, report_date=REPORT_DATE,
+                                                              total_stock_ai92=999.0))
+
+    event.listen(engine, 'before_cursor_execute', other_job_inserts_first)
+    try:
+        sqlite_queries.update_consolidated_data(company_id, REPORT_DATE)
+    finally:
+        event.remove(engine, 'before_cursor_execute', other_job_inserts_first)
+
+    [row] = consolidated_rows(sqlite_queries, company_id)
+    assert row.total_stock_ai92 == 6.0
@@ -0,0 +1,95 @@
+# test_indexes.py
+"""Проверка планов запросов: агрегация и удаление по файлу должны идти по индексам листов"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event, text
+
+
+SHEET_TABLES = ['sheet1_structure', 'sheet2_demand', 'sheet3_balance', 'sheet4_supply',
+                'sheet5_sales', 'sheet6_aviation', 'sheet7_comments']
+
+
+@pytest.fixture
+def queries(sqlite_queries):
+    """DatabaseQueries поверх временной SQLite-базы с парой компаний и файлов"""
+    from database.models import Company, UploadedFile
+
+    queries = sqlite_queries
+    connection = queries.db
+    for name in ['Саханефтегазсбыт', 'Сибойл']:
+        session = connection.get_session()
+        company = Company(name=name)
+        session.add(company)
+        session.commit()
+        company_id = company.id
+        for day in (1, 2):
+            session = connection.get_session()
+            uploaded = UploadedFile(filename='test.xlsx', file_path='test.xlsx',
+                                    company_id=company_id, report_date=date(2024, 6, day))
+            session.add(uploaded)
+            session.commit()
+            queries.save_all_sheets_bulk(uploaded.id, company_id, date(2024, 6, day), {
+                'sheet3': [{'object_name': 'Нефтебаза', 'stock_ai92': 10.0}],
+                'sheet5': [{'object_name': 'АЗС', 'daily_ai92': 1.0}],
+            })
+    connection.close_session()
+    return queries
+
+
+def explain(connection, statement, parameters) -> str:
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    return '\n'.join(row[-1] for row in rows)
+
+
+def capture_statements(engine, action):
+    statements = []
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', before_execute)
+    try:
+        action()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_execute)
+    return statements
+
+
+def test_aggregation_uses_company_date_indexes(queries):
+    engine = queries.db.engine
+    statements = capture_statements(engine, queries._compute_aggregated_data)
+
+    with engine.connect() as connection:
+        for table in SHEET_TABLES:
+            sheet_statements = [(s, p) for s, p in statements if f"FROM {table}" in s]
+            assert len(sheet_statements) == 1, f"{table}: ожидался один запрос на лист"
+            plan = explain(connection, *sheet_statements[0])
+            assert f"ix_{table}_company_date" in plan, f"{table}: индекс не используется\n{plan}"
+            assert f"SCAN {table}\n" not in plan + '\n', f"{table}: полный просмотр таблицы\n{plan}"
+
+
+def test_per_file_delete_uses_file_id_index(queries):
+    with queries.db.engine.connect() as connection:
+        for table in SHEET_TABLES:
+            plan = explain(connection, f"SELECT id FROM {table} WHERE file_id = ?", (1,))
+            assert f"ix_{table}_file_id" in plan, f"{table}: индекс не используется\n{plan}"
+
+
+def test_migration_adds_indexes_to_existing_database(queries):
+    from database.migrate import apply_migrations
+
+    engine = queries.db.engine
+    with engine.begin() as connection:
+        for table in SHEET_TABLES:
+            connection.execute(text(f"DROP INDEX ix_{table}_company_date"))
+            connection.execute(text(f"DROP INDEX ix_{table}_file_id"))
+        connection.execute(text("DELETE FROM schema_migrations"))
+
+    assert '0001' in apply_migrations(engine)
+    assert apply_migrations(engine) == []
+
+    with engine.connect() as connection:
+        names = {row[0] for row in connection.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    for table in SHEET_TABLES:
+        assert {f"ix_{table}_company_date", f"ix_{table}_file_id"} <= names
@@ -0,0 +1,193 @@
+# test_job_queue.py
+"""Очереди задач: статусы в памяти не копятся, задачи остановленных Redis-воркеров не теряются,
+загрузка опрашивается по /api/jobs"""
+import fnmatch
+import json
+import time
+
+import pytest
+from flask import Flask
+
+from app.services import job_queue
+from app.services.job_queue import DONE, FAILED, QUEUED, RUNNING, InProcessJobQueue, RedisJobQueue
+
+
+def finish(queue, job_id, status=DONE):
+    queue.update(job_id, status=status)
+
+
+def test_finished_jobs_evicted_by_limit_and_ttl(monkeypatch):
+    queue = InProcessJobQueue(max_finished=2)
+    monkeypatch.setattr(queue, '_enqueue', lambda *args: None)
+    queue.register('noop', lambda payload, progress: {})
+
+    pending = queue.submit('noop', {})
+    done = [queue.submit('noop', {}) for _ in range(3)]
+    for job_id in done:
+        finish(queue, job_id)
+    finish(queue, queue.submit('noop', {}), FAILED)
+
+    # Остаются две последние завершенные задачи и незавершенная
+    assert [queue.get(job_id) is not None for job_id in done] == [False, False, True]
+    assert queue.get(pending)['status'] == QUEUED
+    assert len(queue.jobs) == 3
+
+    queue.ttl = 0
+    queue.submit('noop', {})
+    assert queue.get(done[-1]) is None
+    assert queue.get(pending) is not None
+
+
+@pytest.fixture
+def client(sqlite_db, tmp_path, monkeypatch):
+    """Маршруты загрузки и статуса задач поверх временной SQLite-базы и очереди в памяти"""
+    from app.routes.api_routes import api_bp
+    from app.routes.upload_routes import process_upload_job, upload_bp
+    from app.services.upload_stream import UploadRequest
+
+    queue = InProcessJobQueue(workers=1)
+    queue.register('process_upload', process_upload_job)
+    monkeypatch.setattr(job_queue, '_job_queue', queue)
+
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+    app.config.update(UPLOAD_FOLDER=str(tmp_path))
+    app.register_blueprint(upload_bp)
+    app.register_blueprint(api_bp)
+    return app.test_client()
+
+
+def test_upload_accepted_and_status_polled(client, tmp_path):
+    from benchmarks.synthetic_workbooks import build_company_workbook
+
+    path = build_company_workbook(str(tmp_path / 'sngs.xlsx'), rows=10, formulas=False)
+    with open(path, 'rb') as f:
+        response = client.post('/upload', data={'file': (f, 'sngs.xlsx')})
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+
+    deadline = time.monotonic() + 30
+    job = client.get(status_url).get_json()
+    while job['status'] not in (DONE, FAILED) and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = client.get(status_url).get_json()
+
+    assert job['status'] == DONE, job['error']
+    assert job['progress'] == {'stage': 'finished', 'percent': 100}
+    assert job['result']['company'] == 'Саханефтегазсбыт'
+    assert client.get('/api/jobs/missing').status_code == 404
+
+
+class ListRedis:
+    """Минимальная замена Redis для строк, списков и множеств очереди"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+
+    def _list(self, key):
+        return self.data.setdefault(key, [])
+
+    def rpush(self, key, value):
+        self._list(key).append(value)
+
+    def lindex(self, key, index):
+        items = self.data.get(key) or []
+        return items[index] if -len(items) <= index < len(items) else None
+
+    def lpop(self, key):
+        items = self.data.get(key)
+        return items.pop(0) if items else None
+
+    def lmove(self, source, destination, src='LEFT', dest='RIGHT'):
+        value = self.lpop(source)
+        if value is not None:
+            self._list(destination).append(value)
+        return value
+
+    def blmove(self, source, destination, timeout, src='LEFT', dest='RIGHT'):
+        return self.lmove(source, destination)
+
+    def lrem(self, key, count, value):
+        items = self.data.get(key) or []
+        if value in items:
+            items.remove(value)
+            return 1
+        return 0
+
+    def sadd(self, key, value):
+        self.data.setdefault(key, set()).add(value)
+
+    def srem(self, key, value):
+        self.data.get(key, set()).discard(value)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+
+@pytest.fixture
+def redis_queue(monkeypatch):
+    queue = RedisJobQueue('redis://localhost:6379/0')
+    queue.redis = ListRedis()
+    monkeypatch.setattr(queue, '_start_workers', lambda: None)
+    return queue
+
+
+def test_redis_message_removed_only_after_run(redis_queue):
+    seen = []
+
+    def handler(payload, progress):
+        # Пока задача выполняется, сообщение лежит в списке processing воркера
+        seen.append(redis_queue.redis.data['jobs:processing:w'][:])
+        return {}
+
+    redis_queue.handlers['noop'] = handler
+    job_id = redis_queue.submit('noop', {})
+    redis_queue._work_once('jobs:processing:w', timeout=0)
+
+    assert len(seen[0]) == 1 and json.loads(seen[0][0])['id'] == job_id
+    assert redis_queue.redis.data['jobs:processing:w'] == []
+    assert redis_queue.get(job_id)['status'] == DONE
+
+
+def test_redis_jobs_of_stopped_worker_recovered(redis_queue):
+    redis_queue.handlers['noop'] = lambda payload, progress: {}
+    running, waiting = redis_queue.submit('noop', {}), redis_queue.submit('noop', {})
+    redis = redis_queue.redis
+
+    # Процесс 'dead' забрал обе задачи, начал первую и был убит: пульса нет
+    redis.sadd(RedisJobQueue.WORKERS_KEY, 'dead')
+    redis.lmove(RedisJobQueue.QUEUE_KEY, 'jobs:processing:dead:0')
+    redis.lmove(RedisJobQueue.QUEUE_KEY, 'jobs:processing:dead:1')
+    redis_queue.update(running, status=RUNNING)
+    # У живого процесса с пульсом списки не трогаются
+    redis.sadd(RedisJobQueue.WORKERS_KEY, 'alive')
+    redis.set(RedisJobQueue.HEARTBEAT_KEY.format('alive'), '1')
+    redis.rpush('jobs:processing:alive:0', 'busy')
+
+    assert redis_queue.recover_abandoned() == 2
+
+    assert redis_queue.get(running)['status'] == FAILED
+    assert [json.loads(raw)['id'] for raw in redis.data[RedisJobQueue.QUEUE_KEY]] == [waiting]
+    assert redis.data['jobs:processing:alive:0'] == ['busy']
+    assert redis.smembers(RedisJobQueue.WORKERS_KEY) == {'alive'}
+
+    redis_queue._work_once('jobs:processing:new', timeout=0)
+    assert redis_queue.get(waiting)['status'] == DONE
@@ -0,0 +1,94 @@
+# test_layout_fingerprint.py
+import os
+
+import openpyxl
+import pytest
+from flask import Flask
+
+from app_parser import layout_fingerprint
+from app_parser.layout_fingerprint import LayoutDetector, UnknownLayoutError, WorkbookHeaders
+from benchmarks.synthetic_workbooks import build_company_workbook
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'report_templates', 'Сводный_отчет_шаблон.xlsx')
+
+
+def test_header_cells_match_openpyxl():
+    with WorkbookHeaders(TEMPLATE_PATH) as workbook:
+        headers = workbook.header_cells(['3-Остатки', '6-Авиатопливо'])
+        sheetnames = workbook.sheetnames
+
+    wb = openpyxl.load_workbook(TEMPLATE_PATH, read_only=True)
+    assert sheetnames == wb.sheetnames
+    for sheet_name, cells in headers.items():
+        expected = {cell.coordinate: str(cell.value)
+                    for row in wb[sheet_name].iter_rows(min_row=1, max_row=5, max_col=4)
+                    for cell in row if cell.value is not None}
+        assert cells == expected
+    wb.close()
+
+
+def test_known_layout_cached_per_company(tmp_path):
+    path = build_company_workbook(str(tmp_path / 'sngs.xlsx'), rows=5, formulas=False)
+    detector = LayoutDetector()
+
+    first = detector.detect(path, 'снгс_01.02.2026.xlsx')
+    assert first.parser == 'UnifiedParser' and not first.cached
+    second = detector.detect(path, 'снгс_02.02.2026.xlsx')
+    assert second.cached and second.fingerprint == first.fingerprint
+    assert detector.stats()['hits'] == 1
+
+    # Реальная форма отчетности тоже узнается
+    assert detector.detect(TEMPLATE_PATH).layout == 'company_form'
+
+
+def test_unknown_layouts_rejected(tmp_path):
+    detector = LayoutDetector()
+
+    wb = openpyxl.Workbook()
+    wb.active.title = '3-Остатки'
+    wb.save(tmp_path / 'missing.xlsx')
+    with pytest.raises(UnknownLayoutError, match='нет листов'):
+        detector.detect(str(tmp_path / 'missing.xlsx'))
+
+    path = build_company_workbook(str(tmp_path / 'other.xlsx'), rows=5, formulas=False)
+    wb = openpyxl.load_workbook(path)
+    wb['5-Реализация']['A2'] = 'Произвольная таблица'
+    wb.save(path)
+    with pytest.raises(UnknownLayoutError, match='5-Реализация') as error:
+        detector.detect(path)
+    assert error.value.fingerprint
+
+    (tmp_path / 'broken.xlsx').write_bytes(b'PK\x03\x04 not a zip')
+    with pytest.raises(UnknownLayoutError):
+        detector.detect(str(tmp_path / 'broken.xlsx'))
+    assert detector.stats()['rejected'] == 3
+
+
+def test_upload_route_caches_layout_by_original_name(sqlite_db, tmp_path, monkeypatch):
+    from app.routes.upload_routes import upload_bp
+    from app.services import job_queue
+    from app.services.job_queue import InProcessJobQueue
+    from app.services.upload_stream import UploadRequest
+
+    detector = LayoutDetector()
+    monkeypatch.setattr(layout_fingerprint, '_detector', detector)
+    queue = InProcessJobQueue()
+    queue.register('process_upload', lambda payload, progress: {})
+    monkeypatch.setattr(queue, '_enqueue', lambda *args: None)
+    monkeypatch.setattr(job_queue, '_job_queue', queue)
+
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+    app.config.update(UPLOAD_FOLDER=str(tmp_path))
+    app.register_blueprint(upload_bp)
+    client = app.test_client()
+
+    path = build_company_workbook(str(tmp_path / 'sngs.xlsx'), rows=5, formulas=False)
+    for name in ['снгс_01.02.2026.xlsx', 'снгс_02.02.2026.xlsx']:
+        with open(path, 'rb') as f:
+            assert client.post('/upload', data={'file': (f, name)}).status_code == 202
+
+    # secure_filename оставил бы '01.02.2026.xlsx' - компания не определилась бы
+    assert detector.stats()['hits'] == 1
+    assert 'Саханефтегазсбыт' in detector.stats()['companies']
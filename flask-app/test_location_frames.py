@@ -0,0 +1,66 @@
+# test_location_frames.py
+"""Колоночная сводка листов 3 и 5 дает те же строки, что и построчный расчет"""
+import math
+import os
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'report_templates', 'Сводный_отчет_шаблон.xlsx')
+
+AGGREGATED_DATA = {
+    'Сибойл': {'sheet3_data': [
+        {'location_name': 'Нефтебаза Якутск', 'stock_ai92': 10.0, 'stock_ai95': None},
+        {'location_name': 'АЗС (97 шт)', 'stock_ai92': 1.5, 'stock_ai95': 2.0},
+        {'location_name': ' 12 ', 'stock_ai92': '3.5'},
+        {'location_name': None, 'stock_ai92': 4.0},
+        {'location_name': 'АЗС №5', 'transit_ai92': 7.0},
+    ]},
+    'Туймаада': {'sheet3_data': [{'location_name': 'АЗС', 'stock_ai92': 2.0}]},
+    'Без объектов': {'sheet3_data': []},
+}
+
+
+def build_rows(engine: str, aggregated_data: dict) -> list:
+    from reports.template_report_generator import TemplateReportGenerator
+
+    generator = TemplateReportGenerator(None, TEMPLATE_PATH, aggregation_engine=engine)
+    return generator._build_location_rows(aggregated_data, 'sheet3_data', generator.STOCKS_COLUMNS)
+
+
+def test_engines_build_same_rows():
+    expected = build_rows('python', AGGREGATED_DATA)
+    actual = build_rows('pandas', AGGREGATED_DATA)
+
+    assert [(row, values[3]) for row, values, _ in actual] == [
+        (9, 'Нефтебаза Якутск'), (10, None), (11, 'АЗС (114 шт)'), (12, 'АЗС (1 шт)'),
+    ]
+    for (_, expected_values, _), (_, actual_values, _) in zip(expected, actual):
+        assert expected_values.keys() == actual_values.keys()
+        for col, value in expected_values.items():
+            if isinstance(value, float):
+                assert math.isclose(value, actual_values[col])
+            else:
+                assert value == actual_values[col]
+
+
+def test_summary_recomputed_for_new_snapshot():
+    from reports.location_frames import summarize_locations
+
+    snapshot = {'Сибойл': {'sheet3_data': [{'location_name': 'АЗС', 'stock_ai92': 1.0}]}}
+    first = summarize_locations(snapshot, 'sheet3_data', ['stock_ai92'])
+    assert summarize_locations(snapshot, 'sheet3_data', ['stock_ai92']) is first
+
+    updated = {'Сибойл': {'sheet3_data': [{'location_name': 'АЗС', 'stock_ai92': 5.0}]}}
+    assert summarize_locations(updated, 'sheet3_data', ['stock_ai92'])['Сибойл'].azs_totals == [5.0]
+
+
+def test_summary_memo_follows_data_version():
+    from reports.location_frames import summarize_locations
+
+    # Redis-кэш снимков отдает новый словарь на каждое чтение той же версии
+    snapshot = {'Сибойл': {'sheet5_data': [{'location_name': 'АЗС', 'sales_ai92': 1.0}]}}
+    first = summarize_locations(snapshot, 'sheet5_data', ['sales_ai92'], version={'files': 1})
+    assert summarize_locations(dict(snapshot), 'sheet5_data', ['sales_ai92'], version={'files': 1}) is first
+
+    updated = {'Сибойл': {'sheet5_data': [{'location_name': 'АЗС', 'sales_ai92': 5.0}]}}
+    assert summarize_locations(updated, 'sheet5_data', ['sales_ai92'],
+                               version={'files': 2})['Сибойл'].azs_totals == [5.0]
@@ -0,0 +1,33 @@
+# test_parser_parallel.py
+import contextlib
+import io
+
+from app_parser.unified_parser import SHEET_PARSERS, UnifiedParser
+from benchmarks.synthetic_workbooks import build_company_workbook
+
+
+def parse(path, **options):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return UnifiedParser(path, **options).parse_all()
+
+
+def test_parallel_matches_sequential(tmp_path):
+    path = build_company_workbook(str(tmp_path / 'sngs.xlsx'), rows=40, formulas=False, merged_block=4)
+
+    sequential = parse(path)
+    parallel = parse(path, parallel=True, workers=2)
+
+    for key, _ in SHEET_PARSERS:
+        assert parallel[key] == sequential[key]
+        assert key in parallel['metadata']['timings']
+    assert parallel['metadata']['company'] == sequential['metadata']['company'] == 'Саханефтегазсбыт'
+    assert sequential['metadata']['timings']['total'] >= sequential['metadata']['timings']['sheet3']
+
+
+def test_single_worker_does_not_swap_stdout(tmp_path, capsys):
+    path = build_company_workbook(str(tmp_path / 'sngs.xlsx'), rows=5, formulas=False)
+
+    # Без пула листы разбираются в текущем процессе: sys.stdout общий для всех потоков
+    UnifiedParser(path, parallel=True, workers=1).parse_all()
+
+    assert 'Лист 3' in capsys.readouterr().out
@@ -0,0 +1,50 @@
+# test_report_backends.py
+"""Потоковый бэкенд отчета дает ту же книгу, что и заполнение копии шаблона"""
+import os
+from datetime import date
+
+import pytest
+
+from benchmarks.bench_report_render import FakeQueries, TEMPLATE_PATH, build_aggregated_data, workbook_snapshot
+
+REPORT_DATE = date(2024, 6, 1)
+
+
+def render(tmp_path, label: str, **options) -> str:
+    from reports.template_report_generator import TemplateReportGenerator
+
+    generator = TemplateReportGenerator(FakeQueries(build_aggregated_data(3, 4)), TEMPLATE_PATH,
+                                        use_report_cache=False, **options)
+    generator.reports_dir = str(tmp_path / label)
+    os.makedirs(generator.reports_dir)
+    return generator.generate_report(REPORT_DATE)
+
+
+@pytest.fixture
+def template_report(tmp_path):
+    return render(tmp_path, 'template', backend='template')
+
+
+def test_streaming_matches_template(tmp_path, template_report):
+    streaming_report = render(tmp_path, 'streaming', backend='streaming')
+
+    expected = workbook_snapshot(template_report)
+    actual = workbook_snapshot(streaming_report)
+    assert actual.keys() == expected.keys()
+    assert [key for key in expected if actual[key] != expected[key]] == []
+    assert any(expected[(title, 'merged')] for title, kind in expected if kind == 'merged')
+
+
+def test_date_cells_filled_by_both_backends(tmp_path, template_report):
+    from openpyxl import load_workbook
+    from reports.streaming_writer import compile_template
+
+    layout = compile_template(TEMPLATE_PATH).layout
+    assert any(layout.date_cells.values())
+    for path in (template_report, render(tmp_path, 'streaming', backend='streaming')):
+        wb = load_workbook(path)
+        for title, cells in layout.date_cells.items():
+            for row, col in cells:
+                assert wb[title].cell(row=row, column=col).value == '01.06.2024'
+        row, col = layout.as_of_cell
+        assert wb['1-Структура'].cell(row=row, column=col).value == '31.05.2024'
@@ -0,0 +1,128 @@
+# test_report_cache.py
+"""Кэш готовых отчетов: повтор без новых загрузок отдает файл, новая загрузка - перегенерация"""
+import os
+import time
+from datetime import date
+
+import pytest
+
+from config import Config
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'report_templates', 'Сводный_отчет_шаблон.xlsx')
+
+
+@pytest.fixture
+def queries(sqlite_queries, tmp_path):
+    """DatabaseQueries поверх временной SQLite-базы с одним обработанным файлом"""
+    upload(sqlite_queries, tmp_path, date(2024, 6, 1))
+    return sqlite_queries
+
+
+def upload(queries, tmp_path, report_date, finish=True):
+    """Как FileProcessor.save_parsed; finish=False - обработка еще не завершена"""
+    path = tmp_path / f"upload_{report_date:%d%m%Y}.xlsx"
+    path.write_bytes(b'test')
+    file_id, company_id = queries.save_uploaded_file(path.name, str(path), 'Сибойл', report_date)
+    queries.save_all_sheets_bulk(file_id, company_id, report_date, {
+        'sheet3': [{'object_name': 'Нефтебаза', 'stock_ai92': 10.0}],
+        'sheet5': [{'object_name': 'АЗС', 'daily_ai92': 1.0}],
+    })
+    if finish:
+        finish_upload(queries, file_id, report_date)
+    return file_id
+
+
+def finish_upload(queries, file_id, report_date):
+    queries.update_file_status(file_id, 'processed', content_hash=f'{report_date:%Y%m%d}' * 8)
+
+
+@pytest.fixture
+def generator(queries, tmp_path, monkeypatch):
+    from reports.template_report_generator import TemplateReportGenerator
+
+    generator = TemplateReportGenerator(queries, TEMPLATE_PATH, use_report_cache=True)
+    generator.reports_dir = str(tmp_path / 'reports_output')
+    os.makedirs(generator.reports_dir)
+
+    generator.renders = 0
+    fill = generator._fill_all_company_data
+
+    def counting_fill(*args, **kwargs):
+        generator.renders += 1
+        return fill(*args, **kwargs)
+
+    monkeypatch.setattr(generator, '_fill_all_company_data', counting_fill)
+    return generator
+
+
+def test_unchanged_inputs_return_cached_report(generator):
+    first = generator.generate_report(date(2024, 6, 2))
+    second = generator.generate_report(date(2024, 6, 2))
+
+    assert generator.renders == 1
+    assert os.path.abspath(first) == second
+
+
+def test_new_upload_regenerates_report(generator, queries, tmp_path):
+    generator.generate_report(date(2024, 6, 2))
+    upload(queries, tmp_path, date(2024, 6, 2))
+    generator.generate_report(date(2024, 6, 2))
+    generator.generate_report(date(2024, 6, 3))
+
+    assert generator.renders == 3
+
+
+def test_report_during_processing_is_not_reused_after_it(generator, queries, tmp_path):
+    file_id = upload(queries, tmp_path, date(2024, 6, 2), finish=False)
+    generator.generate_report(date(2024, 6, 2))  # файл сохранен, статус еще не обновлен
+    finish_upload(queries, file_id, date(2024, 6, 2))
+    generator.generate_report(date(2024, 6, 2))
+    generator.generate_report(date(2024, 6, 2))
+
+    assert generator.renders == 2
+
+
+def test_stale_snapshot_is_not_stored_under_new_version(generator, queries, tmp_path):
+    generator.generate_report(date(2024, 6, 2))
+    stale = queries.get_aggregated_snapshot()
+    upload(queries, tmp_path, date(2024, 6, 2))
+    # Другой процесс: снимок из кэша в памяти еще старый (до истечения TTL)
+    queries.get_aggregated_snapshot = lambda *args: stale
+    generator.generate_report(date(2024, 6, 2))
+    del queries.get_aggregated_snapshot
+    generator.generate_report(date(2024, 6, 2))
+
+    assert generator.renders == 3
+
+
+def test_eviction_removes_least_recently_used_reports(generator, queries):
+    from reports.report_cache import ReportArtifactCache
+
+    paths = [os.path.abspath(generator.generate_report(date(2024, 6, day))) for day in (2, 3, 4)]
+    for age, path in enumerate(reversed(paths)):
+        os.utime(path, (time.time() - 100 * age, time.time() - 100 * age))
+
+    cache = ReportArtifactCache(queries, generator.reports_dir, max_bytes=os.path.getsize(paths[0]) + 1)
+    assert cache.evict() == [paths[0], paths[1]]
+    assert os.listdir(generator.reports_dir) == [os.path.basename(paths[2])]
+
+    generator.generate_report(date(2024, 6, 2))
+    assert generator.renders == 4
+
+
+def test_batch_renders_missing_dates_and_builds_archive(queries, tmp_path, monkeypatch):
+    import zipfile
+    from reports.batch_report import date_range, generate_report_batch
+
+    monkeypatch.setattr(Config, 'REPORTS_FOLDER', str(tmp_path / 'reports_output'))
+    dates = date_range(date(2024, 6, 2), date(2024, 6, 4))
+
+    first = generate_report_batch(queries, dates[:2], workers=1, template_path=TEMPLATE_PATH)
+    second = generate_report_batch(queries, dates, workers=1, make_zip=True, template_path=TEMPLATE_PATH)
+
+    assert [r['cached'] for r in first['reports']] == [False, False]
+    assert [r['cached'] for r in second['reports']] == [True, True, False]
+    archive = os.path.join(Config.REPORTS_FOLDER, second['archive']['filename'])
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.namelist() == [r['filename'] for r in second['reports']]
@@ -0,0 +1,62 @@
+# test_report_registry.py
+"""Реестр отчетов: поиск файла по имени без обхода диска и отдача через X-Accel-Redirect"""
+from urllib.parse import quote
+
+import pytest
+from flask import Flask
+
+FILENAME = '01062024_Топливо_Респ_Саха_Якутия.xlsx'
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    from reports import report_registry
+
+    reports_dir = tmp_path / 'reports_output'
+    reports_dir.mkdir()
+    registry = report_registry.ReportRegistry(str(reports_dir))
+    monkeypatch.setattr(report_registry, '_registry', registry)
+    return registry
+
+
+def test_resolve_registered_and_direct_paths(registry, tmp_path):
+    elsewhere = tmp_path / 'old' / 'other.xlsx'
+    elsewhere.parent.mkdir()
+    elsewhere.write_bytes(b'old')
+    registry.register(str(elsewhere))
+    (tmp_path / 'reports_output' / FILENAME).write_bytes(b'new')
+
+    assert registry.resolve('other.xlsx') == str(elsewhere)
+    assert registry.resolve(FILENAME) == str(tmp_path / 'reports_output' / FILENAME)
+
+    elsewhere.unlink()
+    assert registry.resolve('other.xlsx') is None
+    assert registry.list() == [str(tmp_path / 'reports_output' / FILENAME)]
+
+
+def test_download_uses_accel_redirect(registry, tmp_path):
+    from app.routes.report_routes import report_bp
+
+    (tmp_path / 'reports_output' / FILENAME).write_bytes(b'report')
+    app = Flask(__name__)
+    app.register_blueprint(report_bp)
+    client = app.test_client()
+
+    response = client.get(f'/download-report/{FILENAME}')
+    assert response.status_code == 200
+    assert response.data == b'report'
+    assert 'X-Accel-Redirect' not in response.headers
+
+    app.config['REPORTS_ACCEL_REDIRECT'] = '/protected-reports/'
+    # Напрямую к Flask (:5000), мимо nginx - файл целиком
+    response = client.get(f'/download-report/{FILENAME}')
+    assert response.data == b'report'
+    assert 'X-Accel-Redirect' not in response.headers
+
+    response = client.get(f'/download-report/{FILENAME}', headers={'X-Reports-Accel': '1'})
+    assert response.status_code == 200
+    assert response.data == b''
+    assert response.headers['X-Accel-Redirect'] == '/protected-reports/' + quote(FILENAME)
+    assert quote(FILENAME) in response.headers['Content-Disposition']
+
+    assert client.get('/download-report/missing.xlsx').status_code == 404
@@ -0,0 +1,32 @@
+# test_report_style_cache.py
+"""Кэш стилей строк-шаблонов дает ту же книгу, что и копирование стиля в каждую ячейку"""
+import os
+from datetime import date
+
+from benchmarks.bench_report_render import FakeQueries, TEMPLATE_PATH, build_aggregated_data, workbook_snapshot
+
+
+def render(tmp_path, use_style_cache: bool) -> str:
+    from reports.template_report_generator import TemplateReportGenerator
+
+    generator = TemplateReportGenerator(FakeQueries(build_aggregated_data(3, 4)), TEMPLATE_PATH,
+                                        use_style_cache=use_style_cache, use_report_cache=False)
+    generator.reports_dir = str(tmp_path / ('cache' if use_style_cache else 'copy'))
+    os.makedirs(generator.reports_dir)
+    return generator.generate_report(date(2024, 6, 1))
+
+
+def style_ids(path: str) -> dict:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path)
+    return {(ws.title, cell.coordinate): (cell.value, cell.style_id)
+            for ws in wb.worksheets for row in ws.iter_rows() for cell in row}
+
+
+def test_style_cache_matches_per_cell_copy(tmp_path):
+    copied, cached = render(tmp_path, False), render(tmp_path, True)
+
+    expected, actual = style_ids(copied), style_ids(cached)
+    assert [key for key in expected.keys() | actual.keys() if expected.get(key) != actual.get(key)] == []
+    assert workbook_snapshot(cached) == workbook_snapshot(copied)
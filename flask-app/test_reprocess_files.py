@@ -0,0 +1,37 @@
+# test_reprocess_files.py
+import sys
+import threading
+
+from console import log, quiet_output
+from reprocess_files import _writer_index
+
+
+def test_quiet_output_is_per_thread(capsys):
+    stdout = sys.stdout
+    entered, release = threading.Event(), threading.Event()
+
+    def writer():
+        with quiet_output():
+            entered.set()
+            log('скрыто')
+            release.wait(5)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    entered.wait(5)
+    log('видно')  # главный поток, пока писатель внутри quiet_output
+    release.set()
+    thread.join()
+
+    assert sys.stdout is stdout
+    assert capsys.readouterr().out == 'видно\n'
+
+
+def test_company_files_go_to_one_writer():
+    def data(company):
+        return {'metadata': {'company': company}}
+
+    for writers in (1, 2, 3):
+        assert _writer_index(data('АО "Саханефтегазсбыт"'), writers) == _writer_index(data('СНГС'), writers)
+        assert _writer_index(data('ООО Паритет'), writers) == _writer_index(data('паритет'), writers)
+        assert 0 <= _writer_index(data('Новая компания'), writers) < writers
@@ -0,0 +1,37 @@
+# test_service_registry.py
+import pytest
+
+from app.services.registry import ServiceRegistry, get_file_processor, services
+
+
+def test_service_created_once_and_reset():
+    registry = ServiceRegistry()
+    created = []
+    registry.register('service', lambda: created.append(object()) or created[-1])
+
+    first = registry.get('service')
+    assert registry.get('service') is first
+    assert len(created) == 1
+    assert 'service' in registry.stats()['initialized']
+
+    registry.reset('service')
+    assert registry.get('service') is not first
+    assert len(created) == 2
+
+
+def test_warm_up_and_unknown_service():
+    registry = ServiceRegistry()
+    registry.register('a', dict)
+    registry.register('b', list)
+    registry.warm_up()
+    assert sorted(registry.stats()['initialized']) == ['a', 'b']
+
+    with pytest.raises(KeyError):
+        registry.get('missing')
+
+
+def test_file_processor_shared():
+    processor = get_file_processor()
+    assert get_file_processor() is processor
+    assert processor.parsers[0]['name'] == 'UnifiedParser'
+    assert 'file_processor' in services.stats()['initialized']
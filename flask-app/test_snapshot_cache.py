@@ -0,0 +1,40 @@
+# test_snapshot_cache.py
+from database.snapshot_cache import LocalSnapshotCache, RedisSnapshotCache
+
+
+class DictRedis:
+    """Минимальная замена Redis для get/set/incr"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key) or 0) + 1
+        return self.data[key]
+
+
+def check_invalidation_during_compute(cache):
+    def stale_compute():
+        cache.invalidate()  # файл обработан, пока снимок считался
+        return {'company': 'old'}
+
+    assert cache.get_or_compute(('k',), stale_compute) == {'company': 'old'}
+    # Устаревший снимок не сохранен под новым поколением
+    assert cache.get_or_compute(('k',), lambda: {'company': 'new'}) == {'company': 'new'}
+    assert cache.get_or_compute(('k',), lambda: {'company': 'other'}) == {'company': 'new'}
+
+
+def test_local_cache_drops_snapshot_computed_across_invalidation():
+    check_invalidation_during_compute(LocalSnapshotCache(ttl=60))
+
+
+def test_redis_cache_stores_snapshot_under_generation_read_before_compute():
+    cache = RedisSnapshotCache('redis://localhost:6379/0', ttl=60)
+    cache.redis = DictRedis()
+    check_invalidation_during_compute(cache)
@@ -0,0 +1,40 @@
+# test_template_layout.py
+"""Разметка шаблона: совпадает с просмотром книги и пересчитывается при изменении файла"""
+import os
+import shutil
+
+from openpyxl import load_workbook
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'report_templates', 'Сводный_отчет_шаблон.xlsx')
+
+
+def test_layout_matches_workbook_scan():
+    from reports.streaming_writer import compile_template
+    from reports.template_report_generator import TemplateReportGenerator
+
+    layout = compile_template(TEMPLATE_PATH).layout
+    generator = TemplateReportGenerator(None, TEMPLATE_PATH)
+    wb = load_workbook(TEMPLATE_PATH)
+
+    assert layout.supply_rows == generator._template_rows(wb['4-Поставка'], 9, 2)
+    assert layout.aviation_rows == generator._template_rows(wb['6-Авиатопливо'], 8, 1)
+    assert layout.supply_rows and layout.aviation_rows
+
+
+def test_layout_refreshed_when_template_changes(tmp_path):
+    from reports.streaming_writer import compile_template
+
+    template = tmp_path / 'template.xlsx'
+    shutil.copy(TEMPLATE_PATH, template)
+    first = compile_template(str(template))
+    assert compile_template(str(template)) is first
+
+    wb = load_workbook(template)
+    wb['4-Поставка'].cell(row=30, column=2).value = 'ООО "Новая компания"'
+    wb.save(template)
+    os.utime(template, (first.mtime + 10, first.mtime + 10))
+
+    refreshed = compile_template(str(template))
+    assert refreshed is not first
+    assert refreshed.layout.supply_rows['ооо "новая компания"'] == 30
@@ -0,0 +1,65 @@
+# test_upload_dedup.py
+"""Повторная загрузка того же файла за день отдает прежний результат без разбора"""
+import contextlib
+import io
+
+import pytest
+
+
+@pytest.fixture
+def processor(sqlite_db):
+    """FileProcessor поверх временной SQLite-базы"""
+    from app.services.file_processor import FileProcessor
+
+    return FileProcessor()
+
+
+def receive(path):
+    """Прием файла как в UploadRequest: запись частями с подсчетом sha256"""
+    from app.services.upload_stream import UploadTempFile
+
+    upload = UploadTempFile(str(path.parent))
+    upload.write(path.read_bytes())
+    upload.commit(str(path))
+    return upload.sha256
+
+
+def test_reupload_returns_previous_result(processor, tmp_path):
+    from app.services.upload_dedup import UploadDeduplicator
+    from app.services.upload_stream import file_sha256
+    from benchmarks.synthetic_workbooks import build_company_workbook
+
+    path = tmp_path / 'report.xlsx'
+    build_company_workbook(str(path), rows=20, formulas=False)
+    content_hash = receive(path)
+    assert content_hash == file_sha256(str(path))
+
+    dedup = UploadDeduplicator()
+    assert dedup.find_previous('report.xlsx', content_hash) is None
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = processor.process_file('report.xlsx', str(path), content_hash=content_hash)
+
+    previous = dedup.find_previous('report_copy.xlsx', content_hash)
+    assert previous['duplicate'] and previous['company'] == result['company'] == 'Саханефтегазсбыт'
+    assert previous['file_info']['file_id'] == result['file_info']['file_id']
+    assert previous['data_saved'] == result['data_saved']
+    # Имя файла указывает на другую компанию - это не повтор
+    assert dedup.find_previous('сибойл.xlsx', content_hash) is None
+    assert dedup.stats() == {'enabled': True, 'hits': 1, 'misses': 2, 'hit_rate': 0.3333}
+
+
+def test_new_content_for_same_company_replaces_hash(processor, tmp_path):
+    from app.services.upload_dedup import UploadDeduplicator
+    from benchmarks.synthetic_workbooks import build_company_workbook
+
+    first, second = tmp_path / 'first.xlsx', tmp_path / 'second.xlsx'
+    build_company_workbook(str(first), rows=20, formulas=False)
+    build_company_workbook(str(second), rows=30, formulas=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        processor.process_file('first.xlsx', str(first), content_hash=receive(first))
+        processor.process_file('second.xlsx', str(second), content_hash=receive(second))
+
+    # Запись компании за день теперь содержит данные второго файла
+    dedup = UploadDeduplicator()
+    assert dedup.find_previous('first.xlsx', receive(first)) is None
+    assert dedup.find_previous('second.xlsx', receive(second)) is not None
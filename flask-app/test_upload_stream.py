@@ -0,0 +1,59 @@
+# test_upload_stream.py
+"""Потоковый прием загрузок: sha256 и сигнатура при приеме, лимит размера, без временных файлов"""
+import hashlib
+import io
+import os
+
+import pytest
+from flask import Flask, jsonify, request
+
+
+@pytest.fixture
+def client(tmp_path):
+    from app.services.upload_stream import UploadRequest, unique_upload_path
+
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+    app.config.update(UPLOAD_FOLDER=str(tmp_path), MAX_CONTENT_LENGTH=64 * 1024)
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        upload = request.files['file'].stream
+        if request.form.get('keep'):
+            upload.commit(unique_upload_path(str(tmp_path), 'report.xlsx'))
+        return jsonify({'sha256': upload.sha256, 'xlsx': upload.is_xlsx, 'size': upload.size})
+
+    @app.errorhandler(400)
+    @app.errorhandler(413)
+    def rejected(e):
+        return jsonify({'error': e.description}), e.code
+
+    return app.test_client()
+
+
+def post(client, content: bytes, **form):
+    return client.post('/upload', data={'file': (io.BytesIO(content), 'report.xlsx'), **form})
+
+
+def test_hash_computed_while_receiving_and_temp_file_removed(client, tmp_path):
+    content = b'PK\x03\x04' + os.urandom(20000)
+    response = post(client, content)
+
+    assert response.get_json() == {'sha256': hashlib.sha256(content).hexdigest(), 'xlsx': True,
+                                   'size': len(content)}
+    assert os.listdir(tmp_path) == []
+
+
+def test_committed_uploads_get_unique_names(client, tmp_path):
+    content = b'PK\x03\x04' + b'0' * 100
+    post(client, content, keep='1')
+    post(client, content, keep='1')
+
+    names = os.listdir(tmp_path)
+    assert len(names) == 2 and all(name.startswith('report_') and name.endswith('.xlsx') for name in names)
+
+
+def test_wrong_signature_and_oversized_files_rejected(client, tmp_path):
+    assert post(client, b'<html>' + b'0' * 1000).status_code == 400
+    assert post(client, b'PK\x03\x04' + b'0' * (70 * 1024)).status_code == 413
+    assert os.listdir(tmp_path) == []